@@ -0,0 +1,41 @@
+"""
+Time the alert rule engine takes per tick, against its latency budget,
+for fleets of 1k and 10k modules. Each module gets the default rules for
+its type plus the status rules. Only the rule evaluation is timed, not the
+simulation tick.
+
+Run from the ppms directory:  python -m benchmarks.bench_alerts
+"""
+import statistics
+import time
+
+from power_plant_app.alerts import AlertEngine
+from power_plant_app.engine import TickEngine
+from power_plant_app.vector_sim import VectorSimulator, build_fleet
+
+SIZES = (1_000, 10_000)
+TICKS = 50
+BUDGET_MS = 50
+
+
+def main():
+    print(f"{'modules':>8} {'rule checks':>12} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'budget':>8}")
+    for size in SIZES:
+        state, excluded, module_types = build_fleet(size)
+        engine = TickEngine(VectorSimulator(state, excluded, module_types, seed=0))
+        alerts = AlertEngine(budget=BUDGET_MS / 1000, module_types=module_types)
+        checks = sum(len(alerts.rules_for(name)) for modules in state.values() for name in modules)
+        timings = []
+        for _ in range(TICKS):
+            engine.tick()
+            start = time.perf_counter()
+            alerts.evaluate(engine.published)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        print(f'{size:>8} {checks:>12} {statistics.median(timings):>8.2f} {p99:>8.2f} '
+              f'{timings[-1]:>8.2f} {"ok" if p99 <= BUDGET_MS else "OVER":>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Time to compute 12 hours of reactor KPIs: a per-row loop over ORM objects
+(the way the reports view groups rows) against the polars aggregation in
+analytics.py, cold and then from its cache while newer data keeps landing.
+
+Run from the ppms directory:  python -m benchmarks.bench_analytics [rows]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from power_plant_app import create_app, db
+from power_plant_app.analytics import cache, module_kpis
+from power_plant_app.queries import reports_query
+
+from .bench_report_queries import grow_table
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def orm_kpis(start, end):
+    """Mean/peak power and time online per module, one ORM object at a time."""
+    kpis = {}
+    for report in reports_query(module_type='reactor', start=start, end=end, newest_first=False):
+        kpi = kpis.setdefault(report.module_name, {'samples': 0, 'power': 0.0, 'peak': 0.0, 'online': 0})
+        kpi['samples'] += 1
+        kpi['power'] += report.power_output_mw or 0
+        kpi['peak'] = max(kpi['peak'], report.power_output_mw or 0)
+        kpi['online'] += report.status == 'Online'
+    return kpis
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    start = datetime(2025, 1, 1)
+    end = start + timedelta(hours=12)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}",
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+            'ARCHIVE_DIR': os.path.join(tmp, 'archive'),
+        })
+        with app.app_context():
+            grow_table(rows, start)
+            _, orm_seconds = timed(lambda: orm_kpis(start, end))
+            kpis, cold_seconds = timed(lambda: module_kpis(start, end, module_type='reactor'))
+            # New rows after the range don't invalidate it
+            grow_table(rows + 1000, start)
+            _, warm_seconds = timed(lambda: module_kpis(start, end, module_type='reactor'))
+            db.engine.dispose()
+
+    print(f'{rows} rows, {len(kpis)} reactors')
+    print(f'ORM loop (mean/peak/online only): {orm_seconds:.3f}s')
+    print(f'polars KPIs, cold:                {cold_seconds:.3f}s')
+    print(f'polars KPIs, cached:              {warm_seconds * 1000:.2f}ms ({cache.hits} hit)')
+
+
+if __name__ == '__main__':
+    main()
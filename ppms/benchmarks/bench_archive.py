@@ -0,0 +1,96 @@
+"""
+Size and time of exporting PlantReport history as CSV (the streamed
+export.csv path) against the Parquet archive, and of a typical analytics
+read afterwards: one module's mean power per day.
+
+Run from the ppms directory:  python -m benchmarks.bench_archive [rows]
+"""
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import polars as pl
+
+from power_plant_app import create_app, db
+from power_plant_app.archive import archive_reports, scan_reports
+from power_plant_app.exports import iter_csv
+from power_plant_app.models import PlantReport
+from power_plant_app.queries import reports_query
+
+from .bench_report_queries import grow_table
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def export_csv(path):
+    rows = reports_query(newest_first=False).with_entities(
+        PlantReport.timestamp, PlantReport.module_name, PlantReport.status,
+        PlantReport.power_output_mw, PlantReport.temperature_c,
+    ).yield_per(1000)
+    with open(path, 'wb') as out:
+        for chunk in iter_csv(rows):
+            out.write(chunk)
+
+
+def csv_daily_mean(path):
+    totals = {}
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for timestamp, module_name, status, power, temp in reader:
+            if module_name == 'Reactor 2' and power:
+                day = timestamp[:10]
+                total, count = totals.get(day, (0.0, 0))
+                totals[day] = (total + float(power), count + 1)
+    return {day: total / count for day, (total, count) in totals.items()}
+
+
+def parquet_daily_mean(archive):
+    return (pl.scan_parquet(os.path.join(archive, '*', 'reactor_2.parquet'))
+            .group_by(pl.col('timestamp').dt.date())
+            .agg(pl.col('power_output_mw').mean())
+            .collect())
+
+
+def dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = os.path.join(tmp, 'archive')
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}",
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+            'ARCHIVE_DIR': archive,
+        })
+        with app.app_context():
+            # 1 Hz samples from the start of the first day, spanning several days
+            grow_table(rows, datetime(2025, 1, 1))
+            csv_path = os.path.join(tmp, 'export.csv')
+            _, csv_seconds = timed(lambda: export_csv(csv_path))
+            days, parquet_seconds = timed(lambda: archive_reports(datetime(2100, 1, 1).date()))
+            frame, scan_seconds = timed(lambda: scan_reports().collect())
+            _, csv_read = timed(lambda: csv_daily_mean(csv_path))
+            _, parquet_read = timed(lambda: parquet_daily_mean(archive))
+            db.engine.dispose()
+
+        print(f'{rows} rows over {len(days)} days')
+        print(f"{'':>22} {'CSV':>10} {'Parquet':>10}")
+        print(f"{'export seconds':>22} {csv_seconds:>10.2f} {parquet_seconds:>10.2f}")
+        print(f"{'size MB':>22} {os.path.getsize(csv_path) / 1e6:>10.1f} {dir_size(archive) / 1e6:>10.1f}")
+        print(f"{'daily mean, 1 module s':>22} {csv_read:>10.3f} {parquet_read:>10.3f}")
+        print(f'Reading the whole range back from the archive: {scan_seconds:.2f}s, {frame.height} rows')
+
+
+if __name__ == '__main__':
+    main()
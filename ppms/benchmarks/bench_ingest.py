@@ -0,0 +1,71 @@
+"""
+Compares PlantReport ingest throughput of the old inline path (one ORM object
+per module and a commit per tick) against the write-behind ReportWriter.
+
+Run from the ppms directory:  python -m benchmarks.bench_ingest [ticks]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from power_plant_app import create_app, db
+from power_plant_app.models import PlantReport
+from power_plant_app.persistence import ReportWriter
+from power_plant_app.simulation import PowerPlantSimulator
+
+
+def make_app(path):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'SIM_TICK_ENGINE': False,
+        'REPORT_WRITE_BEHIND': False,
+    })
+
+
+def bench_inline(app, ticks):
+    """The original hot path: ORM objects plus a commit on every tick."""
+    simulator = PowerPlantSimulator()
+    with app.app_context():
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for sample in simulator.update():
+                db.session.add(PlantReport(**sample))
+            db.session.commit()
+        elapsed = time.perf_counter() - start
+        rows = PlantReport.query.count()
+    return rows, elapsed, elapsed
+
+
+def bench_write_behind(app, ticks):
+    """Ticks only enqueue; the writer thread batches the inserts."""
+    simulator = PowerPlantSimulator()
+    writer = ReportWriter(max_pending=ticks + 1)
+    writer.app = app
+    writer.start()
+    start = time.perf_counter()
+    for _ in range(ticks):
+        writer.submit(simulator.update())
+    tick_elapsed = time.perf_counter() - start
+    writer.stop()
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        rows = PlantReport.query.count()
+    return rows, elapsed, tick_elapsed
+
+
+def main():
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for label, bench in (('inline commit', bench_inline), ('write-behind', bench_write_behind)):
+        with tempfile.TemporaryDirectory() as tmp:
+            app = make_app(os.path.join(tmp, 'bench.sqlite'))
+            rows, elapsed, tick_elapsed = bench(app, ticks)
+            with app.app_context():
+                db.engine.dispose()
+        print(f'{label:>14}: {rows:>8} rows in {elapsed:7.3f}s '
+              f'= {rows / elapsed:>10.0f} rows/s, '
+              f'{tick_elapsed / ticks * 1e6:8.1f} us/tick on the tick thread')
+
+
+if __name__ == '__main__':
+    main()
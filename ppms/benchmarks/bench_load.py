@@ -0,0 +1,293 @@
+"""
+Headless load test of the web app. Serves create_app() on a local port
+with a temporary SQLite database and the tick engine and report writer
+running, logs in a number of virtual operators, and has each of them
+loop over a weighted mix of requests: polling /api/plant_data (with its
+ETag, as the dashboard does), posting /module_action, and loading the
+dashboard, /reports, /notifications and the CSV export. Reports latency
+percentiles and throughput per request type plus how much the database
+grew, and writes them as JSON so runs can be compared between commits.
+
+Run from the ppms directory:
+    python -m benchmarks.bench_load [--users 20] [--duration 30] [--output FILE]
+    python -m benchmarks.bench_load --compare OLD.json NEW.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, Request, build_opener
+
+from sqlalchemy import func
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard
+from power_plant_app.models import Notification, PlantReport, PlantReportRollup, PlantStatusRollup, User
+
+PASSWORD = 'load-test'
+ACTIONS = ['start', 'stop', 'low_power_mode']
+TABLES = {
+    'plant_report': PlantReport,
+    'plant_report_rollup': PlantReportRollup,
+    'plant_status_rollup': PlantStatusRollup,
+    'notification': Notification,
+}
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+class Operator:
+    """One logged-in virtual user with its own cookie jar and last seen ETag."""
+
+    def __init__(self, base_url, username, rng, export_start):
+        self.base_url = base_url
+        self.username = username
+        self.rng = rng
+        self.export_start = export_start
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()))
+        self.etag = None
+        self.module_ids = []
+
+    def request(self, path, data=None, headers=None, json_body=None):
+        """Returns the status code; 3xx/4xx/5xx are status codes, not exceptions."""
+        body = None
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif data is not None:
+            body = urlencode(data).encode()
+        try:
+            with self.opener.open(Request(self.base_url + path, data=body, headers=headers), timeout=30) as response:
+                payload = response.read()
+                return response.status, response.headers, payload
+        except HTTPError as error:
+            return error.code, error.headers, error.read()
+
+    def login(self):
+        status, _, _ = self.request('/auth/login', data={'username': self.username, 'password': PASSWORD})
+        status, _, payload = self.request('/api/plant_data')
+        if status != 200:
+            raise RuntimeError(f'{self.username} could not log in ({status})')
+        self.module_ids = [name.lower().replace(' ', '_') for modules in json.loads(payload).values()
+                           for name in modules]
+
+    def poll(self):
+        status, headers, _ = self.request('/api/plant_data', headers={'If-None-Match': self.etag} if self.etag else None)
+        if status == 200:
+            self.etag = headers.get('ETag')
+        return status
+
+    def module_action(self):
+        action = {'module_id': self.rng.choice(self.module_ids), 'action': self.rng.choice(ACTIONS)}
+        return self.request('/module_action', json_body=action)[0]
+
+    def dashboard(self):
+        return self.request('/nuclear_dashboard')[0]
+
+    def reports(self):
+        return self.request('/reports')[0]
+
+    def notifications(self):
+        return self.request('/notifications')[0]
+
+    def export_csv(self):
+        return self.request('/reports/export.csv?' + urlencode({'start': self.export_start}))[0]
+
+
+# Request type -> (weight, Operator method)
+SCENARIOS = {
+    'plant_data': (60, Operator.poll),
+    'module_action': (10, Operator.module_action),
+    'dashboard': (5, Operator.dashboard),
+    'reports': (10, Operator.reports),
+    'notifications': (10, Operator.notifications),
+    'export_csv': (5, Operator.export_csv),
+}
+
+
+def run_operator(operator, deadline, think, results):
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][0] for name in names]
+    while time.monotonic() < deadline:
+        name = operator.rng.choices(names, weights)[0]
+        started = time.perf_counter()
+        try:
+            status = SCENARIOS[name][1](operator)
+        except Exception as error:   # connection refused/reset, timeouts
+            status = type(error).__name__
+        results.append((name, time.perf_counter() - started, status))
+        if think:
+            time.sleep(operator.rng.uniform(0, 2 * think))
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p / 100))] * 1000 if values else None
+
+
+def summarize(samples, seconds):
+    latencies = sorted(latency for _, latency, _ in samples)
+    errors = sum(1 for _, _, status in samples if not isinstance(status, int) or status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / seconds, 2),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] * 1000 if latencies else None,
+    }
+
+
+def row_counts():
+    return {table: db.session.query(func.count()).select_from(model).scalar() for table, model in TABLES.items()}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(__file__), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(users, duration, think, tick_interval, seed):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'load.sqlite')
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'ARCHIVE_DIR': os.path.join(tmp, 'archive'),
+            'CHECKPOINT_PATH': os.path.join(tmp, 'checkpoint.npz'),
+            'SIM_TICK_INTERVAL': tick_interval,
+        })
+        with app.app_context():
+            password_hash = generate_password_hash(PASSWORD)
+            db.session.add_all(User(username=f'operator{i}', password_hash=password_hash, role='operator')
+                               for i in range(users))
+            db.session.commit()
+            before = row_counts()
+            db.session.remove()
+
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        export_start = datetime.utcnow().strftime('%Y-%m-%dT%H:%M')
+        operators = [Operator(base_url, f'operator{i}', random.Random(seed + i), export_start) for i in range(users)]
+        login_threads = [threading.Thread(target=operator.login) for operator in operators]
+        for thread in login_threads:
+            thread.start()
+        for thread in login_threads:
+            thread.join()
+
+        results = []
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=run_operator, args=(operator, deadline, think, results))
+                   for operator in operators]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        server.shutdown()
+        dashboard.engine.stop()
+        dashboard.writer.stop()
+        with app.app_context():
+            after = row_counts()
+            db.session.remove()
+            db.engine.dispose()
+        db_bytes = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp)
+                       if name.startswith('load.sqlite'))
+
+    by_type = {}
+    for sample in results:
+        by_type.setdefault(sample[0], []).append(sample)
+    return {
+        'commit': git_commit(),
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {'users': users, 'duration_s': duration, 'think_s': think,
+                   'tick_interval_s': tick_interval, 'seed': seed},
+        'total': summarize(results, elapsed),
+        'endpoints': {name: summarize(by_type.get(name, []), elapsed) for name in SCENARIOS},
+        'db_rows': {table: {'before': before[table], 'after': after[table], 'growth': after[table] - before[table]}
+                    for table in TABLES},
+        'db_bytes': db_bytes,
+    }
+
+
+def fmt(value, spec='.1f'):
+    return '-' if value is None else format(value, spec)
+
+
+def print_results(results):
+    config = results['config']
+    print(f"commit {results['commit']}: {config['users']} operators for {config['duration_s']}s, "
+          f"think {config['think_s']}s, tick {config['tick_interval_s']}s")
+    print(f"{'':>14} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, row in list(results['endpoints'].items()) + [('total', results['total'])]:
+        print(f"{name:>14} {row['requests']:>9} {row['errors']:>7} {row['throughput_rps']:>8.1f} "
+              f"{fmt(row['p50_ms']):>8} {fmt(row['p95_ms']):>8} {fmt(row['p99_ms']):>8}")
+    growth = ', '.join(f"{table} +{row['growth']}" for table, row in results['db_rows'].items())
+    print(f"database: {growth}; {results['db_bytes'] / 1e6:.1f} MB on disk")
+
+
+def compare(old_path, new_path):
+    """Prints p95 latency and throughput of two saved runs side by side."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'':>14} {'p95 ms':>17} {'req/s':>17}   ({old['commit']} -> {new['commit']})")
+    for name in list(new['endpoints']) + ['total']:
+        a = old['total'] if name == 'total' else old['endpoints'].get(name)
+        b = new['total'] if name == 'total' else new['endpoints'][name]
+        if a is None:
+            continue
+        change = ''
+        if a['p95_ms'] and b['p95_ms']:
+            change = f"{(b['p95_ms'] / a['p95_ms'] - 1) * 100:+.0f}%"
+        print(f"{name:>14} {fmt(a['p95_ms']):>8}{fmt(b['p95_ms']):>9} {a['throughput_rps']:>8.1f}"
+              f"{b['throughput_rps']:>9.1f}   {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the web app against a temporary database.')
+    parser.add_argument('--users', type=int, default=20, help='concurrent logged-in operators')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of load')
+    parser.add_argument('--think', type=float, default=0.2, help='mean pause between a user\'s requests (s)')
+    parser.add_argument('--tick-interval', type=float, default=1.0, help='SIM_TICK_INTERVAL for the run')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='JSON results file (default benchmarks/results/load-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two saved runs and exit')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)   # no access log per request
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(args.users, args.duration, args.think, args.tick_interval, args.seed)
+    print_results(results)
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{results['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Saved {output}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+A shift-change login storm against the web app, with password hashing in
+the request thread (PASSWORD_HASH_WORKERS=0, the old behaviour) and in the
+hashing process pool. Logged-in operators keep polling /api/plant_data
+once a second, as the dashboard does, while a burst of operators log in at
+the same moment; reported are login throughput, logins turned away with a
+503, and the poll latency percentiles before and during the burst.
+
+Run from the ppms directory:
+    python -m benchmarks.bench_login [--burst 40] [--pollers 20] [--workers N] [--max-pending 16]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from power_plant_app import create_app, db, dashboard
+from power_plant_app.models import User
+from power_plant_app.passwords import hasher
+
+from .bench_load import PASSWORD, Operator, percentile
+
+
+def poll_loop(operator, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        operator.poll()
+        latencies.append((time.monotonic(), time.perf_counter() - started))
+        stop.wait(max(0, 1.0 - (time.perf_counter() - started)) * operator.rng.uniform(0.8, 1.2))
+
+
+def log_in(operator, results):
+    started = time.perf_counter()
+    try:
+        status = operator.request('/auth/login', data={'username': operator.username, 'password': PASSWORD})[0]
+    except Exception as error:
+        status = type(error).__name__
+    results.append((status, time.perf_counter() - started))
+
+
+def run(workers, max_pending, burst, pollers, settle):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'login.sqlite')}",
+            'ARCHIVE_DIR': os.path.join(tmp, 'archive'),
+            'CHECKPOINT_PATH': os.path.join(tmp, 'checkpoint.npz'),
+            'PASSWORD_HASH_WORKERS': workers,
+            'PASSWORD_HASH_MAX_PENDING': max_pending,
+            'METRICS_SLOW_REQUEST_MS': None,
+        })
+        with app.app_context():
+            password_hash = generate_password_hash(PASSWORD)
+            db.session.add_all(User(username=f'operator{i}', password_hash=password_hash, role='operator')
+                               for i in range(pollers + burst))
+            db.session.commit()
+            db.session.remove()
+
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        operators = [Operator(base_url, f'operator{i}', random.Random(i), None) for i in range(pollers + burst)]
+        polling, storming = operators[:pollers], operators[pollers:]
+        # Also starts the hashing pool, so its startup isn't part of the burst
+        for operator in polling:
+            operator.login()
+
+        stop = threading.Event()
+        latencies = []
+        poll_threads = [threading.Thread(target=poll_loop, args=(operator, stop, latencies)) for operator in polling]
+        for thread in poll_threads:
+            thread.start()
+        time.sleep(settle)
+
+        burst_started = time.monotonic()
+        results = []
+        login_threads = [threading.Thread(target=log_in, args=(operator, results)) for operator in storming]
+        for thread in login_threads:
+            thread.start()
+        for thread in login_threads:
+            thread.join()
+        burst_seconds = time.monotonic() - burst_started
+        time.sleep(1)
+        stop.set()
+        for thread in poll_threads:
+            thread.join()
+
+        server.shutdown()
+        dashboard.engine.stop()
+        dashboard.writer.stop()
+        hasher.shutdown()
+        with app.app_context():
+            db.engine.dispose()
+
+    before = sorted(latency for at, latency in latencies if at < burst_started)
+    during = sorted(latency for at, latency in latencies if burst_started <= at <= burst_started + burst_seconds)
+    accepted = sum(1 for status, _ in results if status == 200)
+    return {
+        'burst_s': burst_seconds,
+        'logins_per_s': accepted / burst_seconds,
+        'accepted': accepted,
+        'rejected': sum(1 for status, _ in results if status == 503),
+        'login_p99_ms': percentile(sorted(latency for _, latency in results), 99),
+        'poll_p50_before_ms': percentile(before, 50),
+        'poll_p99_before_ms': percentile(before, 99),
+        'poll_p50_during_ms': percentile(during, 50),
+        'poll_p99_during_ms': percentile(during, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Login burst with and without the password hashing pool.')
+    parser.add_argument('--burst', type=int, default=40, help='operators logging in at the same moment')
+    parser.add_argument('--pollers', type=int, default=20, help='logged-in dashboards polling once a second')
+    parser.add_argument('--workers', type=int, default=None, help='PASSWORD_HASH_WORKERS for the pool run')
+    parser.add_argument('--max-pending', type=int, default=16, help='PASSWORD_HASH_MAX_PENDING')
+    parser.add_argument('--settle', type=float, default=3, help='seconds of polling before the burst')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    print(f'{args.burst} logins at once, {args.pollers} pollers, {os.cpu_count()} CPUs')
+    print(f"{'':>8} {'burst s':>8} {'login/s':>8} {'ok':>4} {'503':>4} {'login p99':>10} "
+          f"{'poll p50/p99 before':>20} {'poll p50/p99 during':>20}")
+    for label, workers, max_pending in (('inline', 0, args.max_pending),
+                                        ('pool', args.workers, args.max_pending)):
+        r = run(workers, max_pending, args.burst, args.pollers, args.settle)
+        print(f"{label:>8} {r['burst_s']:>8.2f} {r['logins_per_s']:>8.1f} {r['accepted']:>4} {r['rejected']:>4} "
+              f"{r['login_p99_ms']:>10.0f} {r['poll_p50_before_ms']:>9.1f} / {r['poll_p99_before_ms']:>7.1f} "
+              f"{r['poll_p50_during_ms']:>9.1f} / {r['poll_p99_during_ms']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Repeat page views between two writes with and without the render cache:
+/reports over a table with recent reactor rows and /nuclear_dashboard for
+the default plant and a vectorized fleet, served through the test client
+from an in-memory database. Also times the 304 answer to a conditional GET.
+
+Run from the ppms directory:  python -m benchmarks.bench_render_cache [requests] [fleet modules]
+"""
+import sys
+import time
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from power_plant_app import create_app, db, dashboard
+from power_plant_app.models import PlantReport, User
+from power_plant_app.vector_sim import VectorSimulator, build_fleet
+
+
+def make_client(cache_bytes, etags=False):
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SIM_TICK_ENGINE': False,
+        'REPORT_WRITE_BEHIND': False,
+        'ALERTS_ENABLED': False,
+        'METRICS_ENABLED': False,
+        'RENDER_CACHE_MAX_BYTES': cache_bytes,
+        'RENDER_CACHE_ETAGS': etags,
+    })
+    with app.app_context():
+        user = User(username='bench', password_hash=generate_password_hash('bench'), role='admin')
+        db.session.add(user)
+        now = datetime.utcnow()
+        db.session.add_all(PlantReport(module_name=f'Reactor {i % 4 + 1}', module_type='reactor', status='Online',
+                                       power_output_mw=900.0, temperature_c=300.0,
+                                       timestamp=now - timedelta(seconds=i // 4))
+                           for i in range(2000))
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+    return client
+
+
+def time_requests(client, path, count, headers=None):
+    client.get(path).close()
+    started = time.perf_counter()
+    for _ in range(count):
+        client.get(path, headers=headers).close()
+    return (time.perf_counter() - started) / count * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    fleet = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    print(f"{str(count) + ' requests each':>36} {'uncached ms':>12} {'cached ms':>10} {'304 ms':>8}")
+    for label, simulator in (('plant', None), (f'{fleet} modules', VectorSimulator(*build_fleet(fleet)))):
+        if simulator is not None:
+            dashboard.engine.use_simulator(simulator)
+        for path in ('/reports', '/nuclear_dashboard'):
+            if simulator is not None and path == '/reports':
+                continue
+            uncached = time_requests(make_client(0), path, count)
+            cached = time_requests(make_client(32 * 1024 * 1024), path, count)
+            client = make_client(32 * 1024 * 1024, etags=True)
+            etag = client.get(path).headers['ETag']
+            not_modified = time_requests(client, path, count, headers={'If-None-Match': etag})
+            print(f'{path + " (" + label + ")":>36} {uncached:>12.2f} {cached:>10.2f} {not_modified:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
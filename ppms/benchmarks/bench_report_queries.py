@@ -0,0 +1,101 @@
+"""
+Shows how the reports-page query scales with the size of PlantReport:
+the old leading-wildcard LIKE query on the old, unindexed schema against
+reports_query() on the indexed one.
+
+Run from the ppms directory:  python -m benchmarks.bench_report_queries [max_rows]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from power_plant_app import create_app, db
+from power_plant_app.models import PlantReport
+from power_plant_app.queries import reports_query
+from power_plant_app.simulation import PowerPlantSimulator, module_type_for
+
+MODULES = [name for modules in PowerPlantSimulator().state.values() for name in modules]
+
+
+def grow_table(target_rows, start):
+    """Appends synthetic 1 Hz samples for every module until the table has target_rows."""
+    have = db.session.query(PlantReport).count()
+    batch = []
+    tick = have // len(MODULES)
+    while have < target_rows:
+        ts = start + timedelta(seconds=tick)
+        for name in MODULES:
+            batch.append({'module_name': name, 'module_type': module_type_for(name), 'status': 'Online',
+                          'power_output_mw': 900.0, 'temperature_c': 300.0, 'timestamp': ts})
+        have += len(MODULES)
+        tick += 1
+        if len(batch) >= 50000:
+            db.session.execute(insert(PlantReport.__table__), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(PlantReport.__table__), batch)
+    db.session.commit()
+
+
+def timed(fn, repeat=20):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def legacy_reports():
+    return PlantReport.query.filter(
+        PlantReport.module_name.like('%Reactor%')
+    ).order_by(PlantReport.timestamp.desc()).limit(500).all()
+
+
+def indexed_reports():
+    return reports_query(module_type='reactor').limit(500).all()
+
+
+def indexed_module_window():
+    return reports_query(module_names=['Reactor 2'], newest_first=False).limit(3600).all()
+
+
+def drop_indexes():
+    for index in PlantReport.__table__.indexes:
+        index.drop(db.engine, checkfirst=True)
+
+
+def create_indexes():
+    for index in PlantReport.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
+
+
+def main():
+    max_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = [n for n in (10_000, 100_000, 1_000_000, 10_000_000) if n <= max_rows]
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}",
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        with app.app_context():
+            start = datetime(2025, 1, 1)
+            print(f"{'rows':>10} {'LIKE scan ms':>14} {'indexed ms':>12} {'1 module/1h ms':>16}")
+            for size in sizes:
+                grow_table(size, start)
+                drop_indexes()
+                legacy_ms = timed(legacy_reports, 5)
+                create_indexes()
+                print(f'{size:>10} {legacy_ms:>14.2f} '
+                      f'{timed(indexed_reports):>12.2f} {timed(indexed_module_window):>16.2f}')
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Ticks per second of the dict-based PowerPlantSimulator against the NumPy
+VectorSimulator for fleets of 10, 1k and 100k modules. Both engines build
+their PlantReport samples, as they do when driven by the tick engine, and
+skip the same fleet modules.
+
+Run from the ppms directory:  python -m benchmarks.bench_simulators
+"""
+import time
+
+from power_plant_app.simulation import PowerPlantSimulator
+from power_plant_app.vector_sim import VectorSimulator, build_fleet
+
+SIZES = (10, 1_000, 100_000)
+
+
+def ticks_per_second(sim, min_seconds=1.0):
+    ticks = 0
+    start = time.perf_counter()
+    while True:
+        sim.update()
+        ticks += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds and ticks >= 3:
+            return ticks / elapsed
+
+
+def main():
+    print(f"{'modules':>8} {'dict ticks/s':>14} {'vector ticks/s':>16} {'speedup':>8}")
+    for size in SIZES:
+        state, excluded, module_types = build_fleet(size)
+        dict_sim = PowerPlantSimulator(excluded=excluded)
+        dict_sim.state = build_fleet(size)[0]
+        dict_sim._index_modules()
+        vector_sim = VectorSimulator(state, excluded, module_types, seed=0)
+        dict_rate = ticks_per_second(dict_sim)
+        vector_rate = ticks_per_second(vector_sim)
+        print(f'{size:>8} {dict_rate:>14.1f} {vector_rate:>16.1f} {vector_rate / dict_rate:>7.1f}x')
+    print()
+    print('Without building samples (vector only):')
+    for size in SIZES:
+        state, excluded, module_types = build_fleet(size)
+        vector_sim = VectorSimulator(state, excluded, module_types, seed=0)
+        vector_sim.update = lambda sim=vector_sim: VectorSimulator.update(sim, collect=False)
+        print(f'{size:>8} {ticks_per_second(vector_sim):>14.1f} ticks/s')
+
+
+if __name__ == '__main__':
+    main()
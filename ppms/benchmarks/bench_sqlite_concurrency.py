@@ -0,0 +1,143 @@
+"""
+Report reads while the report writer commits, with SQLite's old rollback
+journal against the WAL settings storage.py applies. A writer thread
+commits one batch of samples (plus rollups) every WRITE_INTERVAL seconds
+while reader processes, like extra web workers, run export-sized range
+queries; reported are commit and query latencies and any "database is
+locked" errors.
+
+Run from the ppms directory:  python -m benchmarks.bench_sqlite_concurrency [seconds] [readers]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from power_plant_app import create_app, db
+from power_plant_app.models import PlantReport
+from power_plant_app.queries import reports_query
+from power_plant_app.rollups import apply_samples
+from power_plant_app.simulation import module_type_for
+
+from .bench_report_queries import MODULES, grow_table
+
+START = datetime(2025, 1, 1)
+WRITE_INTERVAL = 0.05
+BATCH_TICKS = 20
+CONFIGS = {
+    'rollback journal': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'WAL (default)': None,
+}
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] * 1000
+
+
+def writer(app, stop, latencies, errors, first_tick):
+    tick = first_tick
+    with app.app_context():
+        while not stop.is_set():
+            batch = []
+            for _ in range(BATCH_TICKS):
+                ts = START + timedelta(seconds=tick)
+                batch.extend({'module_name': name, 'module_type': module_type_for(name), 'status': 'Online',
+                              'power_output_mw': 900.0, 'temperature_c': 300.0, 'timestamp': ts}
+                             for name in MODULES)
+                tick += 1
+            started = time.perf_counter()
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(insert(PlantReport.__table__), batch)
+                    apply_samples(conn, batch)
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                errors.append(time.perf_counter() - started)
+            time.sleep(WRITE_INTERVAL)
+
+
+def reader(config, stop, results, span):
+    app = create_app(config)
+    latencies, errors = [], []
+    with app.app_context():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                # Reads the oldest hour of reactor rows, like a CSV export would
+                rows = reports_query(module_type='reactor', start=START, end=START + span, newest_first=False)
+                for _ in rows.with_entities(PlantReport.power_output_mw).yield_per(1000):
+                    pass
+                latencies.append(time.perf_counter() - started)
+            except OperationalError:
+                errors.append(time.perf_counter() - started)
+            finally:
+                db.session.remove()
+    results.put((latencies, errors))
+
+
+def run(pragmas, seconds, readers, rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        config = {
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.sqlite')}",
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+            'ALERTS_ENABLED': False,
+        }
+        if pragmas is not None:
+            config['SQLITE_PRAGMAS'] = pragmas
+        app = create_app(config)
+        with app.app_context():
+            grow_table(rows, START)
+            db.session.remove()
+            db.engine.dispose()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        results = context.Queue()
+        processes = [context.Process(target=reader, args=(config, stop, results, timedelta(hours=1)))
+                     for _ in range(readers)]
+        for process in processes:
+            process.start()
+        write_latencies, write_errors = [], []
+        thread = threading.Thread(target=writer, args=(app, stop, write_latencies, write_errors,
+                                                       rows // len(MODULES) + 1))
+        thread.start()
+        time.sleep(seconds)
+        stop.set()
+        thread.join()
+        read_latencies, read_errors = [], []
+        for _ in processes:
+            latencies, errors = results.get()
+            read_latencies.extend(latencies)
+            read_errors.extend(errors)
+        for process in processes:
+            process.join()
+        with app.app_context():
+            db.engine.dispose()
+    return write_latencies, write_errors, read_latencies, read_errors
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rows = 500_000
+    print(f'{seconds:.0f}s, 1 writer ({BATCH_TICKS * len(MODULES)} rows per commit), {readers} readers, {rows} rows')
+    print(f"{'':>18} {'commits':>8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'reads':>8} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'locked':>8}")
+    for label, pragmas in CONFIGS.items():
+        writes, write_errors, reads, read_errors = run(pragmas, seconds, readers, rows)
+        print(f'{label:>18} {len(writes):>8} {percentile(writes, 50):>8.1f} {percentile(writes, 99):>8.1f} '
+              f'{max(writes, default=0) * 1000:>8.1f} {len(reads):>8} {percentile(reads, 50):>8.1f} '
+              f'{percentile(reads, 99):>8.1f} {len(write_errors) + len(read_errors):>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,128 @@
+import atexit
 import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from flask_socketio import SocketIO
 
 # Initialize SQLAlchemy so it can be used by the app
 db = SQLAlchemy()
+# Pushes live plant state to dashboards instead of having them poll
+socketio = SocketIO()
 
 def create_app(test_config=None):
     app = Flask(__name__, instance_relative_config=True)
-    db_uri = f"sqlite:///{os.path.join(app.instance_path, 'plant_data.sqlite')}"
-
-    # If test_config is passed, override the database URI to use the test database
-    if test_config and 'SQLALCHEMY_DATABASE_URI' in test_config:
-        db_uri = test_config['SQLALCHEMY_DATABASE_URI']
     app.config.from_mapping(
         SECRET_KEY='dev',
         # Configure the SQLite database path
         SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(app.instance_path, 'plant_data.sqlite')}",
         SQLALCHEMY_TRACK_MODIFICATIONS=False, # Optional: Suppress a warning
+        # Passed to create_engine. For SQLite files, storage.py fills in the
+        # pool settings in SQLITE_POOL_OPTIONS that aren't given here.
+        SQLALCHEMY_ENGINE_OPTIONS={},
+        # Run on every new SQLite connection. WAL lets report readers work
+        # while the report writer commits, and busy_timeout (ms) makes a
+        # second writer wait for the lock instead of failing.
+        SQLITE_PRAGMAS={
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+        },
+        # Seconds between simulation steps; the tick engine owns the simulator
+        SIM_TICK_INTERVAL=1.0,
+        SIM_TICK_ENGINE=True,
+        # 'dict' (PowerPlantSimulator) or 'vector' (NumPy arrays, for large
+        # fleets). Vector ticks carry a fixed NumPy overhead and still build
+        # one sample dict per module, so they only pay off past about 100
+        # modules: 0.2x the dict backend at 10, 2.5x at 500 and about 4x at
+        # 100k (python -m benchmarks.bench_simulators).
+        SIMULATOR_BACKEND='dict',
+        # Seconds of per-module samples kept in memory for /api/history;
+        # older ranges are read from PlantReport and its rollups. 0 disables.
+        HISTORY_SECONDS=3600,
+        # Where archive-reports writes Parquet partitions; defaults to instance/archive
+        ARCHIVE_DIR=None,
+        # Fleet KPIs: results kept for this many (range, module set) queries;
+        # samples further apart than ANALYTICS_MAX_GAP seconds count as a gap;
+        # RATED_POWER_MW (module type -> MW) overrides the nameplate ratings
+        ANALYTICS_CACHE_SIZE=64,
+        ANALYTICS_MAX_GAP=10.0,
+        RATED_POWER_MW=None,
+        # Rendered reports bodies and dashboard module grids, cached per role
+        # and data version up to this many bytes of HTML (0 disables). With
+        # RENDER_CACHE_ETAGS those pages also answer conditional GETs.
+        RENDER_CACHE_MAX_BYTES=32 * 1024 * 1024,
+        RENDER_CACHE_ETAGS=True,
+        # Alert rules checked every tick; raised alerts become Notifications.
+        # One alert per rule and module per ALERT_COOLDOWN seconds, at most
+        # ALERT_MAX_PER_TICK per tick, and a warning if a tick's evaluation
+        # takes longer than ALERT_BUDGET_MS.
+        ALERTS_ENABLED=True,
+        ALERT_COOLDOWN=300,
+        ALERT_MAX_PER_TICK=20,
+        ALERT_BUDGET_MS=50,
+        # The engine's process saves the plant to CHECKPOINT_PATH (default
+        # instance/plant-checkpoint.npz) every CHECKPOINT_INTERVAL seconds and
+        # at shutdown, and create_app resumes from it, rolled forward to the
+        # newest PlantReport rows if CHECKPOINT_REPLAY. Needs SIM_TICK_ENGINE.
+        CHECKPOINT_PATH=None,
+        CHECKPOINT_INTERVAL=10,
+        CHECKPOINT_RESTORE=True,
+        CHECKPOINT_REPLAY=True,
+        # Request, SQL and tick timings served at /metrics (Prometheus text
+        # format). With METRICS_TOKEN set, scrapers must send it as a Bearer
+        # token; without it only clients on localhost may read it (behind a
+        # reverse proxy everyone looks local, so set a token). Requests slower than METRICS_SLOW_REQUEST_MS are logged with
+        # their SQL statement count; None turns the log off.
+        METRICS_ENABLED=True,
+        METRICS_TOKEN=None,
+        METRICS_SLOW_REQUEST_MS=1000,
+        # Scheduled maintenance is kept in memory; this is how often (seconds)
+        # the engine's process picks up jobs scheduled by other processes
+        MAINTENANCE_RELOAD_INTERVAL=60,
+        # Tick samples are buffered and written to PlantReport in bulk
+        REPORT_WRITE_BEHIND=True,
+        REPORT_BATCH_SIZE=1000,
+        REPORT_FLUSH_INTERVAL=1.0,
+        REPORT_MAX_PENDING=600, # ticks buffered before submit() starts to block
+        # Password hashes are computed by a pool of this many processes
+        # (None: up to 4, one per CPU; 0: in the request thread). Past
+        # PASSWORD_HASH_MAX_PENDING hashes running or queued, logins get a 503
+        # instead of waiting; PASSWORD_HASH_TIMEOUT (s) bounds each wait.
+        PASSWORD_HASH_WORKERS=None,
+        PASSWORD_HASH_MAX_PENDING=16,
+        PASSWORD_HASH_TIMEOUT=10,
+        # Logged-in users' id/username/role are cached per process
+        IDENTITY_CACHE_SIZE=1024,
+        IDENTITY_CACHE_TTL=60,
+        # Retention in days for raw PlantReport rows and for each rollup
+        # resolution; None keeps that data forever. Pruning runs on the
+        # report writer thread every REPORT_PRUNE_INTERVAL seconds.
+        REPORT_RETENTION_DAYS=None,
+        ROLLUP_RETENTION_DAYS={'1m': None, '1h': None, '1d': None},
+        REPORT_PRUNE_INTERVAL=3600,
+        REPORT_PRUNE_BATCH_SIZE=5000,
+        # The tick engine emits from a plain thread, so stay off eventlet/gevent
+        SOCKETIO_ASYNC_MODE='threading',
+        # Multi-process mode (e.g. several gunicorn workers): when a shared
+        # memory segment name is set, `flask simulation-owner` runs the engine
+        # and the report writer, and every web process reads the snapshot from
+        # the segment and sends actions over the command socket.
+        SHARED_STATE_NAME=None,
+        SHARED_STATE_SIZE=4 * 1024 * 1024,
+        SHARED_STATE_ADDRESS=None, # defaults to instance/sim-commands.sock
+        SHARED_STATE_POLL_INTERVAL=0.1,
+        # Seconds without a new snapshot after which a web process looks the
+        # segment up again, to follow an owner that restarted
+        SHARED_STATE_REATTACH_INTERVAL=2.0,
     )
 
+    if test_config is None:
+        # Load the instance config, if it exists, when not testing
+        app.config.from_pyfile('config.py', silent=True)
+    else:
+        app.config.from_mapping(test_config)
+
     # Ensure the instance folder exists
     try:
         os.makedirs(app.instance_path)
@@ -26,20 +130,81 @@ def create_app(test_config=None):
         pass
 
     # Initialize the db with the app
-    db.init_app(app)
+    from . import storage
+    storage.init_app(app)
 
     # Import and register the blueprint
     from . import dashboard
     from . import auth
+    from . import realtime
+    from . import rollups
+    from . import archive
+    from . import analytics
+    from . import backfill
+    from . import render_cache
+    from . import passwords
+    from . import alerts
+    from . import maintenance
     app.register_blueprint(dashboard.bp)
     app.register_blueprint(auth.bp)
+    auth.identity_cache.init_app(app)
+    rollups.init_app(app)
+    archive.init_app(app)
+    analytics.init_app(app)
+    backfill.init_app(app)
+    render_cache.init_app(app)
+    passwords.init_app(app)
+    atexit.register(passwords.hasher.shutdown)
 
     # Import models and create the database tables
     with app.app_context():
         from . import models
+        from . import migrations
         db.create_all()
+        migrations.upgrade_schema()
 
     # Make the dashboard the default home page
     app.add_url_rule('/', endpoint='dashboard.nuclear_dashboard')
 
-    return app
\ No newline at end of file
+    if app.config['SIMULATOR_BACKEND'] == 'vector':
+        from .vector_sim import VectorSimulator
+        if not isinstance(dashboard.engine.simulator, VectorSimulator):
+            dashboard.engine.use_simulator(VectorSimulator())
+
+    if app.config['SIM_TICK_ENGINE']:
+        # Resume from the last checkpoint before anything reads the plant
+        from . import checkpoint
+        checkpoint.init_app(app, dashboard.engine)
+        atexit.register(checkpoint.checkpointer.stop)
+
+    # Alert rules and scheduled maintenance run on the tick thread of
+    # whichever process owns the engine
+    alerts.init_app(app, dashboard.engine, dashboard.writer)
+    maintenance.init_app(app, dashboard.engine, dashboard.writer)
+    # Before the shared-state swap, so ticks are timed on the real engine
+    from . import metrics
+    metrics.init_app(app, dashboard.engine, dashboard.writer)
+
+    # Sized here for the engine that records into it, which in shared-state
+    # mode is the owner's
+    dashboard.history.init_app(app)
+    if app.config['SHARED_STATE_NAME']:
+        # Views read the owner process's snapshot and history buffers instead
+        # of running a plant
+        from . import shared_state
+        dashboard.engine = shared_state.init_app(app, dashboard.engine, dashboard.writer)
+        dashboard.history = shared_state.remote_history(app)
+    else:
+        # Start advancing the plant in the background, independent of requests.
+        # atexit runs in reverse order: the engine stops first, then the writer
+        # flushes whatever the last ticks produced, then the final checkpoint
+        # is written.
+        dashboard.writer.init_app(app)
+        atexit.register(dashboard.writer.stop)
+    realtime.init_app(app, dashboard.engine)
+    if dashboard.warm_role_views not in dashboard.engine.listeners:
+        dashboard.engine.add_listener(dashboard.warm_role_views)
+    dashboard.engine.init_app(app)
+    atexit.register(dashboard.engine.stop)
+
+    return app
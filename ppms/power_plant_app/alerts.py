@@ -0,0 +1,244 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+
+from .simulation import module_type_for
+
+
+class Rule(ABC):
+    """
+    Base for alert rules. A rule applies to one module (module_name), to
+    every module of a type (module_type), or to all modules. check() sees
+    one module's latest data plus a per-(rule, module) memory dict and
+    returns a message when the alert fires.
+    """
+
+    def __init__(self, name, module_type=None, module_name=None):
+        self.name = name
+        self.module_type = module_type
+        self.module_name = module_name
+
+    def applies_to(self, module_name, module_type):
+        if self.module_name is not None:
+            return module_name == self.module_name
+        return self.module_type is None or module_type == self.module_type
+
+    @abstractmethod
+    def check(self, module_name, data, memory):
+        """Returns the alert message, or None."""
+
+
+class ThresholdRule(Rule):
+    """
+    Fires when field goes above `above` (or below `below`) and stays quiet
+    until the value is back past `clear`, so a value hovering at the limit
+    doesn't alert every tick.
+    """
+
+    def __init__(self, name, field, above=None, below=None, clear=None, **target):
+        super().__init__(name, **target)
+        self.field = field
+        self.above = above
+        self.below = below
+        self.clear = clear if clear is not None else (above if above is not None else below)
+
+    def check(self, module_name, data, memory):
+        value = data.get(self.field)
+        if value is None:
+            return None
+        if memory.get('active'):
+            if (self.above is not None and value <= self.clear) or (self.below is not None and value >= self.clear):
+                memory['active'] = False
+            return None
+        if self.above is not None and value > self.above:
+            memory['active'] = True
+            return f"{self.name}: {module_name} {self.field} {value:.1f} is above {self.above}."
+        if self.below is not None and value < self.below:
+            memory['active'] = True
+            return f"{self.name}: {module_name} {self.field} {value:.1f} is below {self.below}."
+        return None
+
+
+class RateOfChangeRule(Rule):
+    """
+    Fires when field changed by more than max_change over the last `window`
+    evaluations. The window is a bounded deque, so each check is O(1).
+    """
+
+    def __init__(self, name, field, window, max_change, **target):
+        super().__init__(name, **target)
+        self.field = field
+        self.window = window
+        self.max_change = max_change
+
+    def check(self, module_name, data, memory):
+        value = data.get(self.field)
+        if value is None:
+            return None
+        values = memory.get('values')
+        if values is None:
+            values = memory['values'] = deque(maxlen=self.window + 1)
+        values.append(value)
+        change = values[-1] - values[0]
+        if abs(change) <= self.max_change:
+            memory['active'] = False
+            return None
+        if memory.get('active'):
+            return None
+        memory['active'] = True
+        return (f"{self.name}: {module_name} {self.field} changed by {change:+.1f} "
+                f"over {len(values) - 1} ticks.")
+
+
+class StatusTransitionRule(Rule):
+    """Fires whenever a module's status goes from from_status to to_status."""
+
+    def __init__(self, name, from_status, to_status, **target):
+        super().__init__(name, **target)
+        self.from_status = from_status
+        self.to_status = to_status
+
+    def check(self, module_name, data, memory):
+        status = data.get('status')
+        previous = memory.get('status')
+        memory['status'] = status
+        if previous == self.from_status and status == self.to_status:
+            return f"{self.name}: {module_name} went from {previous} to {status}."
+        return None
+
+
+DEFAULT_RULES = [
+    ThresholdRule('Reactor overheating', 'temp_c', above=340, clear=335, module_type='reactor'),
+    RateOfChangeRule('Reactor temperature rising fast', 'temp_c', window=10, max_change=5, module_type='reactor'),
+    ThresholdRule('Boiler overpressure', 'pressure_psi', above=2250, clear=2230, module_type='boiler'),
+    ThresholdRule('Turbine overspeed', 'rpm', above=1850, clear=1830, module_type='turbine'),
+    ThresholdRule('Turbine underspeed', 'rpm', below=1750, clear=1770, module_type='turbine'),
+    StatusTransitionRule('Module shut down', 'shutting_down', 'Offline'),
+    StatusTransitionRule('Module online', 'starting_up', 'Online'),
+]
+
+
+class AlertEngine:
+    """
+    Evaluates alert rules against each published snapshot, as an engine
+    listener. The engine calls it from the tick thread or from a request
+    thread that applied an action, one snapshot at a time, and a lock keeps
+    direct callers in line too. Only modules that changed since the last
+    snapshot evaluated are checked, rules are resolved per module once, and
+    the rolling state each rule needs lives in memory instead of being
+    re-read from history.
+    The notifications a tick raises are deduplicated, capped, and handed to
+    the report writer to insert in its next batch.
+    """
+
+    def __init__(self, rules=None, writer=None, cooldown=300.0, max_per_tick=20, budget=0.05, module_types=None):
+        self.rules = list(DEFAULT_RULES if rules is None else rules)
+        self.module_types = module_types or {}   # overrides module_type_for(), e.g. for fleets
+        self.writer = writer
+        self.cooldown = cooldown
+        self.max_per_tick = max_per_tick
+        self.budget = budget
+        self.app = None
+        self.memory = {}         # (rule index, module name) -> rule state
+        self._rules_for = {}     # module name -> [(rule index, rule)]
+        self._last_sent = {}     # message key -> time of the last notification
+        self.evaluated_version = None
+        self.lock = threading.Lock()
+        self.last_duration = 0.0
+        self.overruns = 0
+        self.sent = 0
+
+    def init_app(self, app, engine, writer):
+        self.app = app
+        self.writer = writer
+        self.cooldown = app.config.get('ALERT_COOLDOWN', self.cooldown)
+        self.max_per_tick = app.config.get('ALERT_MAX_PER_TICK', self.max_per_tick)
+        self.budget = app.config.get('ALERT_BUDGET_MS', self.budget * 1000) / 1000
+        if app.config.get('ALERTS_ENABLED', True) and self.evaluate not in engine.listeners:
+            engine.add_listener(self.evaluate)
+
+    def add_rule(self, rule):
+        self.rules.append(rule)
+        self._rules_for = {}
+
+    def rules_for(self, module_name):
+        rules = self._rules_for.get(module_name)
+        if rules is None:
+            module_type = self.module_types.get(module_name) or module_type_for(module_name)
+            rules = self._rules_for[module_name] = [
+                (i, rule) for i, rule in enumerate(self.rules) if rule.applies_to(module_name, module_type)]
+        return rules
+
+    def evaluate(self, published):
+        """Checks the modules changed since the last snapshot evaluated; returns the alert messages raised."""
+        with self.lock:
+            return self._evaluate(published)
+
+    def _evaluate(self, published):
+        started = time.perf_counter()
+        alerts = []
+        version = published.version
+        state = published.state
+        memory = self.memory
+        since = self.evaluated_version
+        if since is None or since >= version:
+            # First snapshot, or the engine was replaced: just this version's changes
+            since = version - 1
+        self.evaluated_version = version
+        for (category, name), changed in published.module_versions.items():
+            if changed <= since:
+                continue
+            data = state[category][name]
+            for i, rule in self.rules_for(name):
+                key = (i, name)
+                rule_memory = memory.get(key)
+                if rule_memory is None:
+                    rule_memory = memory[key] = {}
+                message = rule.check(name, data, rule_memory)
+                if message:
+                    alerts.append((key, message))
+
+        messages = self._dedupe(alerts)
+        if messages:
+            self._emit(messages)
+        self.last_duration = time.perf_counter() - started
+        if self.last_duration > self.budget:
+            self.overruns += 1
+            if self.app is not None:
+                self.app.logger.warning('Alert rules took %.1f ms for %d modules',
+                                        self.last_duration * 1000, len(published.module_versions))
+        return messages
+
+    def _dedupe(self, alerts):
+        # The same rule on the same module notifies at most once per cooldown,
+        # however often it flaps in between
+        now = time.monotonic()
+        messages = []
+        suppressed = 0
+        for key, message in alerts:
+            last = self._last_sent.get(key)
+            if last is not None and now - last < self.cooldown:
+                continue
+            if len(messages) >= self.max_per_tick:
+                suppressed += 1
+                continue
+            self._last_sent[key] = now
+            messages.append(message)
+        if suppressed:
+            messages.append(f"{suppressed} more alerts were raised in the same tick.")
+        return messages
+
+    def _emit(self, messages):
+        self.sent += len(messages)
+        if self.writer is not None:
+            timestamp = datetime.utcnow()
+            self.writer.submit_notifications([{'message': m[:300], 'timestamp': timestamp} for m in messages])
+
+
+alert_engine = AlertEngine()
+
+
+def init_app(app, engine, writer):
+    alert_engine.init_app(app, engine, writer)
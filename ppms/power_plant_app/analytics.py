@@ -0,0 +1,166 @@
+import threading
+from collections import OrderedDict
+
+import polars as pl
+from flask import current_app
+from sqlalchemy import func
+
+from . import db
+from .archive import scan_reports
+from .models import PlantReport
+
+# Nameplate output by module type, for capacity factors
+RATED_POWER_MW = {'reactor': 1000.0}
+TEMPERATURE_PERCENTILES = (50, 95, 99)
+TRANSITIONS = {'startup': 'starting_up', 'shutdown': 'shutting_down'}
+
+
+def with_durations(frame, max_gap):
+    """
+    Adds `dt`, the seconds each sample stands for: the time until the same
+    module's next sample, capped at max_gap so an outage doesn't count as
+    time spent in the last status. A module's last sample gets its median
+    interval.
+    """
+    frame = frame.sort('module_name', 'timestamp')
+    dt = (pl.col('timestamp').shift(-1).over('module_name') - pl.col('timestamp')).dt.total_microseconds() / 1e6
+    frame = frame.with_columns(dt.alias('dt'))
+    return frame.with_columns(
+        pl.col('dt').fill_null(pl.col('dt').median().over('module_name')).fill_null(0).clip(0, max_gap))
+
+
+def compute_kpis(frame, max_gap=10.0, rated_power=None):
+    """
+    Per-module KPIs over a LazyFrame of PlantReport columns, computed with
+    polars group-bys rather than per row in Python. Returns module name ->
+    dict of samples, covered_seconds, mean/peak power, energy_mwh,
+    capacity_factor, temperature percentiles, seconds per status and
+    startup/shutdown durations. Transitions cut off by either end of the
+    range aren't counted.
+    """
+    rated_power = RATED_POWER_MW if rated_power is None else rated_power
+    frame = with_durations(frame, max_gap)
+    run = (pl.col('status') != pl.col('status').shift(1)).fill_null(True).cum_sum().over('module_name')
+    frame = frame.with_columns(run.alias('run'))
+    power = pl.col('power_output_mw')
+
+    summary = frame.group_by('module_name').agg(
+        pl.col('module_type').first(),
+        pl.len().alias('samples'),
+        pl.col('dt').sum().alias('covered_seconds'),
+        power.mean().alias('power_mean_mw'),
+        power.max().alias('power_peak_mw'),
+        ((power * pl.col('dt')).sum() / 3600).alias('energy_mwh'),
+        pl.col('run').max().alias('runs'),
+        *[pl.col('temperature_c').quantile(p / 100, interpolation='linear').alias(f'temp_p{p}')
+          for p in TEMPERATURE_PERCENTILES],
+    )
+    statuses = frame.group_by('module_name', 'status').agg(pl.col('dt').sum())
+    runs = frame.filter(pl.col('status').is_in(list(TRANSITIONS.values()))).group_by(
+        'module_name', 'run').agg(pl.col('status').first(), pl.col('dt').sum())
+    summary, statuses, runs = pl.collect_all([summary, statuses, runs])
+
+    kpis = {}
+    for row in summary.iter_rows(named=True):
+        name = row.pop('module_name')
+        rated = rated_power.get(row['module_type'])
+        if row['power_mean_mw'] is None:
+            row['energy_mwh'] = None
+        row['capacity_factor'] = (row['energy_mwh'] * 3600 / (rated * row['covered_seconds'])
+                                  if rated and row['energy_mwh'] is not None and row['covered_seconds'] else None)
+        row['status_seconds'] = {}
+        row.update({kind: [] for kind in TRANSITIONS})
+        kpis[name] = row
+    for name, status, seconds in statuses.iter_rows():
+        kpis[name]['status_seconds'][status or 'unknown'] = seconds
+    kinds = {status: kind for kind, status in TRANSITIONS.items()}
+    for name, run_number, status, seconds in runs.sort('module_name', 'run').iter_rows():
+        if 1 < run_number < kpis[name]['runs']:
+            kpis[name][kinds[status]].append(seconds)
+
+    for row in kpis.values():
+        del row['runs']
+        for kind in TRANSITIONS:
+            durations = row.pop(kind)
+            row[kind + 's'] = {
+                'count': len(durations),
+                'mean_seconds': sum(durations) / len(durations) if durations else None,
+                'max_seconds': max(durations) if durations else None,
+            }
+    return kpis
+
+
+class KPICache:
+    """
+    Memoizes KPI results per (range, module set). An entry remembers the
+    newest PlantReport id it has seen; when more rows have landed since, one
+    indexed lookup over just the new ids tells whether any fall inside the
+    entry's range. Closed ranges in the past therefore stay cached while the
+    plant keeps writing, and ranges that new data reaches are recomputed.
+    Least recently used entries are evicted past max_entries.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()   # key -> (newest id seen, kpis)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, start, end, compute):
+        newest = db.session.query(func.max(PlantReport.id)).scalar() or 0
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is not None:
+            seen, kpis = entry
+            if seen == newest or (seen < newest and not self._landed_in_range(seen, start, end)):
+                with self.lock:
+                    self.entries[key] = (newest, kpis)
+                    self.hits += 1
+                return kpis
+        kpis = compute()
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = (newest, kpis)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return kpis
+
+    def _landed_in_range(self, seen, start, end):
+        # A rowid range scan over only the new rows, whatever their timestamps
+        first, last = db.session.query(func.min(PlantReport.timestamp), func.max(PlantReport.timestamp)).filter(
+            PlantReport.id > seen).one()
+        if first is None:
+            return False
+        return (end is None or first < end) and (start is None or last >= start)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+
+cache = KPICache()
+
+
+def module_kpis(start=None, end=None, module_names=None, module_type=None):
+    """
+    KPIs for the selected modules from start to end (end exclusive), read
+    from the Parquet archive and the live table and memoized in `cache`.
+    """
+    module_names = sorted(module_names or ())
+    key = (start, end, tuple(module_names), module_type)
+    config = current_app.config
+    return cache.get(key, start, end, lambda: compute_kpis(
+        scan_reports(start, end, module_names=module_names, module_type=module_type),
+        max_gap=config.get('ANALYTICS_MAX_GAP', 10.0),
+        rated_power=config.get('RATED_POWER_MW') or RATED_POWER_MW,
+    ))
+
+
+def init_app(app):
+    cache.max_entries = app.config.get('ANALYTICS_CACHE_SIZE', cache.max_entries)
+    cache.clear()
@@ -0,0 +1,261 @@
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import click
+import polars as pl
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+from . import db
+from .models import PlantReport, ReportArchive
+from .queries import reports_query
+from .rollups import _prune_table
+from .simulation import module_id_for
+
+COLUMNS = ['timestamp', 'module_name', 'module_type', 'status', 'power_output_mw', 'temperature_c']
+SCHEMA = {
+    'timestamp': pl.Datetime('us'),
+    'module_name': pl.String,
+    'module_type': pl.String,
+    'status': pl.String,
+    'power_output_mw': pl.Float64,
+    'temperature_c': pl.Float64,
+}
+
+
+def archive_dir():
+    return current_app.config.get('ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+
+
+def partition_path(day, module_name):
+    """archive/day=2025-01-01/reactor_1.parquet"""
+    return os.path.join(archive_dir(), f'day={day.isoformat()}', f'{module_id_for(module_name)}.parquet')
+
+
+def archived_until():
+    """The first day not in the archive. Days are archived oldest first, so everything before it is."""
+    last = db.session.query(func.max(ReportArchive.day)).scalar()
+    return last + timedelta(days=1) if last else None
+
+
+def read_frame(stmt, chunk_size=50000):
+    """Runs a select of COLUMNS and builds a DataFrame from it chunk by chunk."""
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    frames = [pl.DataFrame([tuple(row) for row in chunk], schema=SCHEMA, orient='row')
+              for chunk in result.partitions()]
+    return pl.concat(frames) if frames else pl.DataFrame(schema=SCHEMA)
+
+
+def spool_frame(stmt, directory, chunk_size=50000):
+    """
+    Like read_frame, but writes each chunk to a Parquet file in `directory`
+    and returns a LazyFrame over them, so at most one chunk is in memory.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    paths = []
+    for i, chunk in enumerate(result.partitions()):
+        path = os.path.join(directory, f'live-{i:06d}.parquet')
+        pl.DataFrame([tuple(row) for row in chunk], schema=SCHEMA, orient='row').write_parquet(path)
+        paths.append(path)
+    return pl.scan_parquet(paths) if paths else pl.DataFrame(schema=SCHEMA).lazy()
+
+
+def read_module_day(day, module_name, chunk_size=50000):
+    """One module's PlantReport rows for one day, read in chunks along the (module_name, timestamp) index."""
+    start = datetime.combine(day, datetime.min.time())
+    return read_frame(select(*[getattr(PlantReport, name) for name in COLUMNS]).where(
+        PlantReport.module_name == module_name,
+        PlantReport.timestamp >= start, PlantReport.timestamp < start + timedelta(days=1),
+    ).order_by(PlantReport.timestamp), chunk_size)
+
+
+def day_modules(day):
+    """Names of the modules with PlantReport rows on `day`."""
+    start = datetime.combine(day, datetime.min.time())
+    return [name for (name,) in db.session.query(PlantReport.module_name).filter(
+        PlantReport.timestamp >= start, PlantReport.timestamp < start + timedelta(days=1),
+    ).distinct().order_by(PlantReport.module_name)]
+
+
+def archive_reports(before, delete=False, chunk_size=50000):
+    """
+    Writes every complete day of PlantReport before `before` (a date) that
+    isn't archived yet to zstd-compressed Parquet, one file per day and
+    module, holding one module-day in memory at a time. Files are written
+    under a temporary name and renamed, and the
+    day is recorded in ReportArchive only once all its files exist. With
+    delete=True the archived raw rows are removed from the live table;
+    rollups are kept. Returns the archived days.
+    """
+    before = min(before, datetime.utcnow().date())
+    first = archived_until()
+    if first is None:
+        oldest = db.session.query(func.min(PlantReport.timestamp)).scalar()
+        if oldest is None:
+            return []
+        first = oldest.date()
+    days = []
+    day = first
+    while day < before:
+        # Skip straight to the next day that has rows
+        next_ts = db.session.query(func.min(PlantReport.timestamp)).filter(
+            PlantReport.timestamp >= datetime.combine(day, datetime.min.time())).scalar()
+        if next_ts is None or next_ts.date() >= before:
+            break
+        day = next_ts.date()
+        row_count = 0
+        for module_name in day_modules(day):
+            part = read_module_day(day, module_name, chunk_size)
+            path = partition_path(day, module_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            part.write_parquet(path + '.tmp', compression='zstd', statistics=True)
+            os.replace(path + '.tmp', path)
+            row_count += part.height
+        db.session.add(ReportArchive(day=day, row_count=row_count))
+        db.session.commit()
+        if delete:
+            prune_archived(day)
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def prune_archived(day, batch_size=5000):
+    """Deletes one archived day's raw rows from the live table."""
+    archive = db.session.get(ReportArchive, day)
+    if archive is None:
+        raise ValueError(f'{day} has not been archived')
+    start = datetime.combine(day, datetime.min.time())
+    deleted = _prune_table(PlantReport.__table__, (PlantReport.timestamp >= start) &
+                           (PlantReport.timestamp < start + timedelta(days=1)), batch_size)
+    archive.pruned = True
+    db.session.commit()
+    return deleted
+
+
+def archived_partitions(cutoff, start=None, end=None, module_names=None):
+    """(day, [Parquet paths]) for the archived days before `cutoff` that overlap start..end, oldest first."""
+    days = db.session.query(ReportArchive.day).filter(ReportArchive.day < cutoff).order_by(ReportArchive.day)
+    if start is not None:
+        days = days.filter(ReportArchive.day >= start.date())
+    if end is not None:
+        days = days.filter(ReportArchive.day <= end.date())
+    wanted = {module_id_for(name) + '.parquet' for name in module_names or ()}
+    partitions = []
+    for (day,) in days:
+        folder = os.path.join(archive_dir(), f'day={day.isoformat()}')
+        if os.path.isdir(folder):
+            paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                     if name.endswith('.parquet') and (not wanted or name in wanted)]
+            if paths:
+                partitions.append((day, paths))
+    return partitions
+
+
+def live_start(cutoff, start):
+    """Where the live table takes over from the archive: archived days are always read from Parquet."""
+    if cutoff is None:
+        return start
+    boundary = datetime.combine(cutoff, datetime.min.time())
+    return boundary if start is None else max(start, boundary)
+
+
+def _select(frame, start, end, module_names, module_type):
+    if start is not None:
+        frame = frame.filter(pl.col('timestamp') >= start)
+    if end is not None:
+        frame = frame.filter(pl.col('timestamp') < end)
+    if module_names:
+        frame = frame.filter(pl.col('module_name').is_in(list(module_names)))
+    if module_type is not None:
+        frame = frame.filter(pl.col('module_type') == module_type)
+    return frame
+
+
+def scan_reports(start=None, end=None, module_names=None, module_type=None, spool_dir=None):
+    """
+    A LazyFrame of PlantReport rows from start to end (end exclusive) that
+    reads archived days from Parquet and the rest from the live table. Only
+    the partitions for the requested days and modules are opened, and the
+    remaining filters are pushed down into the Parquet scan. The live rows
+    are read into memory, or with spool_dir spooled to Parquet files there,
+    which must outlive the frame.
+    """
+    cutoff = archived_until()
+    frames = []
+    if cutoff is not None and (start is None or start.date() < cutoff):
+        paths = [path for _, day_paths in archived_partitions(cutoff, start, end, module_names) for path in day_paths]
+        if paths:
+            frames.append(pl.scan_parquet(paths))
+    live_from = live_start(cutoff, start)
+    if end is None or live_from is None or live_from < end:
+        query = reports_query(module_type=module_type, module_names=module_names, start=live_from, end=end, newest_first=False)
+        columns = [getattr(PlantReport, name) for name in COLUMNS]
+        stmt = query.with_entities(*columns).statement
+        frames.append(spool_frame(stmt, spool_dir) if spool_dir else read_frame(stmt).lazy())
+
+    frame = pl.concat(frames) if frames else pl.DataFrame(schema=SCHEMA).lazy()
+    return _select(frame, start, end, module_names, module_type).sort('timestamp')
+
+
+def iter_reports(columns, start=None, end=None, module_names=None, module_type=None, batch_size=1000):
+    """
+    Yields tuples of `columns` for the same rows as scan_reports(), oldest
+    first, without collecting the range: archived days are read from
+    Parquet one day at a time, then the live table in batches of batch_size.
+    """
+    cutoff = archived_until()
+    if cutoff is not None and (start is None or start.date() < cutoff):
+        for day, paths in archived_partitions(cutoff, start, end, module_names):
+            frame = _select(pl.scan_parquet(paths), start, end, module_names, module_type)
+            yield from frame.sort('timestamp').select(columns).collect().iter_rows()
+    live_from = live_start(cutoff, start)
+    if end is None or live_from is None or live_from < end:
+        query = reports_query(module_type=module_type, module_names=module_names, start=live_from, end=end, newest_first=False)
+        yield from query.with_entities(*[getattr(PlantReport, name) for name in columns]).yield_per(batch_size)
+
+
+def export_parquet(frame, path):
+    """
+    Streams a LazyFrame into a zstd-compressed Parquet file at `path`, so a
+    long range is never collected into memory. Returns the path.
+    """
+    frame.sink_parquet(path, compression='zstd')
+    return path
+
+
+def parse_day(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+@click.command('archive-reports')
+@click.option('--before', help='Archive complete days before this date (YYYY-MM-DD); default today.')
+@click.option('--delete', is_flag=True, help='Remove the archived rows from the live table.')
+@with_appcontext
+def archive_reports_command(before, delete):
+    """Write old PlantReport days to the Parquet archive."""
+    days = archive_reports(parse_day(before) if before else datetime.utcnow().date(), delete=delete)
+    click.echo(f'Archived {len(days)} day(s) to {archive_dir()}.')
+
+
+@click.command('export-reports')
+@click.argument('start')
+@click.argument('end')
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--module', 'modules', multiple=True, help='Module name; repeatable. Default: all modules.')
+@with_appcontext
+def export_reports_command(start, end, output, modules):
+    """Export PlantReport rows from START to END (exclusive, YYYY-MM-DD) to a Parquet file."""
+    with tempfile.TemporaryDirectory(prefix='ppms-export-') as spool:
+        frame = scan_reports(datetime.combine(parse_day(start), datetime.min.time()),
+                             datetime.combine(parse_day(end), datetime.min.time()),
+                             module_names=list(modules), spool_dir=spool)
+        export_parquet(frame, output)
+    click.echo(f'Wrote {output}.')
+
+
+def init_app(app):
+    app.cli.add_command(archive_reports_command)
+    app.cli.add_command(export_reports_command)
@@ -1,17 +1,81 @@
+import csv
+import io
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, g
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import insert
 from . import db
 from .models import User
+from .passwords import HashingBusy, hasher
 from functools import wraps
 
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
+ROLES = ['admin', 'operator', 'safety', 'environment']
+IMPORT_MAX_USERS = 1000
+BUSY_MESSAGE = 'The server is busy, please try again in a moment.'
+
+# What a request needs to know about the logged-in user. Deliberately not
+# the ORM object, so it can be cached across requests and threads.
+Identity = namedtuple('Identity', ['id', 'username', 'role'])
+
+
+class IdentityCache:
+    """
+    In-process LRU cache of user id -> Identity with a TTL. Entries are
+    invalidated when an admin changes a user; the TTL bounds how long other
+    worker processes can serve a stale role.
+    """
+
+    def __init__(self, max_size=1024, ttl=60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.max_size = app.config.get('IDENTITY_CACHE_SIZE', self.max_size)
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', self.ttl)
+        self.clear()
+
+    def get(self, user_id):
+        """Returns the Identity for user_id, loading it on a miss; None if no such user."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        identity = Identity(user.id, user.username, user.role)
+        with self._lock:
+            self._entries[user_id] = (identity, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return identity
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+identity_cache = IdentityCache()
+
 
 @bp.before_app_request
 def load_logged_in_user():
     user_id = session.get('user_id')
-    g.user = User.query.get(user_id) if user_id else None
+    g.user = identity_cache.get(user_id) if user_id else None
 
 
 @bp.app_context_processor
@@ -35,13 +99,18 @@ def register():
             flash('Username and password are required.', 'error')
         elif User.query.filter_by(username=username).first():
             flash('Username already exists.', 'error')
-        elif role not in ['admin', 'operator', 'safety', 'environment']:
+        elif role not in ROLES:
             flash('Invalid role selected.', 'error')
         else:
             # --- User Creation Logic ---
+            try:
+                password_hash = hasher.hash(password)
+            except HashingBusy:
+                flash(BUSY_MESSAGE, 'error')
+                return render_template('register.html'), 503
             user = User(
                 username=username,
-                password_hash=generate_password_hash(password),
+                password_hash=password_hash,
                 role=role
             )
             db.session.add(user)
@@ -80,6 +149,46 @@ def role_required(*roles):
 @login_required
 @role_required('admin')
 def manage_users():
+    if request.method == 'POST' and request.form.get('action') == 'update_role':
+        user = db.session.get(User, request.form.get('user_id', type=int))
+        role = request.form.get('role', '').strip().lower()
+        if user is None:
+            flash('User not found.', 'error')
+        elif role not in ROLES:
+            flash('Invalid role selected.', 'error')
+        else:
+            user.role = role
+            db.session.commit()
+            # The user's next request must see the new role, not the cached one
+            identity_cache.invalidate(user.id)
+            flash(f'Role for "{user.username}" changed to {role}.', 'success')
+        return redirect(url_for('auth.manage_users'))
+
+    if request.method == 'POST' and request.form.get('action') == 'import':
+        upload = request.files.get('users_file')
+        try:
+            rows = parse_user_import(upload.filename, upload.read()) if upload else []
+        except (ValueError, UnicodeDecodeError, csv.Error) as error:
+            rows = None
+            flash(f'Could not read the file: {error}', 'error')
+        if rows is not None:
+            errors = validate_user_import(rows)
+            if not rows:
+                flash('No users to import.', 'error')
+            elif errors:
+                # All or nothing, so a corrected file can simply be uploaded again
+                for message in errors[:10]:
+                    flash(message, 'error')
+                if len(errors) > 10:
+                    flash(f'... and {len(errors) - 10} more problems. No users were imported.', 'error')
+            else:
+                try:
+                    import_users(rows)
+                    flash(f'Imported {len(rows)} users.', 'success')
+                except HashingBusy:
+                    flash(BUSY_MESSAGE, 'error')
+        return redirect(url_for('auth.manage_users'))
+
     if request.method == 'POST':
         # --- This is the complete logic from your original register function ---
         username = request.form.get('username', '').strip()
@@ -90,12 +199,17 @@ def manage_users():
             flash('Username and password are required.', 'error')
         elif User.query.filter_by(username=username).first():
             flash('Username already exists.', 'error')
-        elif role not in ['admin', 'operator', 'safety', 'environment']:
+        elif role not in ROLES:
             flash('Invalid role selected.', 'error')
         else:
+            try:
+                password_hash = hasher.hash(password)
+            except HashingBusy:
+                flash(BUSY_MESSAGE, 'error')
+                return redirect(url_for('auth.manage_users'))
             user = User(
                 username=username,
-                password_hash=generate_password_hash(password),
+                password_hash=password_hash,
                 role=role,
             )
             db.session.add(user)
@@ -107,7 +221,54 @@ def manage_users():
             
     # Fetch all existing users to display them on the page
     all_users = User.query.all()
-    return render_template('manage_users.html', users=all_users)
+    return render_template('manage_users.html', users=all_users, roles=ROLES, import_max_users=IMPORT_MAX_USERS)
+
+def parse_user_import(filename, data):
+    """
+    [{username, password, role}] from an uploaded .json file (a list of
+    objects) or CSV file (with a username,password,role header row). A
+    missing role means operator.
+    """
+    text = data.decode('utf-8-sig')
+    if filename.lower().endswith('.json'):
+        rows = json.loads(text)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError('expected a JSON list of {"username", "password", "role"} objects')
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    return [{
+        'username': str(row.get('username') or '').strip(),
+        'password': str(row.get('password') or '').strip(),
+        'role': str(row.get('role') or 'operator').strip().lower(),
+    } for row in rows]
+
+def validate_user_import(rows):
+    """One message per problem with the rows; empty if every user can be created."""
+    if len(rows) > IMPORT_MAX_USERS:
+        return [f'At most {IMPORT_MAX_USERS} users can be imported at once.']
+    errors = []
+    usernames = [row['username'] for row in rows]
+    taken = {name for (name,) in db.session.query(User.username).filter(User.username.in_(usernames))}
+    seen = set()
+    for number, row in enumerate(rows, 1):
+        username = row['username']
+        if not username or not row['password']:
+            errors.append(f'Row {number}: username and password are required.')
+        elif username in taken or username in seen:
+            errors.append(f'Row {number}: username "{username}" already exists.')
+        elif row['role'] not in ROLES:
+            errors.append(f'Row {number}: invalid role "{row["role"]}".')
+        seen.add(username)
+    return errors
+
+def import_users(rows):
+    """Hashes the passwords in parallel and inserts all the users in one transaction."""
+    hashes = hasher.hash_many([row['password'] for row in rows])
+    db.session.execute(insert(User.__table__), [
+        {'username': row['username'], 'password_hash': password_hash, 'role': row['role']}
+        for row, password_hash in zip(rows, hashes)
+    ])
+    db.session.commit()
 
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -117,9 +278,18 @@ def login():
         next_url = request.args.get('next') or url_for('dashboard.nuclear_dashboard')
 
         user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password_hash, password):
+        password_hash = user.password_hash if user else None
+        user_id = user.id if user else None
+        # End the read so its pooled connection isn't held while the hash runs
+        db.session.rollback()
+        try:
+            valid = password_hash is not None and hasher.check(password_hash, password)
+        except HashingBusy:
+            flash(BUSY_MESSAGE, 'error')
+            return render_template('login.html'), 503
+        if valid:
             session.clear()
-            session['user_id'] = user.id
+            session['user_id'] = user_id
             return redirect(next_url)
         else:
             flash('Invalid username or password.', 'error')
@@ -0,0 +1,206 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import func
+
+from . import db
+from .models import PlantReport
+from .simulation import PowerPlantSimulator
+
+FORMAT_VERSION = 1
+# Added to the checkpointed state version on restore. The running process
+# may have published versions past the last checkpoint; jumping well beyond
+# them keeps a client's old ETag or ?since= from matching a different state.
+VERSION_GAP = 1_000_000
+
+
+def simulator_classes():
+    from .vector_sim import VectorSimulator
+    return {'dict': PowerPlantSimulator, 'vector': VectorSimulator}
+
+
+def save(path, meta, arrays):
+    """
+    Writes a checkpoint as an uncompressed .npz: the arrays as stored plus
+    the meta as JSON bytes, so loading never unpickles anything. The file is
+    written and fsynced under a temporary name, then renamed over the old
+    one, so a crash leaves either the old or the new checkpoint.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    meta = dict(meta, format=FORMAT_VERSION)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez(f, meta=np.frombuffer(json.dumps(meta, separators=(',', ':')).encode(), dtype=np.uint8), **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path):
+    """Returns (meta, arrays) from a checkpoint written by save()."""
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(data['meta'].tobytes())
+        arrays = {name: data[name] for name in data.files if name != 'meta'}
+    if meta.get('format') != FORMAT_VERSION:
+        raise ValueError(f'unsupported checkpoint format {meta.get("format")!r}')
+    return meta, arrays
+
+
+def build_simulator(meta, arrays, backend):
+    """The checkpointed simulator, converted to `backend` if it was saved from the other one."""
+    classes = simulator_classes()
+    simulator = classes[meta['backend']].from_checkpoint(meta, arrays)
+    if meta['backend'] != backend:
+        simulator_class = classes[backend]
+        if backend == 'vector':
+            simulator = simulator_class(simulator.state)
+        else:
+            converted = simulator_class()
+            converted.state = simulator.state
+            converted._index_modules()
+            simulator = converted
+    return simulator
+
+
+def replay_reports(simulator, since):
+    """
+    Rolls a restored simulator forward to the newest PlantReport row of each
+    module written after the checkpoint was taken. Returns the rows applied.
+    """
+    latest = db.session.query(func.max(PlantReport.id)).filter(
+        PlantReport.timestamp > since).group_by(PlantReport.module_name)
+    rows = db.session.query(PlantReport.module_name, PlantReport.status, PlantReport.power_output_mw,
+                            PlantReport.temperature_c).filter(PlantReport.id.in_(latest)).all()
+    for row in rows:
+        simulator.apply_report(*row)
+    return len(rows)
+
+
+class Checkpointer:
+    """
+    Periodically saves the engine's simulator so a restart resumes where the
+    plant was. As an engine listener it copies the simulator's state under
+    the engine lock at most every `interval` seconds (array copies for the
+    vectorized simulator); a background thread does the encoding and the
+    atomic write, so the tick thread never waits on the disk. Only the
+    newest pending copy is written.
+    """
+
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self.path = None
+        self.app = None
+        self.engine = None
+        self.saved = 0
+        self.last_saved_version = None
+        self._next_capture = 0
+        self._pending = None
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def init_app(self, app, engine):
+        self.app = app
+        self.engine = engine
+        self.interval = app.config.get('CHECKPOINT_INTERVAL', self.interval)
+        self.path = app.config.get('CHECKPOINT_PATH') or os.path.join(app.instance_path, 'plant-checkpoint.npz')
+        if app.config.get('CHECKPOINT_RESTORE', True) and os.path.exists(self.path):
+            try:
+                self.restore(app.config.get('CHECKPOINT_REPLAY', True))
+            except Exception:
+                app.logger.exception('Could not restore the plant from %s; starting fresh', self.path)
+        if self.interval and self.on_publish not in engine.listeners:
+            engine.add_listener(self.on_publish)
+
+    def restore(self, replay=True):
+        """Swaps a simulator rebuilt from the checkpoint file into the engine."""
+        started = time.perf_counter()
+        meta, arrays = load(self.path)
+        simulator = build_simulator(meta, arrays, self.app.config.get('SIMULATOR_BACKEND', 'dict'))
+        replayed = 0
+        if replay:
+            with self.app.app_context():
+                replayed = replay_reports(simulator, datetime.fromisoformat(meta['saved_at']))
+        self.engine.use_simulator(simulator, version=meta['version'] + VERSION_GAP)
+        self.app.logger.info('Restored the plant from %s (saved %s, %d report rows replayed) in %.1f ms',
+                             self.path, meta['saved_at'], replayed, (time.perf_counter() - started) * 1000)
+        return meta
+
+    def capture(self):
+        """Copies the simulator state under the engine lock; returns (meta, arrays)."""
+        with self.engine.lock:
+            meta, arrays = self.engine.simulator.checkpoint()
+            meta['version'] = self.engine.published.version
+            meta['saved_at'] = datetime.utcnow().isoformat()
+        return meta, arrays
+
+    def on_publish(self, published):
+        # Engine listener; the first publish after startup or a checkpoint
+        # marks the plant as changed
+        self._dirty = True
+        now = time.monotonic()
+        if now < self._next_capture:
+            return
+        self._next_capture = now + self.interval
+        with self._lock:
+            self._pending = self.capture()
+        self.start()
+        self._wake.set()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='plant-checkpoint', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            self.write_pending()
+
+    def write_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        meta, arrays = pending
+        try:
+            save(self.path, meta, arrays)
+            self.saved += 1
+            self.last_saved_version = meta['version']
+        except Exception:
+            if self.app is not None:
+                self.app.logger.exception('Could not write plant checkpoint %s', self.path)
+
+    def stop(self):
+        """
+        Writes a final checkpoint at shutdown so a graceful restart is exact.
+        Skipped if the engine never published here, e.g. in a web worker
+        that reads the plant from shared memory.
+        """
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._dirty and self.engine is not None:
+            with self._lock:
+                self._pending = self.capture()
+            self.write_pending()
+            self._dirty = False
+
+
+checkpointer = Checkpointer()
+
+
+def init_app(app, engine):
+    checkpointer.init_app(app, engine)
@@ -1,160 +1,423 @@
-import copy
-import csv
-from io import StringIO
-from flask import Blueprint, jsonify, render_template, request, g, make_response, redirect, url_for, flash, Response
-from .simulation import PowerPlantSimulator
-from .models import PlantReport
-from .auth import login_required, role_required
-from .models import User, MaintenanceSchedule, Notification
+from flask import Blueprint, current_app, jsonify, render_template, request, g, make_response, redirect, url_for, flash, Response, abort, stream_with_context, send_file
+from .simulation import PowerPlantSimulator, module_id_for
+from .engine import TickEngine
+from .persistence import ReportWriter
+from .maintenance import scheduler
+from .history import HistoryStore, bucket_arrays, bucket_points
+from .queries import module_series, reports_query
+from .exports import iter_csv
+from .archive import export_parquet, iter_reports, scan_reports
+from .analytics import module_kpis
+from .render_cache import fragment
+from .auth import ROLES, login_required, role_required
+from .models import User, MaintenanceSchedule, Notification, PlantReport
 from . import db 
-from datetime import datetime
+import os
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from jinja2.utils import htmlsafe_json_dumps
 
 
 bp = Blueprint('dashboard', __name__)
 
+NOTIFICATIONS_PER_PAGE = 25
+MAX_BULK_ACTIONS = 100
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+MAX_HISTORY_WINDOW = 366 * 86400   # seconds; longer windows and steps are refused
+
 simulator = PowerPlantSimulator()
+writer = ReportWriter()
+history = HistoryStore()
+engine = TickEngine(simulator, writer, history=history)
+
+def filter_by_role(state, role_name):
+    """Returns only the categories the given role is allowed to see."""
+    if role_name == 'admin':
+        return state
+    filtered = {}
+    for category, modules in state.items():
+        if role_name == 'operator' and category != 'Operation Module':
+            continue
+        if role_name == 'safety' and category != 'Safety Module':
+            continue
+        if role_name == 'environment' and category != 'Environmental & Compliance Module':
+            continue
+        filtered[category] = modules
+    return filtered
+
+def role_state(published, role):
+    """The role's slice of a snapshot, built once per version and shared."""
+    return published.view(('state', role), lambda: filter_by_role(published.state, role))
+
+def role_json(published, role):
+    """
+    The role's slice encoded once per version. HTML-safe, so the same string
+    is the API body and is embedded in the dashboard page as is.
+    """
+    return published.view(('json', role), lambda: htmlsafe_json_dumps(role_state(published, role)))
+
+def role_module_names(published, role):
+    """Module id -> name for the modules the role can see."""
+    return published.view(('names', role), lambda: {
+        module_id_for(name): name for modules in role_state(published, role).values() for name in modules})
+
+def warm_role_views(published):
+    # Engine listener: encode every role's view on the tick thread so
+    # requests only look it up
+    for role in ROLES:
+        role_json(published, role)
+
+def current_role():
+    return g.user.role if getattr(g, 'user', None) else 'operator'
 
 @bp.route('/api/plant_data')
 @login_required
 def get_plant_data_api():
-    simulator.update() # Run one simulation step
-    return jsonify(simulator.state)
+    """
+    Serves the caller's role's view of the latest snapshot, encoded once per
+    version. The ETag is the state version, so a client
+    that already has it gets a 304. With ?since=<version> only the modules
+    that changed after that version are returned.
+    """
+    # The tick engine advances the plant; polls only read the latest snapshot
+    published = engine.published
+    role = current_role()
+    etag = str(published.version)
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        since = request.args.get('since', type=int)
+        if since is None:
+            response = Response(role_json(published, role), mimetype='application/json')
+        elif since > published.version:
+            # The client saw a version from before a restart; send everything
+            response = jsonify({'version': published.version, 'since': None,
+                                'changes': role_state(published, role)})
+        else:
+            response = jsonify({'version': published.version, 'since': since,
+                                'changes': filter_by_role(published.changes_since(since), role)})
+    response.set_etag(etag)
+    response.headers['X-State-Version'] = etag
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@bp.route('/api/history/<module_id>')
+@login_required
+def module_history(module_id):
+    """
+    One module's power/temperature series over the last `window` (default
+    15m), one point per sample or per `step`. Both take seconds or a number
+    with s/m/h/d. The part of the window still held in memory is served
+    from there; only older data is read from PlantReport or its rollups.
+    """
+    name = role_module_names(engine.published, current_role()).get(module_id)
+    if name is None:
+        abort(404)
+    try:
+        window = parse_duration(request.args.get('window', '15m'))
+        step = parse_duration(request.args.get('step', '0'))
+    except ValueError:
+        abort(400, description='Invalid window or step.')
+
+    end = datetime.utcnow()
+    start = end - timedelta(seconds=window)
+    covered_from, times, power, temp = history.series(name, start, end)
+    points = []
+    source = 'memory'
+    if covered_from is None or start < covered_from:
+        # Cut on a step boundary so no bucket is built from both sources
+        cut = min(covered_from or end, end)
+        if step and cut > start:
+            steps = -(-(cut - start).total_seconds() // step)
+            cut = start + timedelta(seconds=steps * step)
+        points = bucket_points(module_series(name, start, cut), start, step)
+        source = 'database' if covered_from is None else 'mixed'
+        if covered_from is not None:
+            covered_from, times, power, temp = history.series(name, cut, end)
+    points.extend(bucket_arrays(times, power, temp, start, step))
+    for point in points:
+        point['timestamp'] = point['timestamp'].isoformat()
+    return jsonify({'module': name, 'window': window, 'step': step, 'source': source, 'points': points})
+
+def parse_duration(value, maximum=MAX_HISTORY_WINDOW):
+    """'90' or '90s' -> 90, '15m' -> 900, '1h' -> 3600 (seconds), up to `maximum`."""
+    unit = DURATION_UNITS.get(value[-1:])
+    number = float(value[:-1] if unit else value)
+    # Also rejects nan and inf, which would overflow timedelta further on
+    if not 0 <= number * (unit or 1) <= maximum:
+        raise ValueError(value)
+    return number * (unit or 1)
+
+def render_page(template, version, build_context):
+    """
+    render_template() with conditional GET. The ETag covers the page's data
+    version and everything else in it that differs between users (user,
+    role, unread notification count), so a client that already has this
+    page gets a 304 without it being rendered. build_context() returns the
+    template context and is only called when the page is rendered.
+    """
+    if not current_app.config.get('RENDER_CACHE_ETAGS', True):
+        return render_template(template, **build_context())
+    etag = f'{request.endpoint}-{version}-{g.user.id}-{g.user.role}-{unread_notification_count()}'
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = make_response(render_template(template, **build_context()))
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 @bp.route('/')
 @bp.route('/nuclear_dashboard')
 @login_required
 def nuclear_dashboard():
-    full_state = copy.deepcopy(simulator.state)
-    role = getattr(g, 'user', None).role if getattr(g, 'user', None) else 'operator'
-
-    def filter_by_role(state, role_name):
-        if role_name == 'admin':
-            return state
-        filtered = {}
-        for category, modules in state.items():
-            if role_name == 'operator' and category != 'Operation Module':
-                continue
-            if role_name == 'safety' and category != 'Safety Module':
-                continue
-            if role_name == 'environment' and category != 'Environmental & Compliance Module':
-                continue
-            filtered[category] = modules
-        return filtered
-
-    categorized = filter_by_role(full_state, role)
-    return render_template('nuclear_dashboard.html', categorized_modules=categorized)
+    published = engine.published
+    role = current_role()
+
+    def build_context():
+        module_grid = fragment(('nuclear_dashboard', role, published.version), 'module_grid.html',
+                               lambda: {'categorized_modules': role_state(published, role)})
+        return {'module_grid': module_grid, 'categorized_json': role_json(published, role),
+                'state_version': published.version}
+
+    return render_page('nuclear_dashboard.html', published.version, build_context)
 
 @bp.route('/module_action', methods=['POST'])
 @login_required
 def module_action():
-    data = request.get_json()
-    module_id = data.get('module_id')
-    action = data.get('action')
-    
-    # Tell the simulator to handle the user's action
-    message = simulator.handle_action(module_id, action)
-    
-    return jsonify({"status": "success", "message": message})
+    """
+    Applies one action ({module_id, action}), one action to every module of
+    a type ({module_type, action}), or a list of either ({actions: [...]}).
+    All of them are applied between the same two ticks.
+    """
+    data = request.get_json(silent=True) or {}
+    actions = data.get('actions')
+    if actions is None:
+        actions = [data]
+    if not isinstance(actions, list) or len(actions) > MAX_BULK_ACTIONS \
+            or not all(isinstance(a, dict) for a in actions):
+        abort(400, description='Invalid actions.')
+
+    # Tell the simulator to handle the user's actions
+    results = engine.handle_actions(actions)
+
+    if 'actions' not in data and 'module_type' not in data:
+        return jsonify({"status": "success", "message": results[0]['message']})
+    return jsonify({"status": "success", "results": results})
 
 @bp.route('/reports')
 @login_required
 def reports():
-    all_reports = PlantReport.query.order_by(PlantReport.timestamp.desc()).limit(100).all()
+    """
+    Recent reactor reports and the KPIs of the last 24 complete hours. The
+    same for every role, so the rendered body is cached per data version:
+    the newest PlantReport id, which moves whenever the report writer (in
+    this or any other process) commits, and the KPI window's end hour.
+    """
+    newest_id = db.session.query(func.max(PlantReport.id)).scalar() or 0
+    end = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    version = f'{newest_id}.{end:%Y%m%d%H}'
+    return render_page('reports.html', version, lambda: {
+        'content': fragment(('reports', version), 'reports_content.html', lambda: reports_context(end))})
+
+def reports_context(end):
     grouped_reports = {}
-    
-    all_reports = PlantReport.query.filter(         #only reactor
-        PlantReport.module_name.like('%Reactor%')
-    ).order_by(PlantReport.timestamp.desc()).limit(500).all()
+
+    all_reports = reports_query(module_type='reactor').limit(500).all()     #only reactor
     
     for report in all_reports:
         if report.module_name not in grouped_reports:
             grouped_reports[report.module_name] = []
         grouped_reports[report.module_name].append(report)
 
-    return render_template('reports.html', grouped_reports=grouped_reports)
+    # KPIs over the last 24 complete hours, so repeat views hit the cache
+    kpis = module_kpis(end - timedelta(hours=24), end, module_type='reactor')
+    return {'grouped_reports': grouped_reports, 'kpis': kpis, 'kpi_start': end - timedelta(hours=24), 'kpi_end': end}
 
 
-@bp.route('/reports/export.csv')
+@bp.route('/api/analytics')
 @login_required
-def export_reports_csv():
-    reports = PlantReport.query.filter(
-        PlantReport.module_name.like('%Reactor%')
-    ).order_by(PlantReport.timestamp.asc()).all()
+def analytics_api():
+    """
+    Per-module KPIs (capacity factor, mean/peak power, temperature
+    percentiles, time in each status, startup/shutdown durations) from start
+    to end. Takes the same parameters as the CSV export; start defaults to
+    24 hours before end, and end to the start of the current minute.
+    """
+    try:
+        start = parse_report_datetime(request.args.get('start'))
+        end = parse_report_datetime(request.args.get('end'), end_of_day=True)
+    except ValueError:
+        abort(400, description='Invalid date/time format.')
+    # A whole minute, so repeated default views share one KPI cache entry
+    end = end or datetime.utcnow().replace(second=0, microsecond=0)
+    start = start or end - timedelta(hours=24)
+    if start >= end:
+        abort(400, description='start must be before end.')
+    modules = request.args.getlist('module')
+    kpis = module_kpis(start, end, module_names=modules, module_type=None if modules else 'reactor')
+    return jsonify({'start': start.isoformat(), 'end': end.isoformat(), 'modules': kpis})
 
-    si = StringIO()
-    cw = csv.writer(si)
 
-    cw.writerow(['Timestamp (UTC)', 'Module Name', 'Status', 'Power (MW)', 'Temp (°C)'])
+@bp.route('/reports/export.csv')
+@login_required
+def export_reports_csv():
+    """
+    Streams reactor reports as CSV. Optional query parameters:
+    start / end (YYYY-MM-DD or YYYY-MM-DDTHH:MM, end is exclusive and a bare
+    date includes that whole day), module (repeatable) and gzip=1.
+    """
+    try:
+        start = parse_report_datetime(request.args.get('start'))
+        end = parse_report_datetime(request.args.get('end'), end_of_day=True)
+    except ValueError:
+        abort(400, description='Invalid date/time format.')
+    modules = request.args.getlist('module')
+    compress = request.args.get('gzip') == '1'
 
-    for report in reports:
-        cw.writerow([
-            report.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            report.module_name,
-            report.status,
-            report.power_output_mw,
-            report.temperature_c
-        ])
+    # Plain column tuples, archived days read from Parquet one day at a time
+    # and the live table in batches; no ORM objects, no full result list
+    rows = iter_reports(['timestamp', 'module_name', 'status', 'power_output_mw', 'temperature_c'],
+                        start, end, module_names=modules, module_type=None if modules else 'reactor')
 
-    output = si.getvalue()
+    filename = 'reactor_reports.csv.gz' if compress else 'reactor_reports.csv'
     return Response(
-        output,
-        mimetype="text/csv",
+        stream_with_context(iter_csv(rows, compress=compress)),
+        mimetype="application/gzip" if compress else "text/csv",
         headers={"Content-disposition":
-                 "attachment; filename=reactor_reports.csv"})
+                 f"attachment; filename={filename}"})
+
+@bp.route('/reports/export.parquet')
+@login_required
+def export_reports_parquet():
+    """
+    The same selection as export.csv as one zstd-compressed Parquet file,
+    with module type and all columns. Archived days are read from the
+    Parquet archive, newer ones from the live table.
+    """
+    try:
+        start = parse_report_datetime(request.args.get('start'))
+        end = parse_report_datetime(request.args.get('end'), end_of_day=True)
+    except ValueError:
+        abort(400, description='Invalid date/time format.')
+    modules = request.args.getlist('module')
+    # Live rows are spooled to disk in chunks and the export is written to a
+    # file that is streamed back, so memory stays flat however long the range
+    spool = tempfile.TemporaryDirectory(prefix='ppms-export-')
+    try:
+        frame = scan_reports(start, end, module_names=modules, module_type=None if modules else 'reactor',
+                             spool_dir=spool.name)
+        path = export_parquet(frame, os.path.join(spool.name, 'export.parquet'))
+        response = send_file(path, mimetype='application/vnd.apache.parquet', as_attachment=True,
+                             download_name='reactor_reports.parquet', conditional=False)
+    except BaseException:
+        spool.cleanup()
+        raise
+    response.call_on_close(spool.cleanup)
+    return response
+
+def parse_report_datetime(value, end_of_day=False):
+    if not value:
+        return None
+    if 'T' in value:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M')
+    day = datetime.strptime(value, '%Y-%m-%d')
+    return day + timedelta(days=1) if end_of_day else day
 
 @bp.route('/notifications')
 @login_required
 def notifications():
-    # Mark all notifications as read when the user visits this page
-    all_notifs = Notification.query.order_by(Notification.timestamp.desc()).all()
-    for notif in all_notifs:
-        if g.user not in notif.read_by_users:
-            notif.read_by_users.append(g.user)
-    db.session.commit()
-    
-    return render_template('notifications.html', notifications=all_notifs)
+    page = request.args.get('page', 1, type=int)
+
+    # Mark all notifications as read when the user visits this page: one
+    # UPDATE moving the user's watermark up to the newest notification. The
+    # commit comes before the page is loaded; it would expire the loaded
+    # rows and cost the template a SELECT per notification.
+    last_read_id = db.session.query(User.last_read_notification_id).filter(User.id == g.user.id).scalar()
+    newest_id = db.session.query(func.max(Notification.id)).scalar() or 0
+    if newest_id > last_read_id:
+        User.query.filter(User.id == g.user.id, User.last_read_notification_id < newest_id).update(
+            {User.last_read_notification_id: newest_id}, synchronize_session=False)
+        db.session.commit()
+
+    notifs = Notification.query.order_by(Notification.id.desc()).paginate(
+        page=page, per_page=NOTIFICATIONS_PER_PAGE, error_out=False)
+    return render_template('notifications.html', notifications=notifs, last_read_id=last_read_id)
+
+@bp.before_app_request
+def forget_unread_count():
+    # g outlives the request when an app context was already pushed
+    g.pop('unread_notification_count', None)
+
+def unread_notification_count():
+    """The logged-in user's unread notifications, counted once per request."""
+    if 'unread_notification_count' not in g:
+        # Primary-key range count; cost follows the unread backlog, not history.
+        # The watermark is read in the same query, so it is never stale.
+        watermark = db.session.query(User.last_read_notification_id).filter(User.id == g.user.id).scalar_subquery()
+        g.unread_notification_count = Notification.query.filter(Notification.id > watermark).count()
+    return g.unread_notification_count
 
 @bp.app_context_processor
 def inject_notifications():
     if g.user:
-        unread_count = db.session.query(Notification).filter(~Notification.read_by_users.any(id=g.user.id)).count()
-        return {'unread_notification_count': unread_count}
+        return {'unread_notification_count': unread_notification_count()}
     return {'unread_notification_count': 0}
 
 @bp.route('/schedule_maintenance', methods=['GET', 'POST'])
 @login_required
 @role_required('safety')
 def schedule_maintenance():
+    # All module names, to fill the dropdown and to check the posted one
+    all_modules = []
+    for category in engine.snapshot.values():
+        all_modules.extend(category.keys())
+
     if request.method == 'POST':
         module_name = request.form.get('module_name')
         schedule_str = request.form.get('schedule_datetime')
-        
+        duration = request.form.get('duration_minutes', 60, type=int)
+        # Minutes the browser's clock is behind UTC at the chosen time, set by
+        # the form's script; without it the time is taken as UTC
+        utc_offset = request.form.get('utc_offset', 0, type=int)
+
         try:
+            if module_name not in all_modules:
+                raise ValueError('module')
+            # Jobs are stored and compared in UTC, like every other timestamp
             schedule_dt = datetime.strptime(schedule_str, '%Y-%m-%dT%H:%M')
-            
+            if abs(utc_offset) > 14 * 60:
+                raise ValueError('utc_offset')
+            schedule_dt += timedelta(minutes=utc_offset)
+            if not duration or duration < 1:
+                raise ValueError('duration')
+
             # 1. Create the maintenance schedule entry
             new_schedule = MaintenanceSchedule(
                 module_name=module_name,
                 scheduled_for_datetime=schedule_dt,
-                scheduled_by_username=g.user.username
+                scheduled_by_username=g.user.username,
+                duration_minutes=duration
             )
             db.session.add(new_schedule)
             
             # 2. Create a notification for everyone
-            notif_message = f"Maintenance for '{module_name}' scheduled for {schedule_dt.strftime('%Y-%m-%d %H:%M')} by {g.user.username}."
+            notif_message = f"Maintenance for '{module_name}' scheduled for {schedule_dt.strftime('%Y-%m-%d %H:%M')} UTC by {g.user.username}."
             new_notification = Notification(message=notif_message)
             db.session.add(new_notification)
             
             db.session.commit()
+            # 3. Hand the job to the scheduler, which carries it out when due
+            scheduler.add(new_schedule)
             flash('Maintenance scheduled successfully and notification sent.', 'success')
             return redirect(url_for('dashboard.nuclear_dashboard'))
             
-        except ValueError:
-            flash('Invalid date/time format.', 'error')
+        except (TypeError, ValueError):
+            flash('Invalid module, date/time or duration.', 'error')
 
-    # For the GET request, get a list of all module names for the dropdown
-    all_modules = []
-    for category in simulator.state.values():
-        all_modules.extend(category.keys())
-        
-    return render_template('schedule_maintenance.html', modules=sorted(all_modules))
\ No newline at end of file
+    upcoming = [{'due': due, 'module_name': module_name, 'kind': kind, 'duration': duration}
+                for due, job_id, kind, module_name, duration in scheduler.upcoming()]
+    return render_template('schedule_maintenance.html', modules=sorted(all_modules), upcoming=upcoming)
\ No newline at end of file
@@ -0,0 +1,231 @@
+import copy
+import threading
+import time
+from collections import deque
+
+
+class Snapshot:
+    """
+    One published plant state. Nothing mutates it after publication, so
+    readers can use it without locking. Each module remembers the version in
+    which it last changed, which lets clients ask for just the differences.
+    """
+
+    def __init__(self, version, state, module_versions):
+        self.version = version
+        self.state = state
+        self.module_versions = module_versions
+        self._views = {}
+
+    def view(self, key, build):
+        """
+        Returns build() computed once per snapshot and cached under key, for
+        derived forms of the state (per-role filtering, encoded JSON). Like
+        the state, a view must be treated as read-only.
+        """
+        try:
+            return self._views[key]
+        except KeyError:
+            # Two threads may race to build the same view; both results are equal
+            value = self._views[key] = build()
+            return value
+
+    def changes_since(self, since):
+        """Returns {category: {module: data}} for modules changed after `since`."""
+        changes = {}
+        for (category, name), version in self.module_versions.items():
+            if version > since:
+                changes.setdefault(category, {})[name] = self.state[category][name]
+        return changes
+
+
+class TickEngine:
+    """
+    Owns the simulator and advances it at a fixed rate on a background
+    thread. Readers never step the simulation themselves; they get the
+    latest published snapshot instead.
+    """
+
+    def __init__(self, simulator, writer=None, interval=1.0, history=None):
+        self.simulator = simulator
+        self.writer = writer
+        self.history = history
+        self.interval = interval
+        self.app = None
+        self.lock = threading.Lock()
+        self.tick_count = 0
+        self.published = self._make_snapshot(None, simulator)
+        self.listeners = []
+        # Published snapshots not yet handed to the listeners, in order
+        self._undelivered = deque()
+        self._dispatch_lock = threading.Lock()
+        # Optional tick_observer(update_s, publish_s, notify_s, samples),
+        # called after every tick with how long each phase took
+        self.tick_observer = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        """Reads the engine settings from the app config and starts ticking."""
+        self.app = app
+        self.interval = app.config.get('SIM_TICK_INTERVAL', self.interval)
+        if app.config.get('SIM_TICK_ENGINE', True):
+            self.start()
+
+    def use_simulator(self, simulator, version=None):
+        """
+        Swaps in a different simulator (e.g. the vectorized one, or one
+        restored from a checkpoint) and republishes. With `version`, the new
+        snapshot gets that version and every module is marked changed in it.
+        """
+        with self.lock:
+            self.simulator = simulator
+            published = self._make_snapshot(None, simulator)
+            if version is not None:
+                published = Snapshot(version, published.state, dict.fromkeys(published.module_versions, version))
+            self.published = published
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='sim-tick-engine', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def snapshot(self):
+        """The latest published plant state."""
+        return self.published.state
+
+    @property
+    def version(self):
+        return self.published.version
+
+    def add_listener(self, callback):
+        """
+        Registers callback(published) to run after every published Snapshot.
+        Each snapshot reaches the listeners once, in version order, and only
+        one thread runs listeners at a time.
+        """
+        self.listeners.append(callback)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def tick(self):
+        """Runs one simulation step and publishes the resulting state."""
+        started = time.perf_counter()
+        with self.lock:
+            samples = self.simulator.update()
+            updated = time.perf_counter()
+            self.tick_count += 1
+            self._publish()
+        published = time.perf_counter()
+        self._notify()
+        if self.tick_observer is not None:
+            self.tick_observer(updated - started, published - updated, time.perf_counter() - published, len(samples))
+        if self.history is not None:
+            self.history.record(samples)
+        # Persistence is write-behind; this only blocks if the writer is backed up
+        if self.writer is not None:
+            self.writer.submit(samples)
+
+    def handle_action(self, module_id, action):
+        """Applies an operator action between ticks and republishes the state."""
+        return self.handle_actions([{'module_id': module_id, 'action': action}])[0]['message']
+
+    def handle_actions(self, actions):
+        """
+        Applies a list of {'module_id' or 'module_type', 'action'} requests
+        under one lock acquisition and publishes once. A module_type targets
+        every module of that type. Returns one result dict per module.
+        """
+        results = []
+        with self.lock:
+            for request in actions:
+                action = request.get('action')
+                if request.get('module_type'):
+                    module_ids = self.simulator.module_ids(request['module_type'])
+                else:
+                    module_ids = [request.get('module_id')]
+                for module_id in module_ids:
+                    results.append({'module_id': module_id, 'action': action,
+                                    'message': self.simulator.handle_action(module_id, action)})
+            self._publish()
+        self._notify()
+        return results
+
+    def _make_snapshot(self, previous, simulator):
+        state = simulator.state
+        if not getattr(simulator, 'state_is_copy', False):
+            state = copy.deepcopy(state)
+        private = getattr(simulator, 'private_fields', ())
+        if private:
+            # The simulator's own bookkeeping stays out of what clients see
+            for modules in state.values():
+                for data in modules.values():
+                    for field in private:
+                        if field in data:
+                            del data[field]
+        if previous is None:
+            module_versions = {(category, name): 0 for category, modules in state.items() for name in modules}
+            return Snapshot(0, state, module_versions)
+        version = previous.version + 1
+        module_versions = dict(previous.module_versions)
+        for category, modules in state.items():
+            old_modules = previous.state.get(category, {})
+            for name, data in modules.items():
+                if old_modules.get(name) != data:
+                    module_versions[(category, name)] = version
+        return Snapshot(version, state, module_versions)
+
+    def _publish(self):
+        # The snapshot is replaced, never mutated, so readers can hold on to it
+        # without taking the lock. Queued for the listeners under the lock, so
+        # they see versions in the order they were published.
+        self.published = self._make_snapshot(self.published, self.simulator)
+        self._undelivered.append(self.published)
+
+    def _notify(self):
+        # Listeners run outside the lock so a slow subscriber can't stall
+        # ticks. Whichever thread gets the dispatch lock delivers every queued
+        # snapshot; a publish that finds it taken (another thread, or a
+        # listener that republishes) leaves its snapshot to that thread.
+        while self._undelivered:
+            if not self._dispatch_lock.acquire(blocking=False):
+                return
+            try:
+                while self._undelivered:
+                    published = self._undelivered.popleft()
+                    for callback in self.listeners:
+                        try:
+                            callback(published)
+                        except Exception:
+                            if self.app is not None:
+                                self.app.logger.exception('Snapshot listener failed')
+            finally:
+                self._dispatch_lock.release()
+
+    def _run(self):
+        # Schedule against a fixed timeline so a slow tick doesn't push every
+        # following tick back; if we fall badly behind, resync instead of bursting.
+        next_tick = time.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                self.tick()
+            except Exception:
+                if self.app is not None:
+                    self.app.logger.exception('Simulation tick failed')
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()
+                delay = 0
+            self._stop_event.wait(delay)
@@ -0,0 +1,40 @@
+import csv
+import zlib
+from io import StringIO
+
+CSV_HEADER = ['Timestamp (UTC)', 'Module Name', 'Status', 'Power (MW)', 'Temp (°C)']
+
+
+def iter_csv(rows, compress=False, chunk_size=64 * 1024):
+    """
+    Turns (timestamp, module_name, status, power, temp) rows into CSV text
+    and yields it in chunks of about chunk_size bytes, optionally gzipped.
+    Only one chunk is held in memory at a time, however many rows there are.
+    The header goes out on its own first, before the rows are fetched.
+    """
+    si = StringIO()
+    cw = csv.writer(si)
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def drain(sync=False):
+        data = si.getvalue().encode('utf-8')
+        si.seek(0)
+        si.truncate()
+        if not gzip:
+            return data
+        # A sync flush makes zlib emit what it has buffered instead of waiting for more
+        return gzip.compress(data) + (gzip.flush(zlib.Z_SYNC_FLUSH) if sync else b'')
+
+    cw.writerow(CSV_HEADER)
+    yield drain(sync=True)
+    for timestamp, module_name, status, power, temp in rows:
+        cw.writerow([timestamp.strftime('%Y-%m-%d %H:%M:%S'), module_name, status, power, temp])
+        if si.tell() >= chunk_size:
+            chunk = drain()
+            if chunk:
+                yield chunk
+    chunk = drain()
+    if gzip:
+        chunk += gzip.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,172 @@
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_seconds(ts):
+    # Sample timestamps are naive UTC; datetime.timestamp() would assume local time
+    return (ts - EPOCH).total_seconds()
+
+
+def from_seconds(seconds):
+    return EPOCH + timedelta(seconds=seconds)
+
+
+class ModuleHistory:
+    """Fixed-size ring buffers of one module's recent samples, one array per metric."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.power = np.full(capacity, np.nan)
+        self.temp = np.full(capacity, np.nan)
+        self.head = 0    # next slot to write
+        self.count = 0
+
+    def append(self, seconds, power, temp):
+        i = self.head
+        self.times[i] = seconds
+        self.power[i] = np.nan if power is None else power
+        self.temp[i] = np.nan if temp is None else temp
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def oldest(self):
+        return self.times[(self.head - self.count) % self.capacity] if self.count else None
+
+    def between(self, start, end):
+        """Copies of (times, power, temp) with start <= time < end, oldest first."""
+        order = (np.arange(self.head - self.count, self.head)) % self.capacity
+        times = self.times[order]
+        lo, hi = np.searchsorted(times, [start, end])
+        keep = order[lo:hi]
+        return self.times[keep], self.power[keep], self.temp[keep]
+
+
+class HistoryStore:
+    """
+    Recent per-module samples kept in memory, so charts of the last minutes
+    or hour never query PlantReport while the writer is inserting into it.
+    The tick engine records every tick's samples; anything older than the
+    buffers hold is read from the database instead.
+    """
+
+    def __init__(self, capacity=3600):
+        self.capacity = capacity
+        self.modules = {}
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        interval = app.config.get('SIM_TICK_INTERVAL') or 1.0
+        capacity = int(app.config.get('HISTORY_SECONDS', 3600) / interval)
+        if capacity != self.capacity:
+            with self.lock:
+                self.capacity = capacity
+                self.modules = {}
+
+    def record(self, samples):
+        if not self.capacity or not samples:
+            return
+        seconds = None
+        last_ts = None
+        with self.lock:
+            for sample in samples:
+                # One tick's samples share a timestamp; convert it once
+                if sample['timestamp'] is not last_ts:
+                    last_ts = sample['timestamp']
+                    seconds = to_seconds(last_ts)
+                module = self.modules.get(sample['module_name'])
+                if module is None:
+                    module = self.modules[sample['module_name']] = ModuleHistory(self.capacity)
+                module.append(seconds, sample.get('power_output_mw'), sample.get('temperature_c'))
+
+    def series(self, module_name, start, end):
+        """
+        Returns (covered_from, times, power, temp) for start <= t < end from
+        memory. covered_from is the datetime from which memory is complete;
+        the caller has to fetch anything before it elsewhere. It is None if
+        nothing is held for the module.
+        """
+        with self.lock:
+            module = self.modules.get(module_name)
+            if module is None or not module.count:
+                return None, None, None, None
+            oldest = module.oldest()
+            # A buffer that hasn't wrapped yet holds everything since startup;
+            # either way nothing before its oldest sample is in memory
+            times, power, temp = module.between(to_seconds(start), to_seconds(end))
+        return from_seconds(oldest), times, power, temp
+
+
+def _none_if_nan(value):
+    return None if value != value else value
+
+
+def bucket_arrays(times, power, temp, start, step):
+    """
+    Turns raw sample arrays into series points (the module_series format),
+    one per sample, or one per step-second bucket aligned to start.
+    """
+    if times is None or not len(times):
+        return []
+    if not step:
+        return [{
+            'timestamp': from_seconds(t), 'samples': 1,
+            'power_min': p, 'power_avg': p, 'power_max': p,
+            'temp_min': c, 'temp_avg': c, 'temp_max': c,
+        } for t, p, c in zip(times.tolist(), map(_none_if_nan, power.tolist()), map(_none_if_nan, temp.tolist()))]
+
+    origin = to_seconds(start)
+    keys = ((times - origin) // step).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    columns = {'samples': np.diff(np.r_[starts, len(times)]).tolist()}
+    for prefix, values in (('power', power), ('temp', temp)):
+        valid = ~np.isnan(values)
+        count = np.add.reduceat(valid, starts)
+        total = np.add.reduceat(np.where(valid, values, 0), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns[prefix + '_avg'] = np.where(count > 0, total / count, np.nan).tolist()
+        columns[prefix + '_min'] = np.fmin.reduceat(values, starts).tolist()
+        columns[prefix + '_max'] = np.fmax.reduceat(values, starts).tolist()
+    points = []
+    for i, key in enumerate(keys[starts].tolist()):
+        point = {'timestamp': from_seconds(origin + key * step)}
+        for name, column in columns.items():
+            point[name] = _none_if_nan(column[i])
+        points.append(point)
+    return points
+
+
+def bucket_points(points, start, step):
+    """Merges module_series points into step-second buckets aligned to start."""
+    if not step:
+        return points
+    buckets = {}
+    for point in points:
+        key = int((point['timestamp'] - start).total_seconds() // step)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = dict(point, timestamp=start + timedelta(seconds=key * step),
+                                         power_sum=0.0, temp_sum=0.0, power_n=0, temp_n=0)
+            bucket['samples'] = 0
+        bucket['samples'] += point['samples']
+        for prefix in ('power', 'temp'):
+            if point[prefix + '_avg'] is None:
+                continue
+            bucket[prefix + '_sum'] += point[prefix + '_avg'] * point['samples']
+            bucket[prefix + '_n'] += point['samples']
+            for extreme, fn in (('_min', min), ('_max', max)):
+                current = bucket[prefix + extreme]
+                value = point[prefix + extreme]
+                bucket[prefix + extreme] = value if current is None else fn(current, value)
+    merged = []
+    for bucket in buckets.values():
+        for prefix in ('power', 'temp'):
+            n = bucket.pop(prefix + '_n')
+            total = bucket.pop(prefix + '_sum')
+            bucket[prefix + '_avg'] = total / n if n else None
+        merged.append(bucket)
+    return merged
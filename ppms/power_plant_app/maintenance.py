@@ -0,0 +1,196 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from . import db
+from .models import MaintenanceSchedule
+from .simulation import module_id_for
+
+START = 'start'
+END = 'end'
+RESUME = 'resume'   # re-apply maintenance to a fresh plant after a restart
+
+
+class MaintenanceScheduler:
+    """
+    Carries out scheduled maintenance. Open jobs sit in a min-heap keyed by
+    when they are due, loaded once at startup with an indexed query; after
+    that, checking on each published snapshot is a look at the top of the
+    heap, and each due job is one pop. A job moves the module into the
+    'maintenance' status through the engine and restores it after
+    duration_minutes.
+
+    Every transition is a conditional UPDATE on the job's status, so a job
+    fires once even if the process restarts or two processes load it. In
+    shared-state mode only the simulation owner's engine ticks, so web
+    workers list upcoming jobs from the database instead of their heap.
+    """
+
+    def __init__(self, reload_interval=60):
+        self.reload_interval = reload_interval
+        self.app = None
+        self.engine = None
+        self.writer = None
+        self.heap = []
+        self.lock = threading.Lock()
+        self._last_id = 0
+        self._next_reload = 0
+        self._firing = threading.Lock()
+        self.from_database = False
+
+    def init_app(self, app, engine, writer):
+        self.app = app
+        self.engine = engine
+        self.writer = writer
+        self.reload_interval = app.config.get('MAINTENANCE_RELOAD_INTERVAL', self.reload_interval)
+        self.from_database = bool(app.config.get('SHARED_STATE_NAME'))
+        with app.app_context():
+            self.load()
+        if self.on_publish not in engine.listeners:
+            engine.add_listener(self.on_publish)
+
+    def load(self, now=None):
+        """Rebuilds the heap from the open jobs in the database."""
+        now = now or datetime.utcnow()
+        entries = []
+        jobs = MaintenanceSchedule.query.filter(
+            MaintenanceSchedule.status.in_(['pending', 'in_progress'])).all()
+        for job in jobs:
+            entries.extend(self._entries_for(job, now))
+        heapq.heapify(entries)
+        with self.lock:
+            self.heap = entries
+            self._last_id = db.session.query(func.max(MaintenanceSchedule.id)).scalar() or 0
+            self._next_reload = time.monotonic() + self.reload_interval
+
+    def _entries_for(self, job, now):
+        if job.status == 'pending':
+            return [(job.scheduled_for_datetime, job.id, START, job.module_name, job.duration_minutes)]
+        # In progress when the process stopped. The plant starts fresh, so put
+        # the module back under maintenance until the job's end.
+        end = job.started_at + timedelta(minutes=job.duration_minutes)
+        entries = [(end, job.id, END, job.module_name, job.duration_minutes)]
+        if end > now:
+            entries.append((now, job.id, RESUME, job.module_name, job.duration_minutes))
+        return entries
+
+    def add(self, job):
+        """Schedules a job that was just committed."""
+        with self.lock:
+            for entry in self._entries_for(job, datetime.utcnow()):
+                heapq.heappush(self.heap, entry)
+            self._last_id = max(self._last_id, job.id)
+
+    def upcoming(self, limit=20):
+        """
+        The next (due, job id, kind, module name, duration) entries, soonest
+        first: from the heap without a query, or in a process whose heap
+        is not being fired, from the database.
+        """
+        if self.from_database:
+            return self._upcoming_from_database(limit)
+        with self.lock:
+            return heapq.nsmallest(limit, self.heap)
+
+    def _upcoming_from_database(self, limit):
+        # Pending jobs in order along the (status, scheduled_for_datetime)
+        # index; running ones are few and all fetched for their END entries
+        pending = MaintenanceSchedule.query.filter(MaintenanceSchedule.status == 'pending').order_by(
+            MaintenanceSchedule.scheduled_for_datetime).limit(limit)
+        running = MaintenanceSchedule.query.filter(MaintenanceSchedule.status == 'in_progress')
+        entries = [(job.scheduled_for_datetime, job.id, START, job.module_name, job.duration_minutes)
+                   for job in pending]
+        entries.extend((job.started_at + timedelta(minutes=job.duration_minutes), job.id, END,
+                        job.module_name, job.duration_minutes) for job in running)
+        return heapq.nsmallest(limit, entries)
+
+    def on_publish(self, published):
+        # Engine listener. Applying a job republishes, which calls back in here;
+        # whoever holds the lock is already firing, so the others just return
+        if not self._firing.acquire(blocking=False):
+            return
+        try:
+            self._check(datetime.utcnow())
+        finally:
+            self._firing.release()
+
+    def _check(self, now):
+        reload_due = self.reload_interval and time.monotonic() >= self._next_reload
+        with self.lock:
+            if not reload_due and (not self.heap or self.heap[0][0] > now):
+                return
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                due.append(heapq.heappop(self.heap))
+        with self.app.app_context():
+            if reload_due:
+                self._load_new()
+            if due:
+                self.fire(due, now)
+
+    def _load_new(self):
+        # Jobs scheduled by other worker processes; an index range scan on id
+        with self.lock:
+            last_id = self._last_id
+            self._next_reload = time.monotonic() + self.reload_interval
+        for job in MaintenanceSchedule.query.filter(
+                MaintenanceSchedule.id > last_id, MaintenanceSchedule.status == 'pending'):
+            self.add(job)
+
+    def _status(self, module_name):
+        # The module's status in the latest snapshot, or None if the plant has no such module
+        for modules in self.engine.snapshot.values():
+            data = modules.get(module_name)
+            if data is not None:
+                return data.get('status')
+        return None
+
+    def fire(self, due, now):
+        """Applies due heap entries: claims each job in the database, then acts on the plant."""
+        actions = []
+        resumed = {}   # module id -> name, for RESUME entries
+        messages = []
+        table = MaintenanceSchedule.__table__
+        for due_at, job_id, kind, module_name, duration in due:
+            module_id = module_id_for(module_name)
+            if kind == START:
+                claimed = db.session.execute(table.update().where(
+                    (table.c.id == job_id) & (table.c.status == 'pending')
+                ).values(status='in_progress', started_at=now)).rowcount
+                if claimed:
+                    actions.append({'module_id': module_id, 'action': 'maintenance'})
+                    with self.lock:
+                        heapq.heappush(self.heap, (now + timedelta(minutes=duration), job_id, END, module_name, duration))
+            elif kind == RESUME:
+                # Nothing to do if the plant came back with the module still
+                # under maintenance, e.g. restored from a checkpoint
+                if self._status(module_name) not in (None, 'maintenance'):
+                    actions.append({'module_id': module_id, 'action': 'maintenance'})
+                    resumed[module_id] = module_name
+            else:
+                claimed = db.session.execute(table.update().where(
+                    (table.c.id == job_id) & (table.c.status == 'in_progress')
+                ).values(status='done', completed_at=now)).rowcount
+                if claimed:
+                    actions.append({'module_id': module_id, 'action': 'end_maintenance'})
+        db.session.commit()
+        if not actions:
+            return
+        for result in self.engine.handle_actions(actions):
+            # A resume is housekeeping after a restart: report it only if it took
+            module_id = result['module_id']
+            if module_id in resumed and self._status(resumed[module_id]) != 'maintenance':
+                continue
+            messages.append(f"Scheduled maintenance: {result['message']}")
+        if self.writer is not None:
+            self.writer.submit_notifications([{'message': m, 'timestamp': now} for m in messages])
+
+
+scheduler = MaintenanceScheduler()
+
+
+def init_app(app, engine, writer):
+    scheduler.init_app(app, engine, writer)
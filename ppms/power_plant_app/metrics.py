@@ -0,0 +1,274 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, abort, current_app, request
+from sqlalchemy import event
+
+from . import db
+
+# Upper bounds (seconds) for latency histograms; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+# Clients allowed to scrape /metrics when METRICS_TOKEN is not set
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram per label set. observe() is a bisect and a few
+    integer adds under one lock, so it is cheap enough for every request
+    and every SQL statement.
+    """
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self.series = {}   # label values -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.series.get(label_values)
+            if counts is None:
+                counts = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            counts[i] += 1
+            counts[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = {key: list(counts) for key, counts in self.series.items()}
+        for label_values, counts in sorted(series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(self.labels + ("le",), label_values + (bound,))} {cumulative}')
+            lines.append(f'{self.name}_sum{labels} {counts[-1]:.6f}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Counter:
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self.lock:
+            self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self.lock:
+            values = dict(self.values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f'{self.name}{_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Gauge:
+    """A value read when /metrics is scraped, e.g. a queue length."""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self):
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}', f'{self.name} {value}']
+
+
+class CallbackCounter(Gauge):
+    """A running total kept elsewhere (e.g. rows written), read when /metrics is scraped."""
+
+    type = 'counter'
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Registry:
+    """Collects the app's metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_seconds = registry.add(Histogram(
+    'ppms_request_seconds', 'Time from request start until the response was sent.',
+    labels=('endpoint', 'method', 'status')))
+request_queries = registry.add(Histogram(
+    'ppms_request_queries', 'SQL statements issued per request.', COUNT_BUCKETS, labels=('endpoint',)))
+sql_seconds = registry.add(Histogram(
+    'ppms_sql_seconds', 'SQL statement execution time, by statement kind.', QUERY_BUCKETS, labels=('kind',)))
+tick_seconds = registry.add(Histogram(
+    'ppms_tick_seconds', 'Time per tick phase: simulator update, publish, listeners.', labels=('phase',)))
+tick_samples = registry.add(Counter('ppms_tick_samples_total', 'PlantReport samples produced by ticks.'))
+slow_requests = registry.add(Counter(
+    'ppms_slow_requests_total', 'Requests slower than METRICS_SLOW_REQUEST_MS.', labels=('endpoint',)))
+
+# Per-thread request accounting: [statement count, seconds in SQL] while a
+# request is being served on this thread, else absent
+_local = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _local.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(_local, 'query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    _local.query_started = None
+    sql_seconds.observe(elapsed, statement.lstrip()[:6].upper())
+    stats = getattr(_local, 'request', None)
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def _before_request():
+    _local.request = [0, 0.0]
+    request.environ['ppms.started'] = time.perf_counter()
+
+
+def _after_request(response):
+    # Recorded when the response is closed, so streamed exports are timed
+    # to their last byte and count the queries made while streaming
+    stats = getattr(_local, 'request', None)
+    started = request.environ.get('ppms.started')
+    if stats is None or started is None:
+        return response
+    endpoint = request.endpoint or 'unknown'
+    method = request.method
+    status = response.status_code
+    slow_ms = current_app.config.get('METRICS_SLOW_REQUEST_MS')
+    logger = current_app.logger
+    path = request.full_path if request.query_string else request.path
+
+    def record():
+        elapsed = time.perf_counter() - started
+        request_seconds.observe(elapsed, endpoint, method, status)
+        request_queries.observe(stats[0], endpoint)
+        if slow_ms is not None and elapsed * 1000 >= slow_ms:
+            slow_requests.inc(1, endpoint)
+            logger.warning('Slow request %s %s: %.0f ms, %d SQL statements (%.0f ms)',
+                           method, path, elapsed * 1000, stats[0], stats[1] * 1000)
+        if getattr(_local, 'request', None) is stats:
+            _local.request = None
+
+    response.call_on_close(record)
+    return response
+
+
+def observe_tick(update_seconds, publish_seconds, notify_seconds, samples):
+    """TickEngine.tick_observer: called after every tick with its phase timings."""
+    tick_seconds.observe(update_seconds, 'update')
+    tick_seconds.observe(publish_seconds, 'publish')
+    tick_seconds.observe(notify_seconds, 'listeners')
+    tick_samples.inc(samples)
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+    elif request.remote_addr not in LOCAL_ADDRESSES:
+        # No token configured: only a scraper on this host may read it
+        abort(403)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def add_gauges(engine, writer):
+    """Gauges and totals read from the engine, the report writer and the caches at scrape time."""
+    from .alerts import alert_engine
+    from .analytics import cache as kpi_cache
+    from .passwords import hasher
+    from .render_cache import cache as render_cache
+    gauges = [
+        Gauge('ppms_state_version', 'Version of the latest published plant snapshot.', lambda: engine.version),
+        CallbackCounter('ppms_ticks_total', 'Ticks run by this process.', lambda: engine.tick_count),
+        CallbackCounter('ppms_report_rows_written_total', 'PlantReport rows written by the report writer.',
+              lambda: writer.rows_written),
+        CallbackCounter('ppms_report_rows_dropped_total', 'Samples dropped because the writer queue was full.',
+              lambda: writer.rows_dropped),
+        Gauge('ppms_report_queue_batches', 'Tick batches waiting for the report writer.',
+              lambda: writer.queue.qsize()),
+        Gauge('ppms_alert_evaluation_seconds', 'Duration of the last alert rule evaluation.',
+              lambda: alert_engine.last_duration),
+        CallbackCounter('ppms_alert_budget_overruns_total', 'Alert evaluations over ALERT_BUDGET_MS.',
+              lambda: alert_engine.overruns),
+        CallbackCounter('ppms_kpi_cache_hits_total', 'KPI cache hits.', lambda: kpi_cache.hits),
+        CallbackCounter('ppms_kpi_cache_misses_total', 'KPI cache misses.', lambda: kpi_cache.misses),
+        CallbackCounter('ppms_render_cache_hits_total', 'Rendered fragments served from the cache.', lambda: render_cache.hits),
+        CallbackCounter('ppms_render_cache_misses_total', 'Fragments rendered on a cache miss.', lambda: render_cache.misses),
+        Gauge('ppms_render_cache_bytes', 'HTML held by the render cache.', lambda: render_cache.size),
+        CallbackCounter('ppms_password_hash_rejected_total', 'Password hashes refused because the queue was full.',
+              lambda: hasher.rejected),
+    ]
+    for gauge in gauges:
+        registry.add(gauge)
+
+
+def init_app(app, engine, writer):
+    """
+    Times every request, SQL statement and tick and serves the results at
+    /metrics. `engine` must be the TickEngine itself (not a shared-state
+    reader), so tick timings are recorded in the process that runs it.
+    """
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    # First in line, so queries made by other before_request hooks (e.g.
+    # loading the logged-in user) are counted against the request
+    app.before_request_funcs.setdefault(None, []).insert(0, _before_request)
+    app.after_request(_after_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    with app.app_context():
+        for sa_engine in db.engines.values():
+            if not event.contains(sa_engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(sa_engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(sa_engine, 'after_cursor_execute', _after_cursor_execute)
+    engine.tick_observer = observe_tick
+    add_gauges(engine, writer)
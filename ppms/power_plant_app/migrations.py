@@ -0,0 +1,79 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from . import db
+from .models import MaintenanceSchedule, PlantReport, User
+from .simulation import module_type_for
+
+
+def upgrade_schema():
+    """
+    Brings a database created by an older version of the app up to date.
+    db.create_all() only creates missing tables, so new columns and indexes
+    on existing tables are added here. Every step is safe to run repeatedly.
+    """
+    inspector = inspect(db.engine)
+    if inspector.has_table(PlantReport.__tablename__):
+        _add_plant_report_module_type(inspector)
+        for index in PlantReport.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+    if inspector.has_table(User.__tablename__):
+        _add_user_notification_watermark(inspector)
+    if inspector.has_table(MaintenanceSchedule.__tablename__):
+        _add_maintenance_schedule_status(inspector)
+        for index in MaintenanceSchedule.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
+
+
+def _add_plant_report_module_type(inspector):
+    columns = {column['name'] for column in inspector.get_columns(PlantReport.__tablename__)}
+    if 'module_type' in columns:
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text('ALTER TABLE plant_report ADD COLUMN module_type VARCHAR(50)'))
+        # There are only a handful of distinct module names, so backfill per name
+        names = conn.execute(text('SELECT DISTINCT module_name FROM plant_report')).scalars().all()
+        for name in names:
+            conn.execute(
+                text('UPDATE plant_report SET module_type = :module_type WHERE module_name = :name'),
+                {'module_type': module_type_for(name), 'name': name},
+            )
+
+
+def _add_user_notification_watermark(inspector):
+    """
+    Replaces the notification_reads association (one row per user per
+    notification) with User.last_read_notification_id. The old notifications
+    page marked every existing notification read on each visit, so a user's
+    read set was always everything up to some id: its maximum is an exact
+    watermark.
+    """
+    columns = {column['name'] for column in inspector.get_columns(User.__tablename__)}
+    with db.engine.begin() as conn:
+        if 'last_read_notification_id' not in columns:
+            conn.execute(text(
+                'ALTER TABLE "user" ADD COLUMN last_read_notification_id INTEGER NOT NULL DEFAULT 0'))
+        if inspector.has_table('notification_reads'):
+            conn.execute(text(
+                'UPDATE "user" SET last_read_notification_id = MAX(last_read_notification_id, COALESCE('
+                '(SELECT MAX(notification_id) FROM notification_reads WHERE user_id = "user".id), 0))'))
+            conn.execute(text('DROP TABLE notification_reads'))
+
+
+def _add_maintenance_schedule_status(inspector):
+    """
+    Adds the columns the maintenance scheduler tracks jobs with. Jobs whose
+    time had already passed were never carried out; they are marked skipped
+    rather than all firing at once on the first start after the upgrade.
+    """
+    columns = {column['name'] for column in inspector.get_columns(MaintenanceSchedule.__tablename__)}
+    if 'status' in columns:
+        return
+    with db.engine.begin() as conn:
+        conn.execute(text('ALTER TABLE maintenance_schedule ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT 60'))
+        conn.execute(text("ALTER TABLE maintenance_schedule ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'pending'"))
+        conn.execute(text('ALTER TABLE maintenance_schedule ADD COLUMN started_at DATETIME'))
+        conn.execute(text('ALTER TABLE maintenance_schedule ADD COLUMN completed_at DATETIME'))
+        conn.execute(text("UPDATE maintenance_schedule SET status = 'skipped' WHERE scheduled_for_datetime < :now"),
+                     {'now': datetime.utcnow()})
@@ -1,39 +1,109 @@
 from . import db
 from datetime import datetime
 
-notification_reads = db.Table('notification_reads',
-    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('notification_id', db.Integer, db.ForeignKey('notification.id'), primary_key=True)
-)
-
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(50), nullable=False, default='operator') # admin, operator, safety, environment
-    read_notifications = db.relationship('Notification', secondary=notification_reads, back_populates='read_by_users')
+    # Notifications with an id at or below this have been read by the user
+    last_read_notification_id = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def __repr__(self):
         return f'<User {self.username} ({self.role})>'
 
 class PlantReport(db.Model):
+    # Time-series access is always "one module (or kind of module) over a
+    # time range", so index both on (key, timestamp).
+    __table_args__ = (
+        db.Index('ix_plant_report_module_name_timestamp', 'module_name', 'timestamp'),
+        db.Index('ix_plant_report_module_type_timestamp', 'module_type', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     module_name = db.Column(db.String(80), nullable=False)
+    module_type = db.Column(db.String(50)) # e.g. 'reactor', 'cooling_tower'; see simulation.module_type_for
     status = db.Column(db.String(50))
     power_output_mw = db.Column(db.Float)
     temperature_c = db.Column(db.Float)
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
 
     def __repr__(self):
         return f'<Report {self.module_name} @ {self.timestamp}>'
-    
+
+
+class PlantReportRollup(db.Model):
+    """
+    Per-module aggregate of PlantReport samples over one time bucket
+    ('1m', '1h' or '1d'). Sums and counts are kept instead of averages so
+    buckets can be merged incrementally; see rollups.py.
+    """
+    resolution = db.Column(db.String(4), primary_key=True)
+    module_name = db.Column(db.String(80), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    module_type = db.Column(db.String(50))
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+    power_count = db.Column(db.Integer, nullable=False, default=0)
+    power_sum = db.Column(db.Float)
+    power_min = db.Column(db.Float)
+    power_max = db.Column(db.Float)
+    temp_count = db.Column(db.Integer, nullable=False, default=0)
+    temp_sum = db.Column(db.Float)
+    temp_min = db.Column(db.Float)
+    temp_max = db.Column(db.Float)
+
+    @property
+    def power_avg(self):
+        return self.power_sum / self.power_count if self.power_count else None
+
+    @property
+    def temp_avg(self):
+        return self.temp_sum / self.temp_count if self.temp_count else None
+
+    def __repr__(self):
+        return f'<Rollup {self.resolution} {self.module_name} @ {self.bucket_start}>'
+
+
+class PlantStatusRollup(db.Model):
+    """How many samples a module spent in each status during a bucket."""
+    resolution = db.Column(db.String(4), primary_key=True)
+    module_name = db.Column(db.String(80), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    status = db.Column(db.String(50), primary_key=True)
+    sample_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<StatusRollup {self.resolution} {self.module_name} {self.status} @ {self.bucket_start}>'
+
+
+class ReportArchive(db.Model):
+    """One day of PlantReport rows written to the Parquet archive; see archive.py."""
+    day = db.Column(db.Date, primary_key=True)
+    row_count = db.Column(db.Integer, nullable=False)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # True once the day's raw rows have been deleted from plant_report
+    pruned = db.Column(db.Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f'<ReportArchive {self.day} ({self.row_count} rows)>'
+
 
 class MaintenanceSchedule(db.Model):
+    # The scheduler loads open jobs (pending / in_progress) in due order
+    __table_args__ = (
+        db.Index('ix_maintenance_schedule_status_scheduled_for', 'status', 'scheduled_for_datetime'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     module_name = db.Column(db.String(80), nullable=False)
-    scheduled_for_datetime = db.Column(db.DateTime, nullable=False)
+    scheduled_for_datetime = db.Column(db.DateTime, nullable=False, index=True)
     scheduled_by_username = db.Column(db.String(80), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=60, server_default='60')
+    # pending -> in_progress -> done; 'skipped' for jobs that predate the scheduler
+    status = db.Column(db.String(20), nullable=False, default='pending', server_default='pending')
+    started_at = db.Column(db.DateTime)
+    completed_at = db.Column(db.DateTime)
 
     def __repr__(self):
         return f'<Maintenance for {self.module_name} on {self.scheduled_for_datetime}>'
@@ -42,8 +112,6 @@ class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     message = db.Column(db.String(300), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
-    
-    read_by_users = db.relationship('User', secondary=notification_reads, back_populates='read_notifications')
 
     def __repr__(self):
         return f'<Notification: {self.message[:30]}...>'
\ No newline at end of file
@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(RuntimeError):
+    """Raised when the password hashing queue is full or a hash took too long."""
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug's password hashing (a deliberately slow KDF) in a small
+    process pool instead of the request thread. At most `workers` hashes
+    run at once however many logins arrive together, so request threads
+    and the tick engine keep their share of the CPU, and at most
+    `max_pending` may be running or waiting: past that, hash() and check()
+    raise HashingBusy at once rather than queueing work nobody will wait
+    for. With workers=0 hashing runs inline, as before.
+    """
+
+    def __init__(self, workers=0, max_pending=16, timeout=10.0):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.shutdown()
+        workers = app.config.get('PASSWORD_HASH_WORKERS')
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', self.max_pending)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', self.timeout)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password)
+
+    def check(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def hash_many(self, passwords):
+        """
+        Hashes a list of passwords in parallel, in order. Keeps at most
+        `workers` of them in flight, waiting for a slot instead of failing,
+        so logins arriving meanwhile still find room in the queue.
+        """
+        if not self.workers:
+            return [generate_password_hash(password) for password in passwords]
+        hashes = []
+        in_flight = deque()
+        for password in passwords:
+            if len(in_flight) >= self.workers:
+                hashes.append(self._result(in_flight.popleft()))
+            in_flight.append(self._submit(generate_password_hash, password, wait=True))
+        hashes.extend(self._result(future) for future in in_flight)
+        return hashes
+
+    def _run(self, function, *args):
+        if not self.workers:
+            return function(*args)
+        return self._result(self._submit(function, *args))
+
+    def _submit(self, function, *args, wait=False):
+        slots = self._slots
+        acquired = slots.acquire(timeout=self.timeout) if wait else slots.acquire(blocking=False)
+        if not acquired:
+            self.rejected += 1
+            raise HashingBusy('too many password hashes pending')
+        try:
+            future = self._pool().submit(function, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # The slot is held until the hash is done, even if the caller gave up
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def _result(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy('password hash timed out') from None
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            self.shutdown()
+            raise HashingBusy('password hashing pool restarted') from None
+
+    def _pool(self):
+        with self._lock:
+            # A forked child (e.g. a gunicorn worker) must not reuse the
+            # parent's pool; it starts its own on first use
+            if self._executor is None or self._pid != os.getpid():
+                # Spawned, not forked: the app process has running threads
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+            return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+hasher = PasswordHasher()
+
+
+def init_app(app):
+    hasher.init_app(app)
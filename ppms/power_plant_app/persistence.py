@@ -0,0 +1,174 @@
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from . import db
+from . import rollups
+from .models import Notification, PlantReport
+
+
+class ReportWriter:
+    """
+    Write-behind stage for PlantReport samples. Ticks hand their samples to a
+    bounded queue and return immediately; a background thread drains the
+    queue and inserts the rows in bulk once enough have built up or the
+    flush interval has passed. Rollups are updated in the same transaction,
+    as are any alert notifications raised since the last batch, and the
+    retention policy is applied from this thread as well.
+    """
+
+    def __init__(self, max_pending=600, batch_size=1000, flush_interval=1.0, put_timeout=0.5):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.app = None
+        # Off: submit() writes in the caller's thread instead of queueing
+        self.write_behind = True
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.notifications = []
+        self.prune_interval = None
+        self._next_prune = 0
+        self._flush_lock = threading.Lock()
+        self._notifications_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('REPORT_BATCH_SIZE', self.batch_size)
+        self.flush_interval = app.config.get('REPORT_FLUSH_INTERVAL', self.flush_interval)
+        self.put_timeout = app.config.get('REPORT_PUT_TIMEOUT', self.put_timeout)
+        self.prune_interval = app.config.get('REPORT_PRUNE_INTERVAL')
+        max_pending = app.config.get('REPORT_MAX_PENDING', self.max_pending)
+        if max_pending != self.max_pending and self.queue.empty():
+            self.max_pending = max_pending
+            self.queue = queue.Queue(maxsize=max_pending)
+        self.write_behind = app.config.get('REPORT_WRITE_BEHIND', True)
+        if self.write_behind:
+            self.start()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='report-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops the writer thread after everything queued has been flushed."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def submit(self, samples):
+        """
+        Queues one tick's worth of samples. When the queue is full the caller
+        waits up to put_timeout for the writer to catch up (backpressure), and
+        the batch is dropped and counted if it still can't be queued.
+        Without write-behind the samples are written before this returns.
+        """
+        if not samples:
+            return True
+        if not self.write_behind and self.app is not None:
+            return self._write_now(samples)
+        try:
+            self.queue.put(samples, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            self.rows_dropped += len(samples)
+            if self.app is not None:
+                self.app.logger.warning('Report queue full, dropped %d samples', len(samples))
+            return False
+
+    def submit_notifications(self, notifications):
+        """Queues Notification rows ({message, timestamp}) for the next batch. Never blocks."""
+        with self._notifications_lock:
+            self.notifications.extend(notifications)
+        if not self.write_behind and self.app is not None:
+            self._write_now([])
+
+    def _write_now(self, rows):
+        try:
+            self._write(rows)
+            return True
+        except Exception:
+            self.rows_dropped += len(rows)
+            self.app.logger.exception('Failed to write %d report rows', len(rows))
+            return False
+
+    def flush(self):
+        """Synchronously writes everything currently queued."""
+        rows = []
+        while True:
+            try:
+                rows.extend(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write(rows)
+
+    def _write(self, rows):
+        with self._notifications_lock:
+            notifications, self.notifications = self.notifications, []
+        if not rows and not notifications:
+            return
+        try:
+            with self._flush_lock:
+                with self.app.app_context():
+                    # One Core executemany per batch; no ORM objects or unit of work
+                    conn = db.session.connection()
+                    if rows:
+                        conn.execute(insert(PlantReport.__table__), rows)
+                        rollups.apply_samples(conn, rows)
+                    if notifications:
+                        conn.execute(insert(Notification.__table__), notifications)
+                    db.session.commit()
+        except Exception:
+            # The rows are counted as dropped by the caller; the notifications
+            # go back in front of any raised since, for the next batch
+            with self._notifications_lock:
+                self.notifications[:0] = notifications
+            raise
+        self.rows_written += len(rows)
+
+    def prune(self):
+        """Applies the configured retention policy to raw rows and rollups."""
+        config = self.app.config
+        with self._flush_lock:
+            with self.app.app_context():
+                return rollups.prune_expired(
+                    config.get('REPORT_RETENTION_DAYS'),
+                    config.get('ROLLUP_RETENTION_DAYS'),
+                    config.get('REPORT_PRUNE_BATCH_SIZE', 5000),
+                )
+
+    def _run(self):
+        rows = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stop_event.is_set():
+            try:
+                rows.extend(self.queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                pass
+            if len(rows) >= self.batch_size or time.monotonic() >= deadline:
+                try:
+                    self._write(rows)
+                except Exception:
+                    self.rows_dropped += len(rows)
+                    self.app.logger.exception('Failed to write %d report rows', len(rows))
+                rows = []
+                deadline = time.monotonic() + self.flush_interval
+            if self.prune_interval and time.monotonic() >= self._next_prune:
+                self._next_prune = time.monotonic() + self.prune_interval
+                try:
+                    self.prune()
+                except Exception:
+                    self.app.logger.exception('Failed to prune expired reports')
+        # Flush on shutdown: whatever was taken off the queue still gets written
+        self._write(rows)
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from .models import PlantReport, PlantReportRollup
+
+# Where a series over a given span is read from: the first source whose
+# maximum span covers the request (and whose retention still has the data).
+SERIES_SOURCES = (
+    ('raw', timedelta(hours=2)),
+    ('1m', timedelta(days=2)),
+    ('1h', timedelta(days=90)),
+    ('1d', None),
+)
+
+
+def reports_query(module_type=None, module_names=None, start=None, end=None, newest_first=True):
+    """
+    The one way views read PlantReport history. Filters are equality/range
+    predicates on the leading columns of the (module_type, timestamp) and
+    (module_name, timestamp) indexes, so the cost tracks the rows returned
+    rather than the size of the table.
+    """
+    query = PlantReport.query
+    if module_type is not None:
+        query = query.filter(PlantReport.module_type == module_type)
+    if module_names:
+        query = query.filter(PlantReport.module_name.in_(module_names))
+    if start is not None:
+        query = query.filter(PlantReport.timestamp >= start)
+    if end is not None:
+        query = query.filter(PlantReport.timestamp < end)
+    order = PlantReport.timestamp.desc() if newest_first else PlantReport.timestamp.asc()
+    return query.order_by(order)
+
+
+def pick_resolution(start, end, now=None):
+    """Chooses 'raw' or a rollup resolution for a series from start to end."""
+    now = now or datetime.utcnow()
+    retention = dict(current_app.config.get('ROLLUP_RETENTION_DAYS') or {})
+    retention['raw'] = current_app.config.get('REPORT_RETENTION_DAYS')
+    for resolution, max_span in SERIES_SOURCES:
+        days = retention.get(resolution)
+        if days is not None and start < now - timedelta(days=days):
+            continue
+        if max_span is None or end - start <= max_span:
+            return resolution
+    return SERIES_SOURCES[-1][0]
+
+
+def module_series(module_name, start, end, resolution=None):
+    """
+    Returns one module's power/temperature series between start and end,
+    oldest first, as dicts with timestamp, samples and min/avg/max fields.
+    Long ranges are served from the rollup tables automatically.
+    """
+    resolution = resolution or pick_resolution(start, end)
+    if resolution == 'raw':
+        rows = reports_query(module_names=[module_name], start=start, end=end, newest_first=False).with_entities(
+            PlantReport.timestamp, PlantReport.power_output_mw, PlantReport.temperature_c)
+        return [{
+            'timestamp': ts, 'samples': 1,
+            'power_min': power, 'power_avg': power, 'power_max': power,
+            'temp_min': temp, 'temp_avg': temp, 'temp_max': temp,
+        } for ts, power, temp in rows]
+
+    rollups = PlantReportRollup.query.filter(
+        PlantReportRollup.resolution == resolution,
+        PlantReportRollup.module_name == module_name,
+        PlantReportRollup.bucket_start >= start,
+        PlantReportRollup.bucket_start < end,
+    ).order_by(PlantReportRollup.bucket_start.asc())
+    return [{
+        'timestamp': r.bucket_start, 'samples': r.sample_count,
+        'power_min': r.power_min, 'power_avg': r.power_avg, 'power_max': r.power_max,
+        'temp_min': r.temp_min, 'temp_avg': r.temp_avg, 'temp_max': r.temp_max,
+    } for r in rollups]
@@ -0,0 +1,46 @@
+from flask import session
+from flask_socketio import join_room
+
+from . import socketio
+from .auth import ROLES, identity_cache
+from .dashboard import filter_by_role
+
+
+def role_room(role):
+    return f'role:{role}'
+
+
+@socketio.on('connect')
+def handle_connect(auth=None):
+    """
+    Authenticates the socket once from the login session and puts it in the
+    room for the user's role. After this the client only receives pushes, so
+    there is no per-update request, session load or User query.
+    """
+    user_id = session.get('user_id')
+    user = identity_cache.get(user_id) if user_id else None
+    if user is None:
+        return False
+    join_room(role_room(user.role))
+
+
+def broadcast_snapshot(published):
+    """
+    Engine listener: pushes the modules that changed in each published
+    snapshot to every role room. Clients that missed a version resync
+    through /api/plant_data?since=.
+    """
+    since = published.version - 1
+    changes = published.changes_since(since)
+    for role in ROLES:
+        socketio.emit('plant_data', {
+            'version': published.version,
+            'since': since,
+            'changes': filter_by_role(changes, role),
+        }, to=role_room(role))
+
+
+def init_app(app, engine):
+    socketio.init_app(app, async_mode=app.config.get('SOCKETIO_ASYNC_MODE'))
+    if broadcast_snapshot not in engine.listeners:
+        engine.add_listener(broadcast_snapshot)
@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+
+from flask import render_template
+from markupsafe import Markup
+
+
+class RenderCache:
+    """
+    Rendered page fragments keyed by (view, role, data version). The data
+    version is part of the key, so an entry is never invalidated; once the
+    data moves on it just stops being asked for and is evicted, least
+    recently used first, when the fragments held pass max_bytes.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()   # key -> rendered HTML
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        with self.lock:
+            html = self.entries.get(key)
+            if html is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return html
+        # Rendered outside the lock; two threads may both build a new
+        # version, and both results are equal
+        html = build()
+        with self.lock:
+            self.misses += 1
+            if len(html) <= self.max_bytes and key not in self.entries:
+                self.entries[key] = html
+                self.size += len(html)
+                while self.size > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return html
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.hits = self.misses = 0
+
+
+cache = RenderCache()
+
+
+def fragment(key, template, build_context):
+    """
+    `template` rendered with build_context() as Markup, from the cache if
+    `key` has been rendered before. build_context is only called on a miss,
+    so the queries behind the fragment are skipped along with the render.
+    """
+    return Markup(cache.get(key, lambda: render_template(template, **build_context())))
+
+
+def init_app(app):
+    cache.max_bytes = app.config.get('RENDER_CACHE_MAX_BYTES', cache.max_bytes)
+    cache.clear()
@@ -0,0 +1,203 @@
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, literal_column, select
+from sqlalchemy.dialects.sqlite import insert
+
+from . import db
+from .models import PlantReport, PlantReportRollup, PlantStatusRollup
+
+# Bucket sizes, smallest first. Each maps to a function that truncates a
+# timestamp to the start of its bucket.
+RESOLUTIONS = {
+    '1m': lambda ts: ts.replace(second=0, microsecond=0),
+    '1h': lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    '1d': lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+BUCKET_LENGTH = {'1m': timedelta(minutes=1), '1h': timedelta(hours=1), '1d': timedelta(days=1)}
+
+
+def aggregate(samples, resolutions=RESOLUTIONS):
+    """
+    Folds a batch of PlantReport sample dicts into partial bucket aggregates.
+    Returns (rollups, status_counts), both keyed by
+    (resolution, module_name, bucket_start).
+    """
+    rollups = {}
+    status_counts = {}
+    truncators = [(resolution, RESOLUTIONS[resolution]) for resolution in resolutions]
+    # Samples from one tick share a timestamp, so truncate each timestamp once
+    buckets_for = {}
+    for sample in samples:
+        timestamp = sample['timestamp']
+        buckets = buckets_for.get(timestamp)
+        if buckets is None:
+            buckets = buckets_for[timestamp] = [(resolution, truncate(timestamp)) for resolution, truncate in truncators]
+        name = sample['module_name']
+        power = sample.get('power_output_mw')
+        temp = sample.get('temperature_c')
+        status = sample.get('status')
+        for resolution, bucket_start in buckets:
+            key = (resolution, name, bucket_start)
+            row = rollups.get(key)
+            if row is None:
+                row = rollups[key] = {
+                    'resolution': resolution, 'module_name': name, 'bucket_start': bucket_start,
+                    'module_type': sample.get('module_type'), 'sample_count': 0,
+                    'power_count': 0, 'power_sum': None, 'power_min': None, 'power_max': None,
+                    'temp_count': 0, 'temp_sum': None, 'temp_min': None, 'temp_max': None,
+                }
+            row['sample_count'] += 1
+            if power is not None:
+                _add(row, 'power', power)
+            if temp is not None:
+                _add(row, 'temp', temp)
+            status_key = key + (status,)
+            status_counts[status_key] = status_counts.get(status_key, 0) + 1
+    return rollups, status_counts
+
+
+def _add(row, prefix, value):
+    row[prefix + '_count'] += 1
+    if row[prefix + '_sum'] is None:
+        row[prefix + '_sum'] = row[prefix + '_min'] = row[prefix + '_max'] = value
+    else:
+        row[prefix + '_sum'] += value
+        row[prefix + '_min'] = min(row[prefix + '_min'], value)
+        row[prefix + '_max'] = max(row[prefix + '_max'], value)
+
+
+def _merge_extreme(column, excluded, fn):
+    # SQLite's two-argument min()/max() return NULL if either side is NULL
+    return fn(func.coalesce(column, excluded), func.coalesce(excluded, column))
+
+
+def apply_samples(conn, samples, resolutions=RESOLUTIONS):
+    """
+    Merges a batch of samples into the rollup tables with one upsert per
+    table, so the cost per batch depends on the number of buckets touched,
+    not on how much history exists. Runs in the caller's transaction.
+    """
+    rollups, status_counts = aggregate(samples, resolutions)
+    if rollups:
+        table = PlantReportRollup.__table__
+        stmt = insert(table)
+        ex = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.resolution, table.c.module_name, table.c.bucket_start],
+            set_={
+                'sample_count': table.c.sample_count + ex.sample_count,
+                'power_count': table.c.power_count + ex.power_count,
+                'power_sum': func.coalesce(table.c.power_sum, 0) + func.coalesce(ex.power_sum, 0),
+                'power_min': _merge_extreme(table.c.power_min, ex.power_min, func.min),
+                'power_max': _merge_extreme(table.c.power_max, ex.power_max, func.max),
+                'temp_count': table.c.temp_count + ex.temp_count,
+                'temp_sum': func.coalesce(table.c.temp_sum, 0) + func.coalesce(ex.temp_sum, 0),
+                'temp_min': _merge_extreme(table.c.temp_min, ex.temp_min, func.min),
+                'temp_max': _merge_extreme(table.c.temp_max, ex.temp_max, func.max),
+            },
+        )
+        conn.execute(stmt, list(rollups.values()))
+    if status_counts:
+        table = PlantStatusRollup.__table__
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.resolution, table.c.module_name, table.c.bucket_start, table.c.status],
+            set_={'sample_count': table.c.sample_count + stmt.excluded.sample_count},
+        )
+        conn.execute(stmt, [
+            {'resolution': r, 'module_name': m, 'bucket_start': b, 'status': s, 'sample_count': n}
+            for (r, m, b, s), n in status_counts.items()
+        ])
+
+
+def _prune_table(table, where, batch_size):
+    # Delete by rowid in bounded batches, one short transaction each, so the
+    # tick writer never queues behind one huge DELETE.
+    rowid = literal_column('rowid')
+    deleted = 0
+    while True:
+        with db.engine.begin() as conn:
+            count = conn.execute(delete(table).where(
+                rowid.in_(select(rowid).select_from(table).where(where).limit(batch_size))
+            )).rowcount
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def prune_expired(raw_days=None, rollup_days=None, batch_size=5000, now=None):
+    """
+    Applies the retention policy: raw PlantReport rows older than raw_days,
+    and rollup buckets older than rollup_days[resolution], are deleted in
+    batches. A value of None keeps that data forever. Returns the number of
+    rows deleted per table.
+    """
+    now = now or datetime.utcnow()
+    deleted = {}
+    if raw_days is not None:
+        cutoff = now - timedelta(days=raw_days)
+        deleted['plant_report'] = _prune_table(PlantReport.__table__, PlantReport.timestamp < cutoff, batch_size)
+    for resolution, days in (rollup_days or {}).items():
+        if days is None:
+            continue
+        cutoff = now - timedelta(days=days)
+        for model in (PlantReportRollup, PlantStatusRollup):
+            table = model.__table__
+            deleted[f'{table.name}:{resolution}'] = _prune_table(
+                table, (model.resolution == resolution) & (model.bucket_start < cutoff), batch_size)
+    return deleted
+
+
+def rebuild_rollups(chunk_size=10000):
+    """
+    Recomputes rollups from the raw rows still in PlantReport, e.g. after
+    upgrading a database that predates rollups. Buckets that start before
+    the oldest raw row are left alone, since their raw data may already
+    have been pruned.
+    """
+    first = db.session.query(func.min(PlantReport.timestamp)).scalar()
+    if first is None:
+        return
+    columns = (PlantReport.module_name, PlantReport.module_type, PlantReport.status,
+               PlantReport.power_output_mw, PlantReport.temperature_c, PlantReport.timestamp)
+    for resolution, truncate in RESOLUTIONS.items():
+        boundary = truncate(first)
+        if boundary < first:
+            boundary += BUCKET_LENGTH[resolution]
+        for model in (PlantReportRollup, PlantStatusRollup):
+            db.session.execute(delete(model).where(
+                (model.resolution == resolution) & (model.bucket_start >= boundary)))
+        rows = db.session.execute(
+            select(*columns).where(PlantReport.timestamp >= boundary).execution_options(yield_per=chunk_size))
+        conn = db.session.connection()
+        for chunk in rows.partitions():
+            apply_samples(conn, [row._asdict() for row in chunk], resolutions=(resolution,))
+        db.session.commit()
+
+
+@click.command('rebuild-rollups')
+@with_appcontext
+def rebuild_rollups_command():
+    """Recompute rollup tables from the raw PlantReport rows."""
+    rebuild_rollups()
+    click.echo('Rebuilt plant report rollups.')
+
+
+@click.command('prune-reports')
+@with_appcontext
+def prune_reports_command():
+    """Apply the configured retention policy now."""
+    deleted = prune_expired(
+        current_app.config.get('REPORT_RETENTION_DAYS'),
+        current_app.config.get('ROLLUP_RETENTION_DAYS'),
+        current_app.config.get('REPORT_PRUNE_BATCH_SIZE', 5000),
+    )
+    click.echo(f'Deleted {deleted}.')
+
+
+def init_app(app):
+    app.cli.add_command(rebuild_rollups_command)
+    app.cli.add_command(prune_reports_command)
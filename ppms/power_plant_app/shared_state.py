@@ -0,0 +1,386 @@
+import json
+import os
+import signal
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from .engine import Snapshot
+
+# Segment layout: a fixed header followed by the encoded snapshot.
+#   seq        uint64  seqlock counter, odd while the owner is writing
+#   generation uint64  random, new for every owner process
+#   pid        uint32  the owner's process id
+#   version    uint64  snapshot version
+#   length     uint32  payload bytes
+SEQ = struct.Struct('<Q')
+OWNER = struct.Struct('<QI')
+META = struct.Struct('<QI')
+OWNER_OFFSET = SEQ.size
+META_OFFSET = OWNER_OFFSET + OWNER.size
+HEADER_SIZE = META_OFFSET + META.size
+# How long a reader waits out a write in progress before serving the last
+# snapshot it has; an owner killed mid-write leaves the counter odd
+SPIN_TIMEOUT = 0.05
+
+# Set by init_app in every process; only the simulation-owner command runs them
+owner_engine = None
+owner_writer = None
+# Segments created by a publisher in this process (or the one it forked from)
+_owned_segments = set()
+
+
+def encode_snapshot(published):
+    return json.dumps({
+        'version': published.version,
+        'state': published.state,
+        'module_versions': [[category, name, version]
+                            for (category, name), version in published.module_versions.items()],
+    }, separators=(',', ':')).encode()
+
+
+def decode_snapshot(payload):
+    data = json.loads(payload)
+    module_versions = {(category, name): version for category, name, version in data['module_versions']}
+    return Snapshot(data['version'], data['state'], module_versions)
+
+
+class SharedStatePublisher:
+    """
+    Owner side: an engine listener that copies every published snapshot into
+    a shared memory segment. Writes follow the seqlock protocol, so readers
+    in other processes never see a half-written snapshot.
+    """
+
+    def __init__(self, name, size):
+        try:
+            self.shm = SharedMemory(name=name, create=True, size=size)
+            self.seq = 0
+        except FileExistsError:
+            # Left behind by an owner that didn't exit cleanly. Carry on from
+            # its counter so readers don't mistake new data for what they cached.
+            self.shm = SharedMemory(name=name)
+            self.seq = SEQ.unpack_from(self.shm.buf, 0)[0] + 1 & ~1
+        _owned_segments.add(self.shm.name)
+        # Readers compare this to notice that a different owner took over
+        self.generation = int.from_bytes(os.urandom(8), 'little')
+        OWNER.pack_into(self.shm.buf, OWNER_OFFSET, self.generation, os.getpid())
+
+    def publish(self, published):
+        payload = encode_snapshot(published)
+        if HEADER_SIZE + len(payload) > self.shm.size:
+            raise ValueError(f'Snapshot of {len(payload)} bytes does not fit in SHARED_STATE_SIZE')
+        buf = self.shm.buf
+        SEQ.pack_into(buf, 0, self.seq + 1)
+        META.pack_into(buf, META_OFFSET, published.version, len(payload))
+        buf[HEADER_SIZE:HEADER_SIZE + len(payload)] = payload
+        self.seq += 2
+        SEQ.pack_into(buf, 0, self.seq)
+
+    def close(self):
+        _owned_segments.discard(self.shm.name)
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedStateReader:
+    """
+    Worker side stand-in for TickEngine. Reads the owner's snapshot from
+    shared memory and forwards operator actions over the command channel.
+    A poll only compares the seqlock counter in place; the payload is
+    decoded once per new version and the Snapshot shared by all requests
+    in the process. When nothing new has been published for
+    `reattach_interval` seconds, the segment is looked up by name again, so
+    a restarted owner's new segment (or a new owner reusing the old one) is
+    picked up instead of serving the old mapping forever.
+    """
+
+    def __init__(self, name, address, authkey, poll_interval=0.1, reattach_interval=2.0):
+        self.name = name
+        self.address = address
+        self.authkey = authkey
+        self.poll_interval = poll_interval
+        self.reattach_interval = reattach_interval
+        self.app = None
+        self.listeners = []
+        self._shm = None
+        self._owner = None
+        self._seq = 0
+        self._checked_at = 0
+        self._published = Snapshot(0, {}, {})
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.start()
+
+    def _attach(self):
+        if self._shm is None:
+            self._shm = self._open()
+            if self._shm is not None:
+                self._owner = OWNER.unpack_from(self._shm.buf, OWNER_OFFSET)
+                self._checked_at = time.monotonic()
+        elif time.monotonic() - self._checked_at >= self.reattach_interval:
+            self._check_owner()
+        return self._shm
+
+    def _open(self):
+        try:
+            shm = SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return None   # the owner hasn't started yet
+        # Python < 3.13 tracks attached segments too and would unlink the
+        # owner's segment when this worker exits
+        if shm.name not in _owned_segments:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+    def _check_owner(self):
+        # The name may now point to a new segment (the owner restarted and
+        # unlinked the old one), or a new owner may have taken over this one
+        self._checked_at = time.monotonic()
+        current = self._open()
+        if current is None:
+            return   # no owner right now; keep serving the last snapshot
+        owner = OWNER.unpack_from(current.buf, OWNER_OFFSET)
+        if owner == self._owner and owner == OWNER.unpack_from(self._shm.buf, OWNER_OFFSET):
+            current.close()
+            return
+        # The old mapping is not closed here: a request thread may still be
+        # reading its counter. It is unmapped once the last reference goes.
+        with self._lock:
+            self._shm = current
+            self._owner = owner
+            self._seq = None   # read the new owner's snapshot whatever its counter
+
+    def refresh(self):
+        """
+        Picks up a newer snapshot if the owner has published one. Returns
+        True if it did. A write that doesn't finish within SPIN_TIMEOUT
+        leaves the last snapshot in place.
+        """
+        shm = self._attach()
+        if shm is None or SEQ.unpack_from(shm.buf, 0)[0] == self._seq:
+            return False
+        with self._lock:
+            buf = self._shm.buf
+            deadline = time.monotonic() + SPIN_TIMEOUT
+            while time.monotonic() < deadline:
+                seq = SEQ.unpack_from(buf, 0)[0]
+                if seq == self._seq:
+                    return False
+                if seq & 1:
+                    time.sleep(0)   # a write is in progress
+                    continue
+                _, length = META.unpack_from(buf, META_OFFSET)
+                payload = bytes(buf[HEADER_SIZE:HEADER_SIZE + length])
+                if SEQ.unpack_from(buf, 0)[0] == seq:
+                    self._published = decode_snapshot(payload)
+                    self._seq = seq
+                    self._checked_at = time.monotonic()
+                    return True
+            return False
+
+    @property
+    def published(self):
+        self.refresh()
+        return self._published
+
+    @property
+    def snapshot(self):
+        return self.published.state
+
+    @property
+    def version(self):
+        return self.published.version
+
+    def handle_action(self, module_id, action):
+        """Runs the action in the owner process and returns its message."""
+        return self.handle_actions([{'module_id': module_id, 'action': action}])[0]['message']
+
+    def handle_actions(self, actions):
+        """Sends a batch of actions to the owner in one round trip."""
+        try:
+            with Client(self.address, authkey=self.authkey) as conn:
+                conn.send(('actions', actions))
+                return conn.recv()
+        except (OSError, EOFError):
+            return [{'module_id': request.get('module_id'), 'action': request.get('action'),
+                     'message': 'The simulation is not reachable right now.'} for request in actions]
+
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name='shared-state-reader', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # Listeners (the socket broadcast) fire when a new version shows up,
+        # even if a request thread decoded it first
+        notified = self._published
+        while not self._stop_event.wait(self.poll_interval):
+            published = self.published
+            if not self.listeners or published is notified:
+                continue
+            notified = published
+            for callback in self.listeners:
+                try:
+                    callback(published)
+                except Exception:
+                    if self.app is not None:
+                        self.app.logger.exception('Snapshot listener failed')
+
+
+class RemoteHistory:
+    """
+    Worker side stand-in for HistoryStore. Only the owner's engine records
+    samples, so series() asks the owner for the part of its ring buffers
+    that covers the range, over the command channel. If the owner can't be
+    reached it reports nothing held in memory and the caller reads the
+    database, as for any range older than the buffers.
+    """
+
+    def __init__(self, address, authkey):
+        self.address = address
+        self.authkey = authkey
+
+    def init_app(self, app):
+        pass   # the buffers are sized by the owner
+
+    def series(self, module_name, start, end):
+        try:
+            with Client(self.address, authkey=self.authkey) as conn:
+                conn.send(('history', module_name, start, end))
+                return conn.recv()
+        except (OSError, EOFError):
+            return None, None, None, None
+
+
+class CommandServer:
+    """Owner side of the command channel: applies actions sent by workers and answers history queries."""
+
+    def __init__(self, engine, address, authkey):
+        self.engine = engine
+        self.address = address
+        self.authkey = authkey
+        self._listener = None
+        self._thread = None
+
+    def start(self):
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)   # stale socket file from a previous owner
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self._thread = threading.Thread(target=self._run, name='sim-command-server', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+    def _run(self):
+        listener = self._listener
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return   # closed by stop()
+            except Exception:
+                continue   # e.g. a client with the wrong authkey
+            with conn:
+                try:
+                    kind, *args = conn.recv()
+                    if kind == 'actions':
+                        # handle_actions republishes before returning, so the
+                        # worker's next read already shows the result
+                        conn.send(self.engine.handle_actions(*args))
+                    elif kind == 'history':
+                        history = self.engine.history
+                        conn.send(history.series(*args) if history is not None else (None, None, None, None))
+                except (OSError, EOFError, ValueError):
+                    pass
+
+
+def command_address(app):
+    return app.config.get('SHARED_STATE_ADDRESS') or os.path.join(app.instance_path, 'sim-commands.sock')
+
+
+def command_authkey(app):
+    return str(app.config['SECRET_KEY']).encode()
+
+
+@click.command('simulation-owner')
+@with_appcontext
+def simulation_owner_command():
+    """Run the simulation for all web worker processes."""
+    app = current_app._get_current_object()
+    publisher = SharedStatePublisher(app.config['SHARED_STATE_NAME'], app.config['SHARED_STATE_SIZE'])
+    server = CommandServer(owner_engine, command_address(app), command_authkey(app))
+    owner_engine.add_listener(publisher.publish)
+    publisher.publish(owner_engine.published)
+    server.start()
+    owner_writer.init_app(app)
+    owner_engine.init_app(app)
+    click.echo(f"Publishing plant state to shared memory '{publisher.shm.name}'.")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    try:
+        stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        owner_engine.stop()
+        if app.config['SIM_TICK_ENGINE']:
+            from .checkpoint import checkpointer
+            checkpointer.stop()
+        owner_writer.stop()
+        publisher.close()
+
+
+def remote_history(app):
+    """The RemoteHistory that this process's views use in place of the history store."""
+    return RemoteHistory(command_address(app), command_authkey(app))
+
+
+def init_app(app, engine, writer):
+    """
+    Multi-process mode. Returns the SharedStateReader that this process's
+    views use in place of the engine; the engine and writer passed in only
+    run under the simulation-owner command.
+    """
+    global owner_engine, owner_writer
+    if not isinstance(engine, SharedStateReader):
+        owner_engine, owner_writer = engine, writer
+    app.cli.add_command(simulation_owner_command)
+    return SharedStateReader(
+        app.config['SHARED_STATE_NAME'],
+        command_address(app),
+        command_authkey(app),
+        app.config.get('SHARED_STATE_POLL_INTERVAL', 0.1),
+        app.config.get('SHARED_STATE_REATTACH_INTERVAL', 2.0),
+    )
@@ -1,10 +1,114 @@
+import copy
 import random
-from . import db  # Import the db instance
-from .models import PlantReport 
+from collections import namedtuple
+from datetime import datetime
+
+
+def module_type_for(module_name):
+    """'Cooling Tower 2' -> 'cooling_tower'. Used to filter reports by kind of module."""
+    words = module_name.split()
+    if len(words) > 1 and words[-1].isdigit():
+        words = words[:-1]
+    return '_'.join(words).lower()
+
+
+def module_id_for(module_name):
+    """'Cooling Tower 2' -> 'cooling_tower_2', the id the dashboard uses for a module block."""
+    return module_name.lower().replace(' ', '_')
+
+
+# RULE: the whole Environmental & Compliance Module and these safety modules
+# are never changed by the simulation loop
+EXCLUDED_CATEGORIES = {"Environmental & Compliance Module"}
+EXCLUDED_MODULES = {'Fire Safety System', 'Cooling Safety Backup'}
+
+# Statuses in which the simulation loop applies normal fluctuations
+RUNNING_STATUSES = ['Online', 'Active', 'low_power']
+# Share of its current output a module keeps in low power mode
+LOW_POWER_FRACTION = 0.5
+
+ModuleRecord = namedtuple('ModuleRecord', ['category', 'name', 'data'])
+
+# Bookkeeping that actions keep in a module's data dict but that is not
+# part of the plant state: left out of published snapshots
+PRIVATE_FIELDS = frozenset({'maintenance_from'})
+
+# Operator actions by name. Each takes (name, data), changes the module's
+# data dict in place and returns a message, or returns None if the action
+# doesn't apply in the module's current state.
+ACTIONS = {}
+
+
+def register_action(action):
+    """Decorator that makes a function available as an operator action."""
+    def decorator(fn):
+        ACTIONS[action] = fn
+        return fn
+    return decorator
+
+
+@register_action('start')
+def start_module(name, data):
+    if data['status'] in ['Offline', 'Standby', 'low_power']:
+        if 'power_output_mw' in data:
+            data['status'] = 'starting_up'
+        else:
+            data['status'] = 'Active' # or 'Online' for non-power modules
+        return f"{name} is starting."
+
+
+@register_action('stop')
+def stop_module(name, data):
+    if data['status'] in RUNNING_STATUSES:
+        # For modules with power, start a shutdown. For others, just stop them.
+        if 'power_output_mw' in data:
+            data['status'] = 'shutting_down'
+        else:
+            data['status'] = 'Offline'
+        return f"{name} is stopping."
+
+
+@register_action('maintenance')
+def begin_maintenance(name, data):
+    if data['status'] != 'maintenance':
+        # Remembered so end_maintenance can bring the module back
+        data['maintenance_from'] = data['status']
+        data['status'] = 'maintenance'
+        if 'power_output_mw' in data:
+            data['power_output_mw'] = 0
+        return f"{name} is under maintenance."
+
+
+@register_action('end_maintenance')
+def end_maintenance(name, data):
+    if data['status'] == 'maintenance':
+        previous = data.pop('maintenance_from', 'Offline')
+        if previous in RUNNING_STATUSES and 'power_output_mw' in data:
+            data['status'] = 'starting_up' # ramp back up from zero
+        else:
+            data['status'] = previous
+        return f"{name} is back from maintenance."
+
+
+@register_action('low_power_mode')
+def low_power_mode(name, data):
+    if data['status'] in ['Online', 'Active'] and 'power_output_mw' in data:
+        data['status'] = 'low_power'
+        data['power_output_mw'] *= LOW_POWER_FRACTION
+        return f"{name} is in low power mode."
+
 
 class PowerPlantSimulator:
-    def __init__(self):
-        """Initializes the plant state with the full data set."""
+    private_fields = PRIVATE_FIELDS
+
+    def __init__(self, seed=None, excluded=None):
+        """
+        Initializes the plant state with the full data set. The fluctuations
+        come from the simulator's own RNG, so the same seed always produces
+        the same run. `excluded` overrides EXCLUDED_MODULES, e.g. for fleets.
+        """
+        self.random = random.Random(seed)
+        self.excluded = EXCLUDED_MODULES if excluded is None else excluded
         self.state = {
             "Operation Module": {
                 'Reactor 1': {'status': 'Online', 'power_output_mw': 950, 'temp_c': 320},
@@ -30,47 +134,106 @@ class PowerPlantSimulator:
                 'Water Recycling Unit': {'status': 'Operational', 'flow_rate': 'High'},
             }
         }
+        self._index_modules()
+
+    def _index_modules(self):
+        # module id -> ModuleRecord; kept in step by add_module/remove_module
+        self.modules = {}
+        for category, modules in self.state.items():
+            for name, data in modules.items():
+                self.modules[module_id_for(name)] = ModuleRecord(category, name, data)
+
+    def checkpoint(self):
+        """
+        A copy of everything needed to resume this simulator, as (meta,
+        arrays): meta is JSON-serializable, arrays maps names to NumPy
+        arrays (none here). Call it under the engine lock.
+        """
+        version, internal, gauss = self.random.getstate()
+        meta = {'backend': 'dict', 'state': copy.deepcopy(self.state), 'rng': [version, list(internal), gauss]}
+        return meta, {}
+
+    @classmethod
+    def from_checkpoint(cls, meta, arrays):
+        simulator = cls()
+        simulator.state = meta['state']
+        simulator._index_modules()
+        if meta.get('rng'):
+            version, internal, gauss = meta['rng']
+            simulator.random.setstate((version, tuple(internal), gauss))
+        return simulator
+
+    def apply_report(self, name, status, power_output_mw, temperature_c):
+        """Sets a module's status, power and temperature from a PlantReport row."""
+        record = self.modules.get(module_id_for(name))
+        if record is None:
+            return
+        data = record.data
+        data['status'] = status
+        if power_output_mw is not None and 'power_output_mw' in data:
+            data['power_output_mw'] = power_output_mw
+        if temperature_c is not None and 'temp_c' in data:
+            data['temp_c'] = temperature_c
+
+    def add_module(self, category, name, data):
+        self.state.setdefault(category, {})[name] = data
+        self.modules[module_id_for(name)] = ModuleRecord(category, name, data)
+
+    def remove_module(self, module_id):
+        record = self.modules.pop(module_id)
+        del self.state[record.category][record.name]
 
-    def update(self):
+    def module_ids(self, module_type=None):
+        """Ids of all modules, or of those of one type ('turbine')."""
+        return [module_id for module_id, record in self.modules.items()
+                if module_type is None or module_type_for(record.name) == module_type]
+
+    def update(self, timestamp=None):
         """
         The core simulation loop. Updates values for operational modules
         while skipping specified modules and categories.
+
+        Returns one PlantReport row (as a dict) per updated module, stamped
+        with `timestamp` (default: now); persisting them is left to the
+        caller so the tick never waits on the database.
         """
-        # A set of specific modules to exclude from any updates
-        excluded_modules = {'Fire Safety System', 'Cooling Safety Backup'}
+        now = timestamp or datetime.utcnow()
+        rng = self.random
+        excluded = self.excluded
+        samples = []
 
         for category, modules in self.state.items():
             # RULE: Skip the entire Environmental & Compliance Module
-            if category == "Environmental & Compliance Module":
+            if category in EXCLUDED_CATEGORIES:
                 continue
 
             for name, data in modules.items():
                 # RULE: Skip the specific safety modules
-                if name in excluded_modules:
+                if name in excluded:
                     continue
 
                 status = data.get('status', 'Offline')
 
-                # Apply fluctuations only to modules that are 'Online' or 'Active'
-                if status in ['Online', 'Active']:
+                # Apply fluctuations only to running modules
+                if status in RUNNING_STATUSES:
                     if 'power_output_mw' in data:
-                        data['power_output_mw'] = max(0, data['power_output_mw'] + random.uniform(-5, 5))
+                        data['power_output_mw'] = max(0, data['power_output_mw'] + rng.uniform(-5, 5))
                     if 'temp_c' in data:
-                        data['temp_c'] += random.uniform(-0.5, 0.5)
+                        data['temp_c'] += rng.uniform(-0.5, 0.5)
                     if 'rpm' in data:
-                        data['rpm'] += random.randint(-5, 5)
+                        data['rpm'] += rng.randint(-5, 5)
                     if 'pressure_psi' in data:
-                        data['pressure_psi'] += random.uniform(-1, 1)
+                        data['pressure_psi'] += rng.uniform(-1, 1)
                     if 'flow_rate_gpm' in data:
-                        data['flow_rate_gpm'] += random.randint(-100, 100)
+                        data['flow_rate_gpm'] += rng.randint(-100, 100)
                     if 'water_temp_c' in data:
-                        data['water_temp_c'] += random.uniform(-0.1, 0.1)
+                        data['water_temp_c'] += rng.uniform(-0.1, 0.1)
 
                 # Handle gradual shutdown logic
                 elif status == 'shutting_down':
                     power = data.get('power_output_mw', 0)
                     if power > 0:
-                        data['power_output_mw'] = max(0, power * 0.8 - random.uniform(0, 20))
+                        data['power_output_mw'] = max(0, power * 0.8 - rng.uniform(0, 20))
                     else:
                         data['status'] = 'Offline'
                         if 'temp_c' in data: data['temp_c'] = 25
@@ -80,36 +243,26 @@ class PowerPlantSimulator:
                 elif status == 'starting_up':
                     power = data.get('power_output_mw', 0)
                     if power < 800:
-                        data['power_output_mw'] += random.uniform(50, 80)
+                        data['power_output_mw'] += rng.uniform(50, 80)
                     else:
                         data['status'] = 'Online'
                 
-                new_report = PlantReport(
-                    module_name=name,
-                    status=data.get('status'),
-                    power_output_mw=data.get('power_output_mw'),
-                    temperature_c=data.get('temp_c')
-                )
-                db.session.add(new_report)
-
+                samples.append({
+                    'module_name': name,
+                    'module_type': module_type_for(name),
+                    'status': data.get('status'),
+                    'power_output_mw': data.get('power_output_mw'),
+                    'temperature_c': data.get('temp_c'),
+                    'timestamp': now,
+                })
 
-        db.session.commit()
+        return samples
 
     def handle_action(self, module_id, action):
-        for category, modules in self.state.items():
-            for name, data in modules.items():
-                if name.lower().replace(' ', '_') == module_id:
-                    if action == 'stop' and data['status'] in ['Online', 'Active']:
-                        # For modules with power, start a shutdown. For others, just stop them.
-                        if 'power_output_mw' in data:
-                            data['status'] = 'shutting_down'
-                        else:
-                            data['status'] = 'Offline'
-                        return f"{name} is stopping."
-                    if action == 'start' and data['status'] in ['Offline', 'Standby']:
-                        if 'power_output_mw' in data:
-                            data['status'] = 'starting_up'
-                        else:
-                            data['status'] = 'Active' # or 'Online' for non-power modules
-                        return f"{name} is starting."
-        return f"Action '{action}' on '{module_id}' could not be completed."
\ No newline at end of file
+        record = self.modules.get(module_id)
+        fn = ACTIONS.get(action)
+        if record is not None and fn is not None:
+            message = fn(record.name, record.data)
+            if message:
+                return message
+        return f"Action '{action}' on '{module_id}' could not be completed."
@@ -1,13 +1,16 @@
 $(document).ready(function() {
     let currentModuleId = null;
     let currentModuleCategory = null;
+    // Latest plant state; starts with what the page was rendered with
+    let plantData = categorizedModuleData;
+    let stateVersion = initialStateVersion;
 
     // --- Hover (Tooltip) Functionality ---
     $('.module-block').hover(
         function(e) { // Mouse enter
             const category = $(this).data('category');
             const moduleName = $(this).find('.module-name').text();
-            const data = categorizedModuleData[category][moduleName];
+            const data = plantData[category] && plantData[category][moduleName];
             const tooltip = $('#module-tooltip');
 
             if (data) {
@@ -98,7 +101,7 @@ $(document).ready(function() {
             } else if (action === 'stop') {
                 newStatus = 'offline';
             } else if (action === 'low_power_mode') {
-                newStatus = 'standby'; // Or any other status you want
+                newStatus = 'low_power';
             }
 
             // Apply the new status to the block
@@ -112,24 +115,34 @@ $(document).ready(function() {
         }
     });
 }
+function applyChanges(payload) {
+        // Patch only the modules that changed since the version we hold
+        const changes = payload.changes;
+        for (const category in changes) {
+            if (!plantData[category]) {
+                plantData[category] = {};
+            }
+            for (const moduleName in changes[category]) {
+                const moduleData = changes[category][moduleName];
+                plantData[category][moduleName] = moduleData;
+                const moduleId = moduleName.toLowerCase().replace(/ /g, '_');
+                $(`#${moduleId}`).attr('data-status', moduleData.status.toLowerCase());
+            }
+        }
+        stateVersion = payload.version;
+    }
+
 function fetchAndUpdateData() {
         $.ajax({
             url: '/api/plant_data',
             type: 'GET',
-            success: function(newData) {
-                // 1. Update the global JavaScript variable with the new data
-                window.categorizedModuleData = newData;
-
-                // 2. Update the visual status of each block on the page
-                $('.module-block').each(function() {
-                    const block = $(this);
-                    const category = block.data('category');
-                    const moduleName = block.find('.module-name').text();
-                    const moduleData = newData[category][moduleName];
-                    if (moduleData) {
-                        block.attr('data-status', moduleData.status.toLowerCase());
-                    }
-                });
+            data: { since: stateVersion },
+            headers: { 'If-None-Match': `"${stateVersion}"` },
+            success: function(payload, textStatus, xhr) {
+                if (xhr.status === 304) {
+                    return; // Nothing changed since the last update
+                }
+                applyChanges(payload);
                 console.log("Dashboard updated with live data at:", new Date().toLocaleTimeString());
             },
             error: function(error) {
@@ -138,8 +151,36 @@ function fetchAndUpdateData() {
         });
     }
 
-    // --- 10-second update interval ---
-    setInterval(fetchAndUpdateData, 1000);
+    // --- Live updates: server push, with 1-second polling as a fallback ---
+    let pollTimer = null;
 
-});
+    function startPolling() {
+        if (pollTimer === null) {
+            pollTimer = setInterval(fetchAndUpdateData, 1000);
+        }
+    }
 
+    function stopPolling() {
+        if (pollTimer !== null) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    }
+
+    if (typeof io !== 'undefined') {
+        const socket = io();
+        socket.on('connect', stopPolling);
+        socket.on('disconnect', startPolling);
+        socket.on('connect_error', startPolling);
+        socket.on('plant_data', function(payload) {
+            if (payload.since > stateVersion) {
+                fetchAndUpdateData(); // We missed a push; catch up first
+            } else {
+                applyChanges(payload);
+            }
+        });
+    } else {
+        startPolling();
+    }
+
+});
@@ -0,0 +1,71 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from . import db
+
+# Pool settings for file-backed SQLite when SQLALCHEMY_ENGINE_OPTIONS doesn't
+# give them. The tick writer, the report writer, the socket thread and the
+# request threads each hold a connection at times; in-memory databases keep
+# Flask-SQLAlchemy's single shared connection.
+SQLITE_POOL_OPTIONS = {
+    'pool_size': 10,
+    'max_overflow': 10,
+    'pool_timeout': 30,
+}
+
+
+def is_sqlite_file(uri):
+    if uri is None:
+        return False
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS with the SQLite pool defaults filled in."""
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if is_sqlite_file(config.get('SQLALCHEMY_DATABASE_URI')) and 'poolclass' not in options:
+        for name, value in SQLITE_POOL_OPTIONS.items():
+            options.setdefault(name, value)
+    return options
+
+
+def apply_pragmas(pragmas):
+    """A connect-event listener that runs `PRAGMA name=value` for each pragma."""
+    statements = [f'PRAGMA {name}={value}' for name, value in pragmas.items()]
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def pragma_values(names):
+    """The current connection's value of each pragma, e.g. for checking WAL is on."""
+    connection = db.session.connection().connection
+    cursor = connection.cursor()
+    try:
+        return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0] for name in names}
+    finally:
+        cursor.close()
+
+
+def init_app(app):
+    """
+    Sets up the database for the app: engine options first, since
+    Flask-SQLAlchemy creates the engines in init_app, then the pragmas on
+    each SQLite engine's connect event so every pooled connection gets them.
+    """
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    if not pragmas:
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', apply_pragmas(pragmas))
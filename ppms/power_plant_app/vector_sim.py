@@ -0,0 +1,289 @@
+from datetime import datetime
+
+import numpy as np
+
+from .simulation import (ACTIONS, EXCLUDED_CATEGORIES, EXCLUDED_MODULES, PRIVATE_FIELDS, PowerPlantSimulator,
+                         module_id_for, module_type_for)
+
+# Numeric fields that fluctuate while a module is Online/Active, with the
+# same per-tick noise as PowerPlantSimulator.update(): (low, high, integer)
+FIELDS = {
+    'power_output_mw': (-5, 5, False),
+    'temp_c': (-0.5, 0.5, False),
+    'rpm': (-5, 5, True),
+    'pressure_psi': (-1, 1, False),
+    'flow_rate_gpm': (-100, 100, True),
+    'water_temp_c': (-0.1, 0.1, False),
+}
+STATUSES = ['Online', 'Active', 'Standby', 'Offline', 'shutting_down', 'starting_up', 'low_power',
+            'Ready', 'Operational']
+ONLINE, ACTIVE, STANDBY, OFFLINE, SHUTTING_DOWN, STARTING_UP, LOW_POWER = range(7)
+
+
+class VectorSimulator:
+    """
+    Array-backed drop-in for PowerPlantSimulator, meant for fleets with
+    thousands of modules. Every numeric field is one float64 array over all
+    modules (plus a mask of which modules have it) and statuses are small
+    integer codes, so one tick is a handful of masked vector operations
+    instead of a Python loop per module. `state` renders the same nested
+    dict the dashboard and API expect.
+    """
+
+    # `state` renders a new dict on every access, so the engine can publish
+    # it without copying
+    state_is_copy = True
+    private_fields = PRIVATE_FIELDS
+
+    def __init__(self, state=None, excluded=None, module_types=None, seed=None):
+        state = state if state is not None else PowerPlantSimulator().state
+        excluded = EXCLUDED_MODULES if excluded is None else excluded
+        self.rng = np.random.default_rng(seed)
+        self.statuses = list(STATUSES)
+        self.categories = []
+        self.names = []
+        self.extras = []   # non-numeric fields (fuel level, last test, ...) kept as-is
+        self.index = {}    # module id ('reactor_1') -> position in the arrays
+        rows = []
+        for category, modules in state.items():
+            for name, data in modules.items():
+                self.index[module_id_for(name)] = len(self.names)
+                self.categories.append(category)
+                self.names.append(name)
+                self.extras.append({k: v for k, v in data.items() if k != 'status' and k not in FIELDS})
+                rows.append(data)
+
+        n = len(self.names)
+        module_types = module_types or {}
+        self.module_types = [module_types.get(name) or module_type_for(name) for name in self.names]
+        self.status = np.array([self._status_code(row.get('status', 'Offline')) for row in rows], dtype=np.int16)
+        self.values = {}
+        self.has = {}
+        for field in FIELDS:
+            self.has[field] = np.array([field in row for row in rows], dtype=bool)
+            self.values[field] = np.array([float(row.get(field, 0)) for row in rows], dtype=np.float64)
+        self.updatable = np.array([
+            category not in EXCLUDED_CATEGORIES and name not in excluded
+            for category, name in zip(self.categories, self.names)
+        ], dtype=bool) if n else np.zeros(0, dtype=bool)
+        self._derive()
+
+    def _derive(self):
+        # Lookups computed from the arrays once, not per tick
+        self._updatable_idx = np.flatnonzero(self.updatable)
+        self._sample_names = [self.names[i] for i in self._updatable_idx]
+        self._sample_types = [self.module_types[i] for i in self._updatable_idx]
+
+    def checkpoint(self):
+        """
+        Copies of the arrays plus the module list, RNG state and other
+        fields as JSON-serializable meta; see PowerPlantSimulator.checkpoint.
+        Only the arrays are copied, so this stays cheap for large fleets.
+        """
+        meta = {
+            'backend': 'vector',
+            'names': self.names,
+            'categories': self.categories,
+            'module_types': self.module_types,
+            'statuses': self.statuses,
+            'extras': list(self.extras),   # handle_action replaces a module's dict, never mutates it
+            'rng': self.rng.bit_generator.state,
+        }
+        arrays = {'status': self.status.copy(), 'updatable': self.updatable.copy()}
+        for field in FIELDS:
+            arrays['value_' + field] = self.values[field].copy()
+            arrays['has_' + field] = self.has[field].copy()
+        return meta, arrays
+
+    @classmethod
+    def from_checkpoint(cls, meta, arrays):
+        """Rebuilds a simulator straight from checkpointed arrays, without a per-module loop."""
+        simulator = cls.__new__(cls)
+        simulator.names = list(meta['names'])
+        simulator.categories = list(meta['categories'])
+        simulator.module_types = list(meta['module_types'])
+        simulator.statuses = list(meta['statuses'])
+        simulator.extras = list(meta['extras'])
+        simulator.index = {module_id_for(name): i for i, name in enumerate(simulator.names)}
+        simulator.rng = np.random.default_rng()
+        simulator.rng.bit_generator.state = meta['rng']
+        simulator.status = arrays['status'].astype(np.int16)
+        simulator.updatable = arrays['updatable'].astype(bool)
+        simulator.values = {field: arrays['value_' + field].astype(np.float64) for field in FIELDS}
+        simulator.has = {field: arrays['has_' + field].astype(bool) for field in FIELDS}
+        simulator._derive()
+        return simulator
+
+    def apply_report(self, name, status, power_output_mw, temperature_c):
+        """Sets a module's status, power and temperature from a PlantReport row."""
+        i = self.index.get(module_id_for(name))
+        if i is None:
+            return
+        self.status[i] = self._status_code(status)
+        if power_output_mw is not None and self.has['power_output_mw'][i]:
+            self.values['power_output_mw'][i] = power_output_mw
+        if temperature_c is not None and self.has['temp_c'][i]:
+            self.values['temp_c'][i] = temperature_c
+
+    def add_module(self, category, name, data, module_type=None):
+        """Adds a module (or replaces one of the same name) at the end of the arrays."""
+        module_id = module_id_for(name)
+        if module_id in self.index:
+            self.remove_module(module_id)
+        self.index[module_id] = len(self.names)
+        self.categories.append(category)
+        self.names.append(name)
+        self.module_types.append(module_type or module_type_for(name))
+        self.extras.append({k: v for k, v in data.items() if k != 'status' and k not in FIELDS})
+        self.status = np.append(self.status, np.int16(self._status_code(data.get('status', 'Offline'))))
+        for field in FIELDS:
+            self.has[field] = np.append(self.has[field], field in data)
+            self.values[field] = np.append(self.values[field], float(data.get(field, 0)))
+        self.updatable = np.append(self.updatable, category not in EXCLUDED_CATEGORIES and name not in EXCLUDED_MODULES)
+        self._derive()
+
+    def remove_module(self, module_id):
+        """Removes a module and compacts the arrays; the modules after it move up one position."""
+        i = self.index.pop(module_id)
+        keep = np.arange(len(self.names)) != i
+        for values in (self.categories, self.names, self.module_types, self.extras):
+            del values[i]
+        self.status = self.status[keep]
+        self.updatable = self.updatable[keep]
+        for field in FIELDS:
+            self.has[field] = self.has[field][keep]
+            self.values[field] = self.values[field][keep]
+        self.index = {other: j - (j > i) for other, j in self.index.items()}
+        self._derive()
+
+    def _status_code(self, status):
+        if status not in self.statuses:
+            self.statuses.append(status)
+        return self.statuses.index(status)
+
+    def update(self, collect=True, timestamp=None):
+        """
+        Applies one tick of the PowerPlantSimulator rules as masked vector
+        operations. Returns the PlantReport sample dicts like the dict engine,
+        stamped with `timestamp` (default: now), unless collect is False.
+        """
+        power = self.values['power_output_mw']
+        has_power = self.has['power_output_mw']
+        # Masks are taken from the status at the start of the tick, as in the
+        # dict engine's if/elif chain
+        status = self.status
+        active = self.updatable & ((status == ONLINE) | (status == ACTIVE) | (status == LOW_POWER))
+        shutting = self.updatable & (status == SHUTTING_DOWN)
+        starting = self.updatable & (status == STARTING_UP)
+
+        for field, (low, high, integer) in FIELDS.items():
+            idx = np.flatnonzero(active & self.has[field])
+            if not idx.size:
+                continue
+            if integer:
+                delta = self.rng.integers(low, high + 1, size=idx.size)
+            else:
+                delta = self.rng.uniform(low, high, size=idx.size)
+            self.values[field][idx] += delta
+        np.maximum(power, 0, out=power, where=active & has_power)
+
+        # Gradual shutdown: decay power, then go Offline and cool down
+        current = np.where(has_power, power, 0)
+        decaying = np.flatnonzero(shutting & (current > 0))
+        power[decaying] = np.maximum(0, power[decaying] * 0.8 - self.rng.uniform(0, 20, size=decaying.size))
+        stopped = shutting & ~(current > 0)
+        self.status[stopped] = OFFLINE
+        self.values['temp_c'][stopped & self.has['temp_c']] = 25
+        self.values['rpm'][stopped & self.has['rpm']] = 0
+
+        # Gradual startup: ramp power, then go Online
+        ramping = np.flatnonzero(starting & (current < 800))
+        power[ramping] += self.rng.uniform(50, 80, size=ramping.size)
+        self.status[starting & ~(current < 800)] = ONLINE
+
+        if not collect:
+            return None
+        return self.samples(timestamp)
+
+    def samples(self, timestamp=None):
+        """PlantReport rows for every updatable module at the current state."""
+        now = timestamp or datetime.utcnow()
+        idx = self._updatable_idx
+        statuses = np.array(self.statuses, dtype=object)[self.status[idx]].tolist()
+        power = np.where(self.has['power_output_mw'][idx], self.values['power_output_mw'][idx], None).tolist()
+        temp = np.where(self.has['temp_c'][idx], self.values['temp_c'][idx], None).tolist()
+        return [{
+            'module_name': name,
+            'module_type': module_type,
+            'status': status,
+            'power_output_mw': p,
+            'temperature_c': t,
+            'timestamp': now,
+        } for name, module_type, status, p, t in zip(self._sample_names, self._sample_types, statuses, power, temp)]
+
+    @property
+    def state(self):
+        """Renders the nested {category: {module: fields}} view of the arrays."""
+        columns = {field: self.values[field].tolist() for field in FIELDS}
+        has = {field: self.has[field].tolist() for field in FIELDS}
+        status = self.status.tolist()
+        state = {}
+        for i, name in enumerate(self.names):
+            data = {'status': self.statuses[status[i]]}
+            for field, (_, _, integer) in FIELDS.items():
+                if has[field][i]:
+                    value = columns[field][i]
+                    data[field] = int(value) if integer else value
+            data.update(self.extras[i])
+            state.setdefault(self.categories[i], {})[name] = data
+        return state
+
+    def module_ids(self, module_type=None):
+        """Ids of all modules, or of those of one type ('turbine')."""
+        return [module_id for module_id, i in self.index.items()
+                if module_type is None or self.module_types[i] == module_type]
+
+    def handle_action(self, module_id, action):
+        i = self.index.get(module_id)
+        fn = ACTIONS.get(action)
+        if i is not None and fn is not None:
+            # Run the shared action on a dict view of the module, then store it back
+            data = dict(self.extras[i], status=self.statuses[self.status[i]])
+            for field in FIELDS:
+                if self.has[field][i]:
+                    data[field] = self.values[field][i]
+            message = fn(self.names[i], data)
+            if message:
+                self.status[i] = self._status_code(data.pop('status'))
+                for field in FIELDS:
+                    if field in data:
+                        self.values[field][i] = data.pop(field)
+                self.extras[i] = data
+                return message
+        return f"Action '{action}' on '{module_id}' could not be completed."
+
+
+def build_fleet(n_modules):
+    """
+    Builds a fleet state of n_modules by repeating the default plant with
+    'P<n> ' prefixed module names. Returns (state, excluded, module_types)
+    ready to pass to VectorSimulator.
+    """
+    template = PowerPlantSimulator().state
+    per_plant = sum(len(modules) for modules in template.values())
+    state = {category: {} for category in template}
+    excluded = set()
+    module_types = {}
+    count = 0
+    for plant in range(1, n_modules // per_plant + 2):
+        for category, modules in template.items():
+            for name, data in modules.items():
+                if count == n_modules:
+                    return state, excluded, module_types
+                fleet_name = f'P{plant} {name}'
+                state[category][fleet_name] = dict(data)
+                module_types[fleet_name] = module_type_for(name)
+                if name in EXCLUDED_MODULES:
+                    excluded.add(fleet_name)
+                count += 1
+    return state, excluded, module_types
@@ -0,0 +1,93 @@
+import unittest
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard
+from power_plant_app.alerts import AlertEngine, RateOfChangeRule, ThresholdRule
+from power_plant_app.engine import Snapshot
+from power_plant_app.models import Notification
+
+
+def snapshot(version, modules):
+    state = {'Operation Module': modules}
+    return Snapshot(version, state, {('Operation Module', name): version for name in modules})
+
+
+class AlertRuleTests(unittest.TestCase):
+
+    def test_threshold_uses_hysteresis(self):
+        """An alert fires once when crossing the limit and re-arms only below `clear`."""
+        alerts = AlertEngine([ThresholdRule('Hot', 'temp_c', above=340, clear=335)], cooldown=0)
+        temps = [330, 341, 345, 338, 341, 334, 342]
+        fired = [bool(alerts.evaluate(snapshot(v, {'Reactor 1': {'temp_c': t}})))
+                 for v, t in enumerate(temps, 1)]
+        self.assertEqual(fired, [False, True, False, False, False, False, True])
+
+    def test_rate_of_change_over_window(self):
+        alerts = AlertEngine([RateOfChangeRule('Rising', 'temp_c', window=3, max_change=5)], cooldown=0)
+        temps = [300, 302, 304, 306, 306, 306, 306]
+        fired = [bool(alerts.evaluate(snapshot(v, {'Reactor 1': {'temp_c': t}})))
+                 for v, t in enumerate(temps, 1)]
+        self.assertEqual(fired, [False, False, False, True, False, False, False])
+
+    def test_only_changed_modules_are_checked(self):
+        alerts = AlertEngine([ThresholdRule('Hot', 'temp_c', above=340)], cooldown=0)
+        published = snapshot(2, {'Reactor 1': {'temp_c': 350}})
+        published.module_versions[('Operation Module', 'Reactor 1')] = 1
+        self.assertEqual(alerts.evaluate(published), [])
+
+    def test_changes_in_skipped_versions_are_checked(self):
+        alerts = AlertEngine([ThresholdRule('Hot', 'temp_c', above=340)], cooldown=0)
+        alerts.evaluate(snapshot(1, {'Reactor 1': {'temp_c': 300}}))
+        published = snapshot(3, {'Reactor 1': {'temp_c': 350}})
+        published.module_versions[('Operation Module', 'Reactor 1')] = 2
+        self.assertEqual(len(alerts.evaluate(published)), 1)
+
+    def test_cooldown_and_cap_dedupe_notifications(self):
+        """Flapping alerts notify once per cooldown; a burst is capped with a summary."""
+        rules = [ThresholdRule(f'Rule {i}', 'temp_c', above=340, clear=335) for i in range(30)]
+        alerts = AlertEngine(rules, cooldown=300, max_per_tick=20)
+        messages = alerts.evaluate(snapshot(1, {'Reactor 1': {'temp_c': 350}}))
+        self.assertEqual(len(messages), 21)
+        self.assertEqual(messages[-1], '10 more alerts were raised in the same tick.')
+        alerts.evaluate(snapshot(2, {'Reactor 1': {'temp_c': 300}}))
+        messages = alerts.evaluate(snapshot(3, {'Reactor 1': {'temp_c': 350}}))
+        # The first 20 are cooling down; the 10 suppressed ones get their turn
+        self.assertEqual(len(messages), 10)
+
+
+class AlertNotificationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        dashboard.writer.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_shutdown_completion_becomes_notification(self):
+        """A reactor finishing its shutdown is announced in the next writer batch."""
+        dashboard.writer.write_behind = True   # queued; the writer thread isn't running
+        dashboard.engine.handle_action('reactor_1', 'stop')
+        for _ in range(60):
+            dashboard.engine.tick()
+            if dashboard.engine.snapshot['Operation Module']['Reactor 1']['status'] == 'Offline':
+                break
+        self.assertEqual(Notification.query.count(), 0)
+        dashboard.writer.flush()
+        messages = [n.message for n in Notification.query]
+        self.assertIn('Module shut down: Reactor 1 went from shutting_down to Offline.', messages)
+        dashboard.engine.handle_action('reactor_1', 'start')
+
+
+if __name__ == '__main__':
+    unittest.main()
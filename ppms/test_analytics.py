@@ -0,0 +1,121 @@
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import polars as pl
+
+from power_plant_app import create_app, db
+from power_plant_app.analytics import cache, compute_kpis, module_kpis
+from power_plant_app.archive import SCHEMA
+from power_plant_app.models import PlantReport, User
+from werkzeug.security import generate_password_hash
+
+START = datetime(2025, 1, 1)
+
+
+def reactor_rows(statuses, name='Reactor 1', power=500.0, start=START):
+    """One sample per second with the given statuses."""
+    return [{'timestamp': start + timedelta(seconds=i), 'module_name': name, 'module_type': 'reactor',
+             'status': status, 'power_output_mw': power, 'temperature_c': 300.0 + i}
+            for i, status in enumerate(statuses)]
+
+
+class ComputeKPITests(unittest.TestCase):
+
+    def kpis(self, rows, **kwargs):
+        return compute_kpis(pl.DataFrame(rows, schema=SCHEMA).lazy(), **kwargs)
+
+    def test_power_and_temperature(self):
+        kpi = self.kpis(reactor_rows(['Online'] * 101))['Reactor 1']
+        self.assertEqual(kpi['samples'], 101)
+        self.assertEqual(kpi['covered_seconds'], 101)
+        self.assertAlmostEqual(kpi['capacity_factor'], 0.5)
+        self.assertEqual(kpi['power_peak_mw'], 500.0)
+        self.assertEqual((kpi['temp_p50'], kpi['temp_p99']), (350.0, 399.0))
+        self.assertEqual(kpi['status_seconds'], {'Online': 101})
+
+    def test_transition_durations_skip_cut_off_runs(self):
+        """Only startups/shutdowns seen from beginning to end are timed."""
+        statuses = ['starting_up'] * 3 + ['Online'] * 5 + ['shutting_down'] * 4 + ['Offline'] * 2 \
+            + ['starting_up'] * 6 + ['Online'] * 2 + ['shutting_down'] * 3
+        kpi = self.kpis(reactor_rows(statuses))['Reactor 1']
+        self.assertEqual(kpi['startups'], {'count': 1, 'mean_seconds': 6.0, 'max_seconds': 6.0})
+        self.assertEqual(kpi['shutdowns'], {'count': 1, 'mean_seconds': 4.0, 'max_seconds': 4.0})
+
+    def test_gaps_are_capped(self):
+        rows = reactor_rows(['Online'] * 2) + reactor_rows(['Offline'] * 2, start=START + timedelta(hours=1))
+        kpi = self.kpis(rows, max_gap=10)['Reactor 1']
+        self.assertEqual(kpi['status_seconds'], {'Online': 11, 'Offline': 2})
+
+    def test_modules_without_power(self):
+        rows = [dict(row, module_name='Turbine 1', module_type='turbine', power_output_mw=None)
+                for row in reactor_rows(['Online'] * 3)]
+        kpi = self.kpis(rows)['Turbine 1']
+        self.assertIsNone(kpi['capacity_factor'])
+        self.assertIsNone(kpi['energy_mwh'])
+
+
+class AnalyticsCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.archive = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+            'ARCHIVE_DIR': self.archive.name,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        admin = User(username='zeus', password_hash=generate_password_hash('zeus'), role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = admin.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.archive.cleanup()
+
+    def add(self, rows):
+        db.session.add_all(PlantReport(**row) for row in rows)
+        db.session.commit()
+
+    def test_cached_until_data_lands_in_range(self):
+        self.add(reactor_rows(['Online'] * 10))
+        end = START + timedelta(minutes=1)
+        self.assertEqual(module_kpis(START, end)['Reactor 1']['samples'], 10)
+        # Newer rows outside the range leave the entry valid
+        self.add(reactor_rows(['Online'] * 5, start=START + timedelta(hours=1)))
+        module_kpis(START, end)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        # Rows inside the range (a backfill, say) invalidate it
+        self.add(reactor_rows(['Online'] * 5, name='Reactor 2', start=START + timedelta(seconds=20)))
+        self.assertEqual(set(module_kpis(START, end)), {'Reactor 1', 'Reactor 2'})
+        self.assertEqual(cache.misses, 2)
+
+    def test_api(self):
+        self.add(reactor_rows(['Online'] * 10))
+        response = self.client.get('/api/analytics?start=2025-01-01&end=2025-01-01&module=Reactor 1')
+        body = response.get_json()
+        self.assertEqual(body['end'], '2025-01-02T00:00:00')
+        self.assertEqual(body['modules']['Reactor 1']['samples'], 10)
+        self.assertEqual(self.client.get('/api/analytics?start=2025-01-02&end=2025-01-01T00:00').status_code, 400)
+        self.assertIn(b'Reactor KPIs', self.client.get('/reports').data)
+
+    def test_default_range_is_memoized(self):
+        cache.clear()
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/analytics').status_code, 200)
+        # Unless the minute rolls over between the calls
+        self.assertLessEqual(cache.misses, 2)
+        self.assertLessEqual(len(cache.entries), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
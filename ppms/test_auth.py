@@ -0,0 +1,142 @@
+import io
+import json
+import unittest
+
+from sqlalchemy import event
+
+from power_plant_app import create_app, db
+from power_plant_app.auth import identity_cache
+from power_plant_app.passwords import hasher
+from power_plant_app.models import User
+from werkzeug.security import generate_password_hash
+
+
+class IdentityCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.admin = User(username='zeus', password_hash=generate_password_hash('zeus'), role='admin')
+        self.operator = User(username='harris', password_hash=generate_password_hash('harris'), role='operator')
+        db.session.add_all([self.admin, self.operator])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def client_for(self, user):
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user.id
+        return client
+
+    def count_queries(self, fn):
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return statements
+
+    def test_api_poll_does_not_touch_database(self):
+        """After the first request, polls are served from the identity cache."""
+        client = self.client_for(self.operator)
+        client.get('/api/plant_data')
+        statements = self.count_queries(lambda: client.get('/api/plant_data'))
+        self.assertEqual(statements, [])
+
+    def test_role_change_invalidates_cache(self):
+        """A role changed in manage_users applies on the user's next request."""
+        operator = self.client_for(self.operator)
+        self.assertEqual(operator.get('/schedule_maintenance').status_code, 302)
+        self.client_for(self.admin).post('/auth/manage_users', data={
+            'action': 'update_role', 'user_id': self.operator.id, 'role': 'safety'})
+        self.assertEqual(db.session.get(User, self.operator.id).role, 'safety')
+        self.assertEqual(operator.get('/schedule_maintenance').status_code, 200)
+
+    def test_cache_evicts_least_recently_used(self):
+        identity_cache.max_size = 1
+        try:
+            identity_cache.get(self.admin.id)
+            identity_cache.get(self.operator.id)
+            self.assertEqual(list(identity_cache._entries), [self.operator.id])
+        finally:
+            identity_cache.init_app(self.app)
+
+
+class PasswordTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+            'PASSWORD_HASH_WORKERS': 1,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.admin = User(username='zeus', password_hash=generate_password_hash('zeus'), role='admin')
+        db.session.add(self.admin)
+        db.session.commit()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        hasher.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, username, password):
+        return self.client.post('/auth/login', data={'username': username, 'password': password})
+
+    def test_login_checks_hash_in_pool(self):
+        self.assertEqual(self.login('zeus', 'wrong').status_code, 200)
+        response = self.login('zeus', 'zeus')
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.client.get('/auth/manage_users').status_code, 200)
+
+    def test_full_queue_rejects_login(self):
+        self.app.config['PASSWORD_HASH_MAX_PENDING'] = 0
+        hasher.init_app(self.app)
+        response = self.login('zeus', 'zeus')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn(b'busy', response.data)
+
+    def import_file(self, name, content):
+        self.login('zeus', 'zeus')
+        return self.client.post('/auth/manage_users', data={
+            'action': 'import', 'users_file': (io.BytesIO(content.encode()), name)})
+
+    def test_bulk_import(self):
+        self.import_file('users.csv', 'username,password,role\nalpha,a-pass,operator\nbeta,b-pass,safety\n')
+        users = {user.username: user for user in User.query.all()}
+        self.assertEqual(users['beta'].role, 'safety')
+        self.assertEqual(users['alpha'].last_read_notification_id, 0)
+        self.client.get('/auth/logout')
+        self.assertEqual(self.login('beta', 'b-pass').status_code, 302)
+
+    def test_bulk_import_is_all_or_nothing(self):
+        rows = [{'username': 'gamma', 'password': 'g'}, {'username': 'zeus', 'password': 'z'},
+                {'username': 'delta', 'password': 'd', 'role': 'janitor'}]
+        self.import_file('users.json', json.dumps(rows))
+        self.assertEqual(User.query.count(), 1)
+        page = self.client.get('/auth/manage_users').get_data(as_text=True)
+        self.assertIn('Row 2: username &#34;zeus&#34; already exists.', page)
+        self.assertIn('Row 3: invalid role &#34;janitor&#34;.', page)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,67 @@
+import unittest
+from datetime import datetime, timedelta
+
+from power_plant_app import create_app, db
+from power_plant_app.backfill import make_simulator, simulate
+from power_plant_app.models import PlantReport, PlantReportRollup
+
+START = datetime(2025, 1, 1)
+
+
+class SimulateTests(unittest.TestCase):
+
+    def run_ticks(self, seed, ticks=50, modules=None, actions=()):
+        return [sample for samples in simulate(make_simulator(seed, modules), ticks, START, 2.0, actions)
+                for sample in samples]
+
+    def test_same_seed_same_output(self):
+        self.assertEqual(self.run_ticks(7), self.run_ticks(7))
+        self.assertNotEqual(self.run_ticks(7), self.run_ticks(8))
+        self.assertEqual(self.run_ticks(7, modules=200), self.run_ticks(7, modules=200))
+
+    def test_simulated_timestamps_and_scripted_actions(self):
+        samples = self.run_ticks(1, ticks=10, actions=[{'tick': 5, 'module_id': 'reactor_1', 'action': 'stop'}])
+        reactor = [s for s in samples if s['module_name'] == 'Reactor 1']
+        self.assertEqual([s['timestamp'] for s in reactor], [START + timedelta(seconds=2 * i) for i in range(10)])
+        self.assertEqual([s['status'] for s in reactor[4:6]], ['Online', 'shutting_down'])
+
+
+class BackfillCommandTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_backfill_loads_reports_and_rollups(self):
+        result = self.app.test_cli_runner().invoke(args=[
+            'backfill', '120', '--seed', '3', '--start', '2025-01-01T00:00', '--action', '60:type=reactor:stop'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        rows = PlantReport.query.order_by(PlantReport.id)
+        self.assertEqual(rows.count(), 120 * 11)
+        self.assertEqual(rows.first().timestamp, START)
+        last = PlantReport.query.filter_by(module_name='Reactor 2').order_by(PlantReport.timestamp.desc()).first()
+        self.assertEqual(last.timestamp, START + timedelta(seconds=119))
+        self.assertIn(last.status, ('shutting_down', 'Offline'))
+        minutes = PlantReportRollup.query.filter_by(resolution='1m', module_name='Reactor 2')
+        self.assertEqual([r.sample_count for r in minutes], [60, 60])
+
+    def test_bad_action(self):
+        result = self.app.test_cli_runner().invoke(args=['backfill', '10', '--action', 'reactor_1:stop'])
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertEqual(PlantReport.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from power_plant_app import create_app, db
+from power_plant_app.checkpoint import VERSION_GAP, Checkpointer, build_simulator, load, save
+from power_plant_app.engine import TickEngine
+from power_plant_app.models import PlantReport
+from power_plant_app.simulation import PowerPlantSimulator
+from power_plant_app.vector_sim import VectorSimulator, build_fleet
+
+NOW = datetime(2025, 1, 1)
+
+
+class CheckpointFormatTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'plant.npz')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assert_resumes(self, simulator, backend):
+        """A simulator restored from a checkpoint continues exactly like the original."""
+        for _ in range(5):
+            simulator.update(timestamp=NOW)
+        simulator.handle_action(simulator.module_ids('reactor')[0], 'stop')
+        save(self.path, *simulator.checkpoint())
+        restored = build_simulator(*load(self.path), backend)
+        self.assertEqual(restored.state, simulator.state)
+        self.assertEqual(restored.update(timestamp=NOW), simulator.update(timestamp=NOW))
+
+    def test_dict_simulator(self):
+        self.assert_resumes(PowerPlantSimulator(seed=1), 'dict')
+
+    def test_vector_fleet(self):
+        self.assert_resumes(VectorSimulator(*build_fleet(500), seed=1), 'vector')
+
+    def test_switching_backend(self):
+        simulator = PowerPlantSimulator(seed=1)
+        simulator.handle_action('reactor_1', 'maintenance')
+        save(self.path, *simulator.checkpoint())
+        restored = build_simulator(*load(self.path), 'vector')
+        self.assertIsInstance(restored, VectorSimulator)
+        self.assertEqual(restored.state, simulator.state)
+
+
+class CheckpointerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.tmp.cleanup()
+
+    def checkpointer(self, engine):
+        checkpointer = Checkpointer(interval=60)
+        checkpointer.app = self.app
+        checkpointer.engine = engine
+        checkpointer.path = os.path.join(self.tmp.name, 'plant.npz')
+        return checkpointer
+
+    def test_restart_resumes_mid_shutdown(self):
+        engine = TickEngine(PowerPlantSimulator(seed=2))
+        checkpointer = self.checkpointer(engine)
+        engine.add_listener(checkpointer.on_publish)
+        engine.handle_action('reactor_1', 'stop')
+        engine.tick()
+        # At most one capture per interval; stop() writes the final state
+        checkpointer.stop()
+        self.assertEqual(checkpointer.last_saved_version, engine.version)
+
+        restarted = TickEngine(PowerPlantSimulator())
+        meta = self.checkpointer(restarted).restore(replay=False)
+        self.assertEqual(restarted.snapshot, engine.snapshot)
+        self.assertEqual(restarted.snapshot['Operation Module']['Reactor 1']['status'], 'shutting_down')
+        self.assertEqual(restarted.version, meta['version'] + VERSION_GAP)
+
+    def test_replay_applies_newer_reports(self):
+        engine = TickEngine(PowerPlantSimulator(seed=2))
+        checkpointer = self.checkpointer(engine)
+        checkpointer._pending = checkpointer.capture()
+        checkpointer.write_pending()
+        later = datetime.utcnow() + timedelta(seconds=5)
+        db.session.add_all([
+            PlantReport(module_name='Reactor 2', module_type='reactor', status='shutting_down',
+                        power_output_mw=400.0, temperature_c=300.0, timestamp=later - timedelta(seconds=1)),
+            PlantReport(module_name='Reactor 2', module_type='reactor', status='Offline',
+                        power_output_mw=0.0, temperature_c=25.0, timestamp=later),
+        ])
+        db.session.commit()
+
+        restarted = TickEngine(PowerPlantSimulator())
+        self.checkpointer(restarted).restore()
+        self.assertEqual(restarted.snapshot['Operation Module']['Reactor 2'],
+                         {'status': 'Offline', 'power_output_mw': 0.0, 'temp_c': 25.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
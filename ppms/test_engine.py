@@ -0,0 +1,267 @@
+import threading
+import time
+import unittest
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard
+from power_plant_app.models import Notification, User, PlantReport
+from power_plant_app.engine import TickEngine
+from power_plant_app.simulation import PowerPlantSimulator
+from power_plant_app.vector_sim import VectorSimulator, build_fleet
+from werkzeug.security import generate_password_hash
+
+
+class TickEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        """Runs before EACH test with the background ticker disabled."""
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        user = User(username='harris', password_hash=generate_password_hash('harris'), role='operator')
+        db.session.add(user)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = user.id
+
+    def tearDown(self):
+        dashboard.writer.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_polling_does_not_advance_simulation(self):
+        """Polling the API serves the snapshot without stepping the plant."""
+        ticks = dashboard.engine.tick_count
+        reports = PlantReport.query.count()
+        for _ in range(5):
+            response = self.client.get('/api/plant_data')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(dashboard.engine.tick_count, ticks)
+        self.assertEqual(PlantReport.query.count(), reports)
+
+    def test_tick_publishes_new_snapshot(self):
+        """Each engine tick replaces the snapshot instead of mutating it."""
+        before = dashboard.engine.snapshot
+        dashboard.engine.tick()
+        self.assertIsNot(dashboard.engine.snapshot, before)
+        self.assertIn('Reactor 1', self.client.get('/api/plant_data').get_json()['Operation Module'])
+
+    def test_tick_samples_are_written_behind(self):
+        """Tick samples land in PlantReport only when the writer flushes."""
+        dashboard.writer.write_behind = True   # queued; the writer thread isn't running
+        dashboard.writer.flush()
+        before = PlantReport.query.count()
+        dashboard.engine.tick()
+        dashboard.engine.tick()
+        self.assertEqual(PlantReport.query.count(), before)
+        dashboard.writer.flush()
+        self.assertEqual(PlantReport.query.count(), before + 22)
+
+    def test_without_write_behind_ticks_write_immediately(self):
+        before = PlantReport.query.count()
+        dashboard.engine.tick()
+        self.assertEqual(PlantReport.query.count(), before + 11)
+        self.assertTrue(dashboard.writer.queue.empty())
+
+    def test_failed_write_keeps_notifications(self):
+        dashboard.writer.submit_notifications([{'message': 'Kept', 'timestamp': None}])
+        self.assertEqual(Notification.query.filter_by(message='Kept').count(), 1)
+        db.drop_all()
+        with self.assertLogs(self.app.logger, 'ERROR'):
+            dashboard.writer.submit_notifications([{'message': 'Retried', 'timestamp': None}])
+        self.assertEqual([n['message'] for n in dashboard.writer.notifications], ['Retried'])
+        db.create_all()
+        dashboard.writer.flush()
+        self.assertEqual(Notification.query.filter_by(message='Retried').count(), 1)
+
+    def test_listeners_get_every_version_once_in_order(self):
+        """Ticks and actions on other threads: each version is delivered once, one listener call at a time."""
+        engine = TickEngine(PowerPlantSimulator(seed=1))
+        seen = []
+        running = []
+        overlaps = []
+
+        def listener(published):
+            running.append(published.version)
+            if len(running) > 1:
+                overlaps.append(list(running))
+            time.sleep(0.001)
+            seen.append(published.version)
+            running.remove(published.version)
+
+        engine.add_listener(listener)
+        threads = [threading.Thread(target=lambda: [engine.handle_action('reactor_1', 'start') for _ in range(20)])
+                   for _ in range(4)]
+        threads.append(threading.Thread(target=lambda: [engine.tick() for _ in range(20)]))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [])
+        self.assertEqual(seen, list(range(1, 101)))
+
+    def test_listener_may_republish(self):
+        engine = TickEngine(PowerPlantSimulator(seed=1))
+        seen = []
+
+        def listener(published):
+            seen.append(published.version)
+            if published.version == 1:
+                engine.handle_action('reactor_1', 'stop')
+                self.assertEqual(seen, [1])   # delivered after this listener returns
+
+        engine.add_listener(listener)
+        engine.tick()
+        self.assertEqual(seen, [1, 2])
+
+    def test_api_serves_role_view_encoded_once(self):
+        """Operators only get operation data, from a blob encoded once per version."""
+        response = self.client.get('/api/plant_data')
+        self.assertEqual(list(response.get_json()), ['Operation Module'])
+        published = dashboard.engine.published
+        blob = dashboard.role_json(published, 'operator')
+        self.assertIs(dashboard.role_json(published, 'operator'), blob)
+        self.assertEqual(response.get_data(as_text=True), blob)
+        dashboard.engine.tick()
+        self.assertIn('operator', [key[1] for key in dashboard.engine.published._views])
+
+    def test_unchanged_version_returns_304(self):
+        """A client holding the current version gets a 304 with no body."""
+        response = self.client.get('/api/plant_data')
+        etag = response.headers['ETag']
+        response = self.client.get('/api/plant_data', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        dashboard.engine.tick()
+        response = self.client.get('/api/plant_data', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_since_returns_only_changed_modules(self):
+        """?since= returns just the modules changed after that version."""
+        version = dashboard.engine.version
+        dashboard.engine.handle_action('turbine_2', 'stop')
+        payload = self.client.get(f'/api/plant_data?since={version}').get_json()
+        self.assertEqual(payload['version'], version + 1)
+        self.assertEqual(list(payload['changes']), ['Operation Module'])
+        self.assertEqual(list(payload['changes']['Operation Module']), ['Turbine 2'])
+        self.assertEqual(payload['changes']['Operation Module']['Turbine 2']['status'], 'Offline')
+        dashboard.engine.handle_action('turbine_2', 'start')
+
+    def test_action_is_visible_in_snapshot(self):
+        """Actions are applied under the engine lock and republished at once."""
+        dashboard.engine.handle_action('turbine_1', 'stop')
+        state = self.client.get('/api/plant_data').get_json()
+        self.assertEqual(state['Operation Module']['Turbine 1']['status'], 'Offline')
+        dashboard.engine.handle_action('turbine_1', 'start')
+
+    def test_bulk_actions_publish_once(self):
+        """A list of actions, including a whole module type, is one round trip and one version."""
+        version = dashboard.engine.version
+        response = self.client.post('/module_action', json={'actions': [
+            {'module_type': 'turbine', 'action': 'stop'},
+            {'module_id': 'reactor_2', 'action': 'low_power_mode'},
+        ]})
+        results = response.get_json()['results']
+        self.assertEqual([r['module_id'] for r in results], ['turbine_1', 'turbine_2', 'reactor_2'])
+        self.assertEqual(results[2]['message'], 'Reactor 2 is in low power mode.')
+        self.assertEqual(dashboard.engine.version, version + 1)
+        state = dashboard.engine.snapshot['Operation Module']
+        self.assertEqual([state['Turbine 1']['status'], state['Turbine 2']['status']], ['Offline', 'Offline'])
+        self.assertEqual(state['Reactor 2']['status'], 'low_power')
+        self.client.post('/module_action', json={'actions': [
+            {'module_type': 'turbine', 'action': 'start'},
+            {'module_id': 'reactor_2', 'action': 'start'},
+        ]})
+
+    def test_invalid_bulk_request_is_rejected(self):
+        response = self.client.post('/module_action', json={'actions': 'stop everything'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ModuleIndexTests(unittest.TestCase):
+
+    def test_index_follows_added_and_removed_modules(self):
+        for sim in (PowerPlantSimulator(), VectorSimulator(seed=1)):
+            with self.subTest(simulator=type(sim).__name__):
+                sim.add_module('Operation Module', 'Turbine 3', {'status': 'Online', 'rpm': 1800})
+                self.assertEqual(sim.module_ids('turbine'), ['turbine_1', 'turbine_2', 'turbine_3'])
+                self.assertEqual(sim.handle_action('turbine_3', 'stop'), 'Turbine 3 is stopping.')
+                self.assertEqual(sim.state['Operation Module']['Turbine 3']['status'], 'Offline')
+                self.assertIn('Turbine 3', [sample['module_name'] for sample in sim.update()])
+                sim.remove_module('turbine_1')
+                sim.remove_module('turbine_3')
+                self.assertNotIn('Turbine 3', sim.state['Operation Module'])
+                self.assertIn('could not be completed', sim.handle_action('turbine_3', 'start'))
+                # Modules after a removed one are still found by id
+                self.assertEqual(sim.handle_action('turbine_2', 'stop'), 'Turbine 2 is stopping.')
+                self.assertEqual(sim.state['Operation Module']['Turbine 2']['status'], 'Offline')
+                self.assertEqual(sim.module_ids('turbine'), ['turbine_2'])
+
+    def test_unknown_action_is_not_applied(self):
+        sim = PowerPlantSimulator()
+        self.assertIn('could not be completed', sim.handle_action('reactor_1', 'meltdown'))
+        self.assertEqual(sim.state['Operation Module']['Reactor 1']['status'], 'Online')
+
+
+class VectorSimulatorTests(unittest.TestCase):
+
+    def test_renders_same_shape_as_dict_engine(self):
+        """The vector engine's dict view matches the dict engine's layout."""
+        dict_state = PowerPlantSimulator().state
+        vector_state = VectorSimulator(seed=1).state
+        self.assertEqual(list(vector_state), list(dict_state))
+        for category, modules in dict_state.items():
+            self.assertEqual(list(vector_state[category]), list(modules))
+            for name, data in modules.items():
+                self.assertEqual(set(vector_state[category][name]), set(data))
+        self.assertEqual(len(VectorSimulator(seed=1).update()), len(PowerPlantSimulator().update()))
+
+    def test_shutdown_and_startup_rules(self):
+        """Stopped reactors decay to Offline at 25C; started ones ramp back Online."""
+        sim = VectorSimulator(seed=1)
+        sim.handle_action('reactor_1', 'stop')
+        sim.handle_action('turbine_1', 'stop')
+        for _ in range(60):
+            sim.update(collect=False)
+        state = sim.state['Operation Module']
+        self.assertEqual(state['Reactor 1']['status'], 'Offline')
+        self.assertEqual(state['Reactor 1']['temp_c'], 25)
+        self.assertEqual(state['Turbine 1'], {'status': 'Offline', 'rpm': 1800})
+        sim.handle_action('reactor_1', 'start')
+        for _ in range(20):
+            sim.update(collect=False)
+        self.assertEqual(sim.state['Operation Module']['Reactor 1']['status'], 'Online')
+        # Excluded modules never change
+        self.assertEqual(sim.state['Safety Module']['Fire Safety System']['status'], 'Active')
+
+    def test_low_power_mode_uses_shared_action(self):
+        """Registered actions run against the arrays too."""
+        sim = VectorSimulator(seed=1)
+        self.assertEqual(sim.handle_action('reactor_1', 'low_power_mode'), 'Reactor 1 is in low power mode.')
+        reactor = sim.state['Operation Module']['Reactor 1']
+        self.assertEqual(reactor['status'], 'low_power')
+        self.assertEqual(reactor['power_output_mw'], 475)
+        self.assertEqual(sim.module_ids('reactor'), ['reactor_1', 'reactor_2', 'reactor_3'])
+
+    def test_fleet_keeps_exclusions(self):
+        state, excluded, module_types = build_fleet(100)
+        sim = VectorSimulator(state, excluded, module_types, seed=1)
+        self.assertEqual(len(sim.names), 100)
+        samples = sim.update()
+        self.assertFalse(any(s['module_name'] in excluded for s in samples))
+        self.assertEqual(module_types['P2 Reactor 1'], 'reactor')
+        # The dict engine skips the same fleet modules when given them
+        dict_sim = PowerPlantSimulator(seed=1, excluded=excluded)
+        dict_sim.state = state
+        self.assertEqual(len(dict_sim.update()), len(samples))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
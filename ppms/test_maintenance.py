@@ -0,0 +1,181 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard
+from power_plant_app.maintenance import scheduler
+from power_plant_app.models import MaintenanceSchedule, Notification, User
+from werkzeug.security import generate_password_hash
+
+
+class MaintenanceSchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        user = User(username='safety', password_hash=generate_password_hash('safety'), role='safety')
+        db.session.add(user)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = user.id
+        self.initial_status = self.turbine_status()
+
+    def tearDown(self):
+        dashboard.engine.handle_action('turbine_1', 'end_maintenance')
+        dashboard.writer.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def schedule(self, when, duration=30):
+        return self.client.post('/schedule_maintenance', data={
+            'module_name': 'Turbine 1',
+            'schedule_datetime': when.strftime('%Y-%m-%dT%H:%M'),
+            'duration_minutes': duration,
+        })
+
+    def turbine_status(self):
+        return dashboard.engine.snapshot['Operation Module']['Turbine 1']['status']
+
+    def test_future_job_waits(self):
+        self.schedule(datetime.utcnow() + timedelta(hours=1))
+        dashboard.engine.tick()
+        self.assertEqual(self.turbine_status(), self.initial_status)
+        self.assertEqual(scheduler.upcoming()[0][3], 'Turbine 1')
+        self.assertIn(b'Upcoming Maintenance', self.client.get('/schedule_maintenance').data)
+
+    def test_due_job_runs_once_and_restores_module(self):
+        """A due job puts the module under maintenance, and restores it when it ends."""
+        self.schedule(datetime.utcnow() - timedelta(minutes=1))
+        dashboard.engine.tick()
+        self.assertEqual(self.turbine_status(), 'maintenance')
+        job = MaintenanceSchedule.query.one()
+        self.assertEqual(job.status, 'in_progress')
+
+        # A restart reloads the job as in progress: it is resumed, not started again
+        dashboard.engine.handle_action('turbine_1', 'end_maintenance')
+        scheduler.load()
+        self.assertEqual([entry[2] for entry in sorted(scheduler.heap)], ['resume', 'end'])
+        dashboard.engine.tick()
+        self.assertEqual(self.turbine_status(), 'maintenance')
+
+        # Once the job's time is up the turbine goes back to how it was
+        job.started_at = datetime.utcnow() - timedelta(hours=1)
+        db.session.commit()
+        scheduler.load()
+        dashboard.engine.tick()
+        self.assertEqual(self.turbine_status(), self.initial_status)
+        db.session.expire_all()
+        self.assertEqual(MaintenanceSchedule.query.one().status, 'done')
+        dashboard.writer.flush()
+        messages = [n.message for n in Notification.query]
+        self.assertIn('Scheduled maintenance: Turbine 1 is under maintenance.', messages)
+        self.assertIn('Scheduled maintenance: Turbine 1 is back from maintenance.', messages)
+
+    def test_resume_skips_module_already_in_maintenance(self):
+        self.schedule(datetime.utcnow() - timedelta(minutes=1))
+        dashboard.engine.tick()
+        dashboard.writer.flush()
+        scheduled = Notification.query.filter(Notification.message.startswith('Scheduled maintenance'))
+        sent = scheduled.count()
+        # Restarted with the module still under maintenance: nothing to resume, nothing to report
+        scheduler.load()
+        version = dashboard.engine.version
+        dashboard.engine.tick()
+        self.assertEqual(dashboard.engine.version, version + 1)
+        self.assertEqual(self.turbine_status(), 'maintenance')
+        dashboard.writer.flush()
+        # Alerts may fire on a tick; only the scheduler's own messages matter here
+        self.assertEqual(scheduled.count(), sent)
+
+    def test_schedule_checks_module_and_converts_local_time(self):
+        response = self.client.post('/schedule_maintenance', data={
+            'module_name': 'No Such Module', 'schedule_datetime': '2030-01-01T10:00', 'duration_minutes': 30})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(MaintenanceSchedule.query.count(), 0)
+
+        # A browser two hours ahead of UTC reports an offset of -120 minutes
+        self.client.post('/schedule_maintenance', data={
+            'module_name': 'Turbine 1', 'schedule_datetime': '2030-01-01T10:00',
+            'duration_minutes': 30, 'utc_offset': -120})
+        self.assertEqual(MaintenanceSchedule.query.one().scheduled_for_datetime, datetime(2030, 1, 1, 8, 0))
+
+    def test_bookkeeping_is_not_published(self):
+        dashboard.engine.handle_action('turbine_1', 'maintenance')
+        turbine = dashboard.engine.snapshot['Operation Module']['Turbine 1']
+        self.assertEqual(turbine['status'], 'maintenance')
+        self.assertNotIn('maintenance_from', turbine)
+        self.assertNotIn(b'maintenance_from', self.client.get('/api/plant_data').data)
+        # The simulator still knows what to go back to
+        dashboard.engine.handle_action('turbine_1', 'end_maintenance')
+        self.assertEqual(self.turbine_status(), self.initial_status)
+
+    def test_worker_lists_upcoming_jobs_from_database(self):
+        """A process whose heap is never fired shows the jobs as the owner left them."""
+        self.schedule(datetime.utcnow() - timedelta(minutes=1), duration=30)
+        self.schedule(datetime.utcnow() + timedelta(hours=1))
+        job = MaintenanceSchedule.query.order_by(MaintenanceSchedule.id).first()
+        # Started by the owner process
+        job.status = 'in_progress'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        scheduler.from_database = True
+        try:
+            upcoming = scheduler.upcoming()
+        finally:
+            scheduler.from_database = False
+        self.assertEqual([(entry[1], entry[2]) for entry in upcoming], [(job.id, 'end'), (job.id + 1, 'start')])
+
+    def test_claimed_job_does_not_fire_twice(self):
+        self.schedule(datetime.utcnow() - timedelta(minutes=1))
+        job = MaintenanceSchedule.query.one()
+        # A second process fires the same job first
+        job.status = 'in_progress'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+        dashboard.engine.tick()
+        self.assertEqual(self.turbine_status(), self.initial_status)
+
+
+class MaintenanceMigrationTests(unittest.TestCase):
+
+    def test_past_jobs_are_skipped_on_upgrade(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'old.sqlite')
+            conn = sqlite3.connect(path)
+            conn.executescript("""
+                CREATE TABLE maintenance_schedule (id INTEGER PRIMARY KEY, module_name VARCHAR(80) NOT NULL,
+                    scheduled_for_datetime DATETIME NOT NULL, scheduled_by_username VARCHAR(80) NOT NULL,
+                    created_at DATETIME);
+                INSERT INTO maintenance_schedule VALUES (1, 'Boiler 1', '2020-01-01 10:00:00.000000', 'safety', NULL),
+                                                        (2, 'Boiler 2', '2999-01-01 10:00:00.000000', 'safety', NULL);
+            """)
+            conn.commit()
+            conn.close()
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+                'SIM_TICK_ENGINE': False,
+                'REPORT_WRITE_BEHIND': False,
+            })
+            with app.app_context():
+                jobs = MaintenanceSchedule.query.order_by(MaintenanceSchedule.id)
+                self.assertEqual([(j.status, j.duration_minutes) for j in jobs], [('skipped', 60), ('pending', 60)])
+                self.assertEqual([entry[3] for entry in scheduler.heap], ['Boiler 2'])
+                indexes = {i['name'] for i in db.inspect(db.engine).get_indexes('maintenance_schedule')}
+                self.assertIn('ix_maintenance_schedule_status_scheduled_for', indexes)
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard, metrics
+from power_plant_app.engine import TickEngine
+from power_plant_app.models import Notification, User
+from power_plant_app.simulation import PowerPlantSimulator
+from werkzeug.security import generate_password_hash
+
+
+class HistogramTests(unittest.TestCase):
+
+    def test_render_is_cumulative(self):
+        histogram = metrics.Histogram('h_seconds', 'Test.', buckets=(0.1, 1.0), labels=('endpoint',))
+        for value in (0.05, 0.5, 0.5, 3.0):
+            histogram.observe(value, 'a"b')
+        lines = histogram.render()
+        self.assertIn('h_seconds_bucket{endpoint="a\\"b",le="0.1"} 1', lines)
+        self.assertIn('h_seconds_bucket{endpoint="a\\"b",le="1.0"} 3', lines)
+        self.assertIn('h_seconds_bucket{endpoint="a\\"b",le="+Inf"} 4', lines)
+        self.assertIn('h_seconds_count{endpoint="a\\"b"} 4', lines)
+        self.assertIn('h_seconds_sum{endpoint="a\\"b"} 4.050000', lines)
+
+
+class MetricsEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+            'METRICS_SLOW_REQUEST_MS': 0,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        user = User(username='harris', password_hash=generate_password_hash('harris'), role='operator')
+        db.session.add(user)
+        db.session.add_all([Notification(message=f'Notice {i}') for i in range(30)])
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = user.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_requests_and_queries_are_counted(self):
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            self.client.get('/notifications').close()
+        self.assertIn('SQL statements', logs.output[0])
+        text = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('ppms_request_seconds_count{endpoint="dashboard.notifications",method="GET",status="200"}',
+                      text)
+        # One page of notifications costs a fixed number of statements, not one per row
+        self.assertIn('ppms_request_queries_bucket{endpoint="dashboard.notifications",le="10"} 1', text)
+        self.assertIn('ppms_sql_seconds_count{kind="SELECT"}', text)
+        self.assertIn('# TYPE ppms_report_rows_dropped_total counter', text)
+        self.assertIn('ppms_report_rows_dropped_total 0', text)
+
+    def test_user_lookup_is_counted(self):
+        """The logged-in user is loaded before the view, and its query counts towards the request."""
+        from power_plant_app.auth import identity_cache
+
+        def statements():
+            series = metrics.request_queries.series
+            before = series.get(('dashboard.notifications',), [0])[-1]
+            self.client.get('/notifications').close()
+            return series[('dashboard.notifications',)][-1] - before
+
+        statements()
+        identity_cache.clear()
+        cold = statements()
+        self.assertEqual(cold - statements(), 1)
+
+    def test_token(self):
+        remote = {'REMOTE_ADDR': '10.0.0.5'}
+        self.assertEqual(self.client.get('/metrics', environ_base=remote).status_code, 403)
+        self.app.config['METRICS_TOKEN'] = 'secret'
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'}, environ_base=remote)
+        self.assertEqual(response.status_code, 200)
+
+    def test_tick_phases(self):
+        engine = TickEngine(PowerPlantSimulator(seed=1))
+        engine.tick_observer = metrics.observe_tick
+        before = metrics.tick_samples.values.get((), 0)
+        engine.tick()
+        self.assertGreater(metrics.tick_samples.values[()], before)
+        self.assertIn('ppms_tick_seconds_count{phase="update"}', metrics.registry.render())
+        self.assertIs(dashboard.engine.tick_observer, metrics.observe_tick)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from power_plant_app import create_app, db
+from power_plant_app.models import User, Notification
+from werkzeug.security import generate_password_hash
+
+
+class NotificationTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.user = User(username='harris', password_hash=generate_password_hash('harris'), role='operator')
+        db.session.add(self.user)
+        db.session.add_all([Notification(message=f'Notice {i}') for i in range(30)])
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = self.user.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_visiting_page_moves_watermark(self):
+        """Opening the page marks everything read with a single watermark update."""
+        page = self.client.get('/reports').get_data(as_text=True)
+        self.assertIn('<span class="notification-badge">30</span>', page)
+        page = self.client.get('/notifications').get_data(as_text=True)
+        self.assertIn('Notice 29', page)
+        self.assertNotIn('Notice 4<', page)
+        self.assertIn('Page 1 of 2', page)
+        self.assertEqual(db.session.get(User, self.user.id).last_read_notification_id, 30)
+        self.assertNotIn('notification-badge', self.client.get('/reports').get_data(as_text=True))
+
+        db.session.add(Notification(message='Fresh'))
+        db.session.commit()
+        self.assertIn('<span class="notification-badge">1</span>', self.client.get('/reports').get_data(as_text=True))
+
+
+class NotificationMigrationTests(unittest.TestCase):
+
+    def test_notification_reads_become_watermarks(self):
+        """Existing association rows are folded into per-user watermarks."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'old.sqlite')
+            conn = sqlite3.connect(path)
+            conn.executescript("""
+                CREATE TABLE user (id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE,
+                                   password_hash VARCHAR(255) NOT NULL, role VARCHAR(50) NOT NULL);
+                CREATE TABLE notification (id INTEGER PRIMARY KEY, message VARCHAR(300) NOT NULL, timestamp DATETIME);
+                CREATE TABLE notification_reads (user_id INTEGER, notification_id INTEGER,
+                                                 PRIMARY KEY (user_id, notification_id));
+                INSERT INTO user VALUES (1, 'zeus', 'x', 'admin'), (2, 'harris', 'x', 'operator');
+                INSERT INTO notification (id, message) VALUES (1, 'a'), (2, 'b'), (3, 'c');
+                INSERT INTO notification_reads VALUES (1, 1), (1, 2);
+            """)
+            conn.commit()
+            conn.close()
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+                'SIM_TICK_ENGINE': False,
+                'REPORT_WRITE_BEHIND': False,
+            })
+            with app.app_context():
+                self.assertEqual([u.last_read_notification_id for u in User.query.order_by(User.id)], [2, 0])
+                self.assertFalse(db.inspect(db.engine).has_table('notification_reads'))
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,53 @@
+import unittest
+
+from power_plant_app import create_app, db, socketio
+from power_plant_app import dashboard
+from power_plant_app.models import User
+from werkzeug.security import generate_password_hash
+
+
+class RealtimeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        operator = User(username='harris', password_hash=generate_password_hash('harris'), role='operator')
+        db.session.add(operator)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = operator.id
+
+    def tearDown(self):
+        dashboard.writer.flush()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_anonymous_socket_is_rejected(self):
+        """Sockets without a login session are refused at connect."""
+        anonymous = socketio.test_client(self.app)
+        self.assertFalse(anonymous.is_connected())
+
+    def test_tick_is_pushed_filtered_by_role(self):
+        """Each tick's changes are pushed to the operator room, operator data only."""
+        ws = socketio.test_client(self.app, flask_test_client=self.client)
+        self.assertTrue(ws.is_connected())
+        dashboard.engine.tick()
+        pushes = [m for m in ws.get_received() if m['name'] == 'plant_data']
+        self.assertEqual(len(pushes), 1)
+        payload = pushes[0]['args'][0]
+        self.assertEqual(payload['version'], dashboard.engine.version)
+        self.assertEqual(list(payload['changes'].keys()), ['Operation Module'])
+        ws.disconnect()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
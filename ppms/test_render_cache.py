@@ -0,0 +1,92 @@
+import unittest
+from datetime import datetime
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard
+from power_plant_app.models import Notification, PlantReport, User
+from power_plant_app.render_cache import RenderCache, cache
+from werkzeug.security import generate_password_hash
+
+
+class RenderCacheTests(unittest.TestCase):
+
+    def test_evicts_least_recently_used_past_max_bytes(self):
+        render_cache = RenderCache(max_bytes=10)
+        render_cache.get('a', lambda: 'aaaa')
+        render_cache.get('b', lambda: 'bbbb')
+        render_cache.get('a', lambda: 'stale')
+        render_cache.get('c', lambda: 'cccc')
+        self.assertEqual(list(render_cache.entries), ['a', 'c'])
+        self.assertEqual(render_cache.size, 8)
+        self.assertEqual((render_cache.hits, render_cache.misses), (1, 3))
+
+
+class CachedPageTests(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        user = User(username='harris', password_hash=generate_password_hash('harris'), role='operator')
+        db.session.add(user)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = user.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_report(self, power):
+        db.session.add(PlantReport(module_name='Reactor 1', module_type='reactor', status='Online',
+                                   power_output_mw=power, temperature_c=300.0, timestamp=datetime.utcnow()))
+        db.session.commit()
+
+    def test_reports_render_once_per_write(self):
+        self.add_report(111.0)
+        self.assertIn('111.00', self.client.get('/reports').get_data(as_text=True))
+        self.assertIn('111.00', self.client.get('/reports').get_data(as_text=True))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.add_report(222.0)
+        self.assertIn('222.00', self.client.get('/reports').get_data(as_text=True))
+        self.assertEqual(cache.misses, 2)
+
+    def test_conditional_get(self):
+        response = self.client.get('/reports')
+        etag = response.headers['ETag']
+        cache.clear()
+        self.assertEqual(self.client.get('/reports', headers={'If-None-Match': etag}).status_code, 304)
+        # A 304 neither renders nor looks up the fragment
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        etag = self.client.get('/nuclear_dashboard').headers['ETag']
+        cache.clear()
+        self.assertEqual(self.client.get('/nuclear_dashboard', headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual((cache.hits, cache.misses), (0, 0))
+        # The unread badge is part of the page, so a new notification changes it
+        db.session.add(Notification(message='Fresh'))
+        db.session.commit()
+        response = self.client.get('/reports', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('notification-badge">1<', response.get_data(as_text=True))
+
+    def test_dashboard_grid_per_role_and_version(self):
+        page = self.client.get('/nuclear_dashboard').get_data(as_text=True)
+        self.assertIn('Operation Module', page)
+        self.assertNotIn('<h2>Safety Module</h2>', page)
+        self.client.get('/nuclear_dashboard')
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        dashboard.engine.handle_action('reactor_1', 'stop')
+        self.client.get('/nuclear_dashboard')
+        self.assertEqual(cache.misses, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
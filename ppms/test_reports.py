@@ -0,0 +1,188 @@
+import csv
+import gzip
+import os
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+from datetime import datetime, timedelta
+from io import BytesIO, StringIO
+
+import polars as pl
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard
+from power_plant_app.exports import iter_csv
+from power_plant_app.archive import archive_reports, scan_reports, spool_frame
+from power_plant_app.models import User, PlantReport, PlantReportRollup, PlantStatusRollup, ReportArchive
+from power_plant_app.queries import module_series
+from power_plant_app.rollups import prune_expired
+from power_plant_app.simulation import module_type_for
+from werkzeug.security import generate_password_hash
+
+
+class ReportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.archive = tempfile.TemporaryDirectory()
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+            'ARCHIVE_DIR': self.archive.name,
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        admin = User(username='zeus', password_hash=generate_password_hash('zeus'), role='admin')
+        db.session.add(admin)
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = admin.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        self.archive.cleanup()
+
+    def add_reports(self, start, seconds, modules=('Reactor 1', 'Reactor 2', 'Turbine 1')):
+        """Helper: one sample per module per second from start."""
+        for i in range(seconds):
+            for name in modules:
+                db.session.add(PlantReport(module_name=name, module_type=module_type_for(name), status='Online',
+                                           power_output_mw=900.0 + i, temperature_c=300.0,
+                                           timestamp=start + timedelta(seconds=i)))
+        db.session.commit()
+
+    def read_csv(self, response):
+        return list(csv.reader(StringIO(response.get_data(as_text=True))))
+
+    def test_export_streams_reactor_rows_in_order(self):
+        """The export is streamed and only contains reactor rows, oldest first."""
+        self.add_reports(datetime(2025, 1, 1), 3)
+        response = self.client.get('/reports/export.csv')
+        self.assertTrue(response.is_streamed)
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0][1], 'Module Name')
+        self.assertEqual(len(rows), 1 + 6)
+        self.assertEqual({row[1] for row in rows[1:]}, {'Reactor 1', 'Reactor 2'})
+        self.assertEqual(rows[1][0], '2025-01-01 00:00:00')
+
+    def test_export_filters_and_gzip(self):
+        """Date range and module filters apply, and gzip=1 compresses the body."""
+        self.add_reports(datetime(2025, 1, 1, 23, 59, 58), 4)
+        response = self.client.get('/reports/export.csv?start=2025-01-02&end=2025-01-02'
+                                   '&module=Turbine 1&gzip=1')
+        self.assertEqual(response.mimetype, 'application/gzip')
+        rows = list(csv.reader(StringIO(gzip.decompress(response.get_data()).decode('utf-8'))))
+        self.assertEqual([row[1] for row in rows[1:]], ['Turbine 1', 'Turbine 1'])
+
+    def test_csv_header_goes_out_before_the_rows(self):
+        def rows():
+            fetched.append(True)
+            yield datetime(2025, 1, 1), 'Reactor 1', 'Online', 900.0, 300.0
+
+        for compress in (False, True):
+            fetched = []
+            chunks = iter_csv(rows(), compress=compress)
+            first = next(chunks)
+            self.assertEqual(fetched, [])
+            if compress:
+                first = zlib.decompressobj(31).decompress(first)
+            self.assertTrue(first.startswith(b'Timestamp (UTC),Module Name'))
+            self.assertTrue(b''.join(chunks))
+            self.assertEqual(fetched, [True])
+
+    def write_samples(self, start, powers, status='Online'):
+        """Helper: pushes one Reactor 1 sample per second through the report writer."""
+        dashboard.writer.submit([
+            {'module_name': 'Reactor 1', 'module_type': 'reactor', 'status': status, 'power_output_mw': power,
+             'temperature_c': 300.0, 'timestamp': start + timedelta(seconds=i)}
+            for i, power in enumerate(powers)
+        ])
+        dashboard.writer.flush()
+
+    def test_rollups_merge_incrementally(self):
+        """Separate flushes into the same bucket merge into one rollup row."""
+        start = datetime(2025, 1, 1, 12, 0, 0)
+        self.write_samples(start, [900.0, 910.0])
+        self.write_samples(start + timedelta(seconds=2), [880.0], status='shutting_down')
+        minute = PlantReportRollup.query.filter_by(resolution='1m', module_name='Reactor 1').one()
+        self.assertEqual(minute.sample_count, 3)
+        self.assertEqual((minute.power_min, minute.power_max), (880.0, 910.0))
+        self.assertAlmostEqual(minute.power_avg, 2690.0 / 3)
+        self.assertEqual(PlantReportRollup.query.filter_by(resolution='1d').one().sample_count, 3)
+        statuses = {r.status: r.sample_count for r in PlantStatusRollup.query.filter_by(resolution='1h')}
+        self.assertEqual(statuses, {'Online': 2, 'shutting_down': 1})
+
+    def test_long_ranges_read_rollups_after_pruning(self):
+        """Pruned raw rows stay visible through the rollups for long ranges."""
+        start = datetime(2025, 1, 1)
+        self.write_samples(start, [900.0] * 120)
+        deleted = prune_expired(raw_days=1, now=start + timedelta(days=2), batch_size=50)
+        self.assertEqual(deleted['plant_report'], 120)
+        self.assertEqual(PlantReport.query.count(), 0)
+        series = module_series('Reactor 1', start, start + timedelta(days=1))
+        self.assertEqual([point['samples'] for point in series], [60, 60])
+
+    def test_export_rejects_bad_dates(self):
+        self.assertEqual(self.client.get('/reports/export.csv?start=yesterday').status_code, 400)
+
+    def test_archive_partitions_and_prunes_by_day(self):
+        """Whole days go to per-module Parquet files and can leave the live table."""
+        self.add_reports(datetime(2025, 1, 1, 23, 59, 58), 4)
+        self.add_reports(datetime(2025, 1, 3), 2)
+        days = archive_reports(datetime(2025, 1, 3).date(), delete=True)
+        self.assertEqual([d.isoformat() for d in days], ['2025-01-01', '2025-01-02'])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.archive.name, 'day=2025-01-01'))),
+                         ['reactor_1.parquet', 'reactor_2.parquet', 'turbine_1.parquet'])
+        self.assertEqual([a.row_count for a in ReportArchive.query.order_by(ReportArchive.day)], [6, 6])
+        self.assertEqual(PlantReport.query.count(), 6)
+        # Archiving again only picks up days that weren't archived yet
+        self.assertEqual(archive_reports(datetime(2025, 1, 3).date()), [])
+
+        frame = scan_reports(datetime(2025, 1, 1, 23, 59, 59), None, module_names=['Reactor 1']).collect()
+        self.assertEqual(frame['power_output_mw'].to_list(), [901.0, 902.0, 903.0, 900.0, 901.0])
+
+    def test_parquet_export_reads_archive_and_live_rows(self):
+        self.add_reports(datetime(2025, 1, 1), 3)
+        archive_reports(datetime(2025, 1, 2).date(), delete=True)
+        self.add_reports(datetime(2025, 1, 2), 2)
+        response = self.client.get('/reports/export.parquet?start=2025-01-01&end=2025-01-02')
+        self.assertEqual(response.status_code, 200)
+        frame = pl.read_parquet(BytesIO(response.data))
+        self.assertEqual(frame.height, 10)
+        self.assertEqual(set(frame['module_type']), {'reactor'})
+        self.assertEqual(frame['timestamp'].is_sorted(), True)
+
+    def test_csv_export_reads_archived_days(self):
+        """Days archived and deleted from the live table are still exported."""
+        self.add_reports(datetime(2025, 1, 1, 23, 59, 58), 4)
+        archive_reports(datetime(2025, 1, 2).date(), delete=True)
+        rows = self.read_csv(self.client.get('/reports/export.csv?start=2025-01-01&end=2025-01-02'))
+        self.assertEqual([row[0] for row in rows[1:]],
+                         ['2025-01-01 23:59:58'] * 2 + ['2025-01-01 23:59:59'] * 2
+                         + ['2025-01-02 00:00:00'] * 2 + ['2025-01-02 00:00:01'] * 2)
+        self.assertEqual({row[1] for row in rows[1:]}, {'Reactor 1', 'Reactor 2'})
+
+    def test_parquet_export_spools_live_rows_and_cleans_up(self):
+        self.add_reports(datetime(2025, 1, 2), 5)
+        stmt = db.select(PlantReport.timestamp, PlantReport.module_name, PlantReport.module_type, PlantReport.status,
+                         PlantReport.power_output_mw, PlantReport.temperature_c).order_by(PlantReport.id)
+        with tempfile.TemporaryDirectory() as spool:
+            frame = spool_frame(stmt, spool, chunk_size=4).collect()
+            self.assertEqual(len(os.listdir(spool)), 4)
+        self.assertEqual(frame.height, 15)
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(tempfile, 'tempdir', tmp):
+            response = self.client.get('/reports/export.parquet?start=2025-01-02&end=2025-01-02')
+            self.assertEqual(pl.read_parquet(BytesIO(response.get_data())).height, 10)
+            response.close()
+            self.assertEqual(os.listdir(tmp), [])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
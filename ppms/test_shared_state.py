@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import time
+import tempfile
+import unittest
+import uuid
+
+from power_plant_app import create_app, db
+from power_plant_app import dashboard, shared_state
+from power_plant_app.engine import TickEngine
+from power_plant_app.models import User
+from power_plant_app.history import HistoryStore
+from power_plant_app.shared_state import (SEQ, CommandServer, RemoteHistory, SharedStatePublisher,
+                                         SharedStateReader)
+from power_plant_app.simulation import PowerPlantSimulator
+from werkzeug.security import generate_password_hash
+
+
+def read_version(name, queue):
+    reader = SharedStateReader(name, None, b'')
+    queue.put((reader.version, reader.snapshot['Operation Module']['Reactor 1']['status']))
+
+
+class SharedStateTests(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f'ppms-test-{uuid.uuid4().hex[:8]}'
+        self.tmp = tempfile.TemporaryDirectory()
+        self.address = os.path.join(self.tmp.name, 'commands.sock')
+        self.engine = TickEngine(PowerPlantSimulator())
+        self.publisher = SharedStatePublisher(self.name, 64 * 1024)
+        self.engine.add_listener(self.publisher.publish)
+        self.publisher.publish(self.engine.published)
+
+    def tearDown(self):
+        self.publisher.close()
+        self.tmp.cleanup()
+
+    def test_reader_sees_each_published_version(self):
+        """Readers decode a snapshot once per version and match the owner's state."""
+        reader = SharedStateReader(self.name, self.address, b'key')
+        self.assertEqual(reader.version, 0)
+        self.assertFalse(reader.refresh())
+        self.engine.tick()
+        self.engine.tick()
+        self.assertTrue(reader.refresh())
+        self.assertEqual(reader.version, 2)
+        self.assertEqual(reader.snapshot, self.engine.snapshot)
+        self.assertEqual(reader.published.changes_since(1), self.engine.published.changes_since(1))
+
+    def test_owner_restarts(self):
+        """A reader follows a restarted owner's new segment instead of the orphaned one."""
+        reader = SharedStateReader(self.name, self.address, b'key', reattach_interval=0)
+        self.engine.tick()
+        self.assertEqual(reader.version, 1)
+        self.publisher.close()
+        engine = TickEngine(PowerPlantSimulator())
+        engine.handle_action('reactor_1', 'stop')
+        self.publisher = SharedStatePublisher(self.name, 64 * 1024)
+        self.publisher.publish(engine.published)
+        self.assertTrue(reader.refresh())
+        self.assertEqual(reader.snapshot['Operation Module']['Reactor 1']['status'], 'shutting_down')
+
+    def test_writer_dies_mid_write(self):
+        """An owner killed mid-write doesn't hang readers; they keep the last snapshot."""
+        reader = SharedStateReader(self.name, self.address, b'key')
+        self.engine.tick()
+        self.assertEqual(reader.version, 1)
+        SEQ.pack_into(self.publisher.shm.buf, 0, self.publisher.seq + 1)
+        started = time.monotonic()
+        self.assertFalse(reader.refresh())
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(reader.version, 1)
+
+    def test_other_process_reads_segment(self):
+        """A separate process attaches by name and sees the owner's latest state."""
+        self.engine.handle_action('reactor_1', 'stop')
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=read_version, args=(self.name, queue))
+        process.start()
+        process.join(10)
+        self.assertEqual(queue.get(timeout=1), (1, 'shutting_down'))
+
+    def test_worker_actions_reach_the_owner(self):
+        """A module action posted to a worker is applied by the owner and visible to every reader."""
+        self.engine.history = HistoryStore()
+        self.engine.tick()
+        server = CommandServer(self.engine, self.address, b'dev')
+        server.start()
+        saved_engine, saved_history = dashboard.engine, dashboard.history
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SHARED_STATE_NAME': self.name,
+            'SHARED_STATE_ADDRESS': self.address,
+        })
+        try:
+            self.assertIsInstance(dashboard.engine, SharedStateReader)
+            self.assertIs(shared_state.owner_engine, saved_engine)
+            with app.app_context():
+                user = User(username='harris', password_hash=generate_password_hash('harris'), role='operator')
+                db.session.add(user)
+                db.session.commit()
+                client = app.test_client()
+                with client.session_transaction() as sess:
+                    sess['user_id'] = user.id
+                response = client.post('/module_action', json={'module_id': 'reactor_1', 'action': 'stop'})
+                self.assertEqual(response.get_json()['message'], 'Reactor 1 is stopping.')
+                other_worker = SharedStateReader(self.name, self.address, b'dev')
+                self.assertEqual(other_worker.snapshot['Operation Module']['Reactor 1']['status'], 'shutting_down')
+                data = client.get('/api/plant_data').get_json()
+                self.assertEqual(data['Operation Module']['Reactor 1']['status'], 'shutting_down')
+                # The owner's buffers serve what they hold; only the minute
+                # before the owner's first tick is left to the database
+                history = client.get('/api/history/reactor_1?window=1m').get_json()
+                self.assertEqual((history['source'], len(history['points'])), ('mixed', 1))
+                db.session.remove()
+        finally:
+            dashboard.engine.stop()
+            dashboard.engine, dashboard.history = saved_engine, saved_history
+            server.stop()
+
+    def test_remote_history_without_owner(self):
+        """An unreachable owner means nothing in memory, so the caller falls back to the database."""
+        remote = RemoteHistory(self.address, b'dev')
+        self.assertEqual(remote.series('Reactor 1', None, None), (None, None, None, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
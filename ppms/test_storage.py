@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from power_plant_app import create_app, db
+from power_plant_app.storage import pragma_values
+
+
+class StorageTests(unittest.TestCase):
+
+    def test_file_database_uses_wal_and_a_pool(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'plant.sqlite')
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+                'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 3},
+                'SIM_TICK_ENGINE': False,
+                'REPORT_WRITE_BEHIND': False,
+            })
+            with app.app_context():
+                self.assertEqual(db.engine.url.database, path)
+                self.assertEqual(pragma_values(['journal_mode', 'synchronous', 'busy_timeout']),
+                                 {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000})
+                self.assertEqual(db.engine.pool.size(), 3)
+                self.assertEqual(db.engine.pool._max_overflow, 10)
+                db.session.remove()
+                db.engine.dispose()
+
+    def test_memory_database_keeps_one_connection(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SIM_TICK_ENGINE': False,
+            'REPORT_WRITE_BEHIND': False,
+        })
+        with app.app_context():
+            self.assertEqual(type(db.engine.pool).__name__, 'StaticPool')
+            self.assertEqual(pragma_values(['busy_timeout']), {'busy_timeout': 5000})
+            db.session.remove()
+
+
+if __name__ == '__main__':
+    unittest.main()